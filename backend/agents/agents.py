@@ -1,10 +1,10 @@
 from dataclasses import dataclass
-from typing import Callable, Awaitable, Any
+from typing import Callable, Awaitable, Any, Optional
 
 from langgraph.pregel import Pregel
 
 from langgraph.graph.state import CompiledStateGraph
-from backend.agents.wyscout.agent import dynamic_swarm_refined
+from backend.agents.wyscout.agent import dynamic_swarm_refined, prefork_refined_agent, prewarm_refined_agent
 from backend.schema import AgentInfo
 
 DEFAULT_AGENT = "telogical-assistant"  # For testing purposes, use the telogical assistant
@@ -14,12 +14,17 @@ DEFAULT_AGENT = "telogical-assistant"  # For testing purposes, use the telogical
 class Agent:
     description: str
     graph: Callable[[], Awaitable[CompiledStateGraph]]  # Now accepts an async factory function
+    prewarm: Optional[Callable[[], Awaitable[None]]] = None  # Run once at service startup
+    # Run once before the server forks its workers; must not open connections
+    prefork: Optional[Callable[[], Awaitable[None]]] = None
 
 
 agents: dict[str, Agent] = {
     "telogical-assistant": Agent(
         description="A Telogical assistant that can answer telecommunications market intelligence questions.",
         graph=dynamic_swarm_refined,
+        prewarm=prewarm_refined_agent,
+        prefork=prefork_refined_agent,
     )
 }
 
@@ -42,6 +47,20 @@ async def get_agent(agent_id: str) -> Pregel:
     return await agent.graph()
 
 
+async def prewarm_agent(agent_id: str) -> None:
+    """Run the agent's startup warmup hook, if it defines one"""
+    agent = agents[agent_id]
+    if agent.prewarm is not None:
+        await agent.prewarm()
+
+
+async def prefork_agent(agent_id: str) -> None:
+    """Run the agent's pre-fork hook, if it defines one"""
+    agent = agents[agent_id]
+    if agent.prefork is not None:
+        await agent.prefork()
+
+
 def get_all_agent_info() -> list[AgentInfo]:
     """Get information about all available agents"""
     return [
@@ -7,6 +7,7 @@ import operator
 import datetime
 import asyncio
 import json
+import time
 from dotenv import load_dotenv
 load_dotenv()
 import datetime
@@ -22,16 +23,40 @@ from langgraph_swarm import create_handoff_tool, create_swarm
 from langgraph_swarm.swarm import SwarmState
 from functools import cache # Used for Python 3.9+
 from backend.agents.wyscout.tools import *
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.callbacks import get_usage_metadata_callback
 from langgraph.graph import StateGraph, START, END
 from backend.agents.wyscout.prompts import REFLECTION_PROMPT, MAIN_PROMPT, CONTEXTUALIZER_SYSTEM_PROMPT
+from backend.agents.wyscout.context_docs import get_context_document
+from backend.agents.wyscout.prompt_layout import (
+    PROMPT_CONTEXT_DOCUMENTS,
+    assemble_messages,
+    context_document_messages,
+    log_prompt_cache_report,
+    prompt_cache_report,
+    schema_context_message,
+)
+from backend.agents.wyscout.answer_cache import (
+    ANSWER_CACHE_ENABLED,
+    answer_cache_key,
+    cache_answer,
+    get_cached_answer,
+)
+from backend.agents.wyscout.history import (
+    HISTORY_SUMMARY_PREFIX,
+    plan_history_fold,
+    summarize_history,
+    windowed_history,
+)
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 # Import LLM and Memory modules from the framework
-from backend.core.llm import get_telogical_primary_llm, get_telogical_secondary_llm
+from backend.core.cache import TTLCache, create_cache
+from backend.core.llm import get_node_llm, get_telogical_primary_llm, get_telogical_secondary_llm
 from backend.memory.postgres import get_telogical_postgres_saver
 
 # Module-level variables to hold the compiled graph instances
@@ -43,8 +68,18 @@ _reflection_agent: Optional[Any] = None
 _main_agent: Optional[Any] = None
 
 
-async def get_saver() -> AsyncPostgresSaver:
-    """Initializes and returns the asynchronous Postgres saver."""
+# "postgres" (default) or "memory" for offline runs such as the benchmark harness
+AGENT_CHECKPOINTER = os.getenv("AGENT_CHECKPOINTER", "postgres").lower()
+_memory_saver: Optional[MemorySaver] = None
+
+
+async def get_saver() -> AsyncPostgresSaver | MemorySaver:
+    """Initializes and returns the asynchronous Postgres saver (or an in-memory one, see AGENT_CHECKPOINTER)."""
+    global _memory_saver
+    if AGENT_CHECKPOINTER == "memory":
+        if _memory_saver is None:
+            _memory_saver = MemorySaver()
+        return _memory_saver
     return await get_telogical_postgres_saver()
 
 # Optional long-term store for embeddings (if used with a vector store retriever)
@@ -110,6 +145,15 @@ class RefinedAgentState(TypedDict):
     graphql_schema: Annotated[Optional[str], None]
     internal_context_insights: Annotated[Optional[str], None] # NEW FIELD
     requires_schema_flag: Annotated[Optional[bool], None]    # For the boolean decision
+    schema_turn_count: Annotated[Optional[int], None]          # Turns run on this thread (checkpointed)
+    schema_last_injection_turn: Annotated[Optional[int], None] # Turn on which the schema was last injected
+    graphql_schema_hash: Annotated[Optional[str], None]        # Content hash of the last injected schema
+    prompt_cache_usage: Annotated[Optional[Dict[str, Dict[str, int]]], None]  # Per-node token/cache-hit report for this turn
+    history_summary: Annotated[Optional[str], None]          # Running summary of turns folded out of the window
+    history_summarized_upto: Annotated[Optional[int], None]  # Index in messages of the first unsummarized message
+    answer_cache_key: Annotated[Optional[str], None]         # Set when this turn's answer may be cached
+    answer_cache_hit: Annotated[Optional[bool], None]
+    tools_used: Annotated[Optional[List[Dict[str, Any]]], None]  # Wyscout tool calls ({"name", "args"}) made this turn
 
 
 class QueryContextAnalysis(BaseModel):
@@ -120,8 +164,14 @@ class QueryContextAnalysis(BaseModel):
         description="True if the LATEST USER QUERY implies a need to consult Telogical's telecommunications database (and thus its GraphQL schema) for a factual answer. False for general conversation, greetings, questions about the AI's identity, or queries that can be answered from general knowledge without specific data lookup."
     )
     
-# Global dictionary to track schema injection frequency per user/session
-schema_injection_tracker: Dict[str, Dict[str, int]] = {}
+# Per-thread schema injection bookkeeping lives in RefinedAgentState (and therefore in the
+# checkpointer, shared by every worker). This bounded front cache only covers threads whose
+# checkpoint does not carry the counters yet, e.g. when the graph runs without a checkpointer.
+SCHEMA_TRACKER_MAX_THREADS = int(os.getenv("SCHEMA_TRACKER_MAX_THREADS", 10_000))
+SCHEMA_TRACKER_TTL_SECONDS = float(os.getenv("SCHEMA_TRACKER_TTL_SECONDS", 6 * 60 * 60))
+schema_injection_cache: TTLCache[str, Dict[str, int]] = create_cache(
+    "schema_injection", maxsize=SCHEMA_TRACKER_MAX_THREADS, ttl=SCHEMA_TRACKER_TTL_SECONDS
+)
 
 MAX_TURNS_BETWEEN_SCHEMA_INJECTION = 20
 MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD = 3
@@ -131,12 +181,21 @@ SCHEMA_TRIGGER_KEYWORDS = [
     "order", "user", "product"
 ]
 
-async def async_graphql_schema() -> Dict[str, Any]:
-    """Async wrapper to run the synchronous graphql_schema_tool_2."""
-    loop = asyncio.get_running_loop()
-    # Assuming graphql_schema_tool_2.invoke({}) is the correct way to call it for full schema
-    result = await loop.run_in_executor(None, graphql_schema_tool_2.invoke, {})
-    return result if isinstance(result, dict) else {"documentation": str(result)}
+async def async_graphql_schema(revalidate: bool = False) -> Dict[str, Any]:
+    """
+    Serve the GraphQL schema reference from the in-memory context document cache.
+
+    No executor hop or tool call: the document is loaded once at startup and `revalidate`
+    only re-reads it when the file changed on disk.
+    """
+    document = get_context_document("graphql_schema", revalidate=revalidate)
+    if document is None:
+        return {"documentation": None, "content_hash": None, "token_count": 0}
+    return {
+        "documentation": document.content,
+        "content_hash": document.content_hash,
+        "token_count": document.token_count,
+    }
 
 
 def _convert_to_base_message(message_data: Any) -> Optional[BaseMessage]:
@@ -195,17 +254,106 @@ def _extract_string_content_from_message(message: Optional[BaseMessage]) -> str:
 
 
 
+def _history_window(state: RefinedAgentState) -> List[BaseMessage]:
+    """Summary plus the unsummarized turns of the thread, within the history token ceiling."""
+    unsummarized = state.get("messages", [])[state.get("history_summarized_upto") or 0:]
+    return windowed_history(
+        [_convert_to_base_message(msg_data) for msg_data in unsummarized],
+        summary=state.get("history_summary"),
+    )
+
+
+async def manage_history_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """Fold turns that fell out of the rolling window into the persisted running summary."""
+    summarized_upto = state.get("history_summarized_upto") or 0
+    unsummarized = [
+        _convert_to_base_message(msg_data) for msg_data in state.get("messages", [])[summarized_upto:]
+    ]
+    fold_count = plan_history_fold(unsummarized)
+    if not fold_count:
+        return {}
+
+    # The summary is internal bookkeeping; keep its tokens off /stream.
+    summary_config = {**config, "tags": [*(config.get("tags") or []), "skip_stream"]}
+    try:
+        summary = await summarize_history(
+            get_node_llm("manage_history", config, get_telogical_secondary_llm),
+            state.get("history_summary"),
+            unsummarized[:fold_count],
+            config=summary_config,
+        )
+    except Exception as e:
+        # The window's token ceiling still bounds the prompt; retry the fold on the next turn.
+        print(f"Error summarizing conversation history: {e}")
+        return {}
+    if not summary:
+        return {}
+    return {
+        "history_summary": summary,
+        "history_summarized_upto": summarized_upto + fold_count,
+    }
+
+
+LATEST_MESSAGE_TAG = "[LATEST_MESSAGE] "
+
+
+async def answer_cache_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """Serve a cached answer for a thread's first question while its underlying data is still fresh."""
+    no_hit = {"answer_cache_key": None, "answer_cache_hit": False, "tools_used": None}
+    if not config.get("configurable", {}).get("use_answer_cache", ANSWER_CACHE_ENABLED):
+        return no_hit
+
+    messages = state.get("messages", [])
+    latest_message = _convert_to_base_message(messages[-1]) if messages else None
+    question = _extract_string_content_from_message(latest_message).removeprefix(LATEST_MESSAGE_TAG)
+    if not question.strip():
+        return no_hit
+    has_prior_turns = bool(state.get("history_summary")) or any(
+        isinstance(_convert_to_base_message(msg_data), HumanMessage) for msg_data in messages[:-1]
+    )
+    key = answer_cache_key(question, has_prior_turns)
+    if key is None:
+        return no_hit
+
+    cached = await get_cached_answer(key)
+    if cached is None:
+        return {**no_hit, "answer_cache_key": key}
+
+    cached_message = AIMessage(
+        content=cached.content,
+        custom_data={
+            "trace": {
+                "reasoning": "Answered from the answer cache; the underlying Wyscout data is still within its freshness window.",
+                "tool_calls": [],
+                "answer_cache": {
+                    "question": cached.question,
+                    "age_seconds": round(time.time() - cached.created_at, 1),
+                    "ttl_seconds": cached.ttl_seconds,
+                    "tools": [call["name"] for call in cached.tool_calls],
+                },
+            }
+        },
+    )
+    return {
+        "answer_cache_key": None,
+        "answer_cache_hit": True,
+        "tools_used": cached.tool_calls,
+        "prompt_cache_usage": {},
+        "messages": [cached_message],
+    }
+
+
+def route_after_answer_cache(state: RefinedAgentState) -> str:
+    return END if state.get("answer_cache_hit") else "contextualize_query"
+
+
 async def contextualize_query_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
     # print("--- Entering Contextualize Query Node ---")
 
-    processed_history_messages: List[BaseMessage] = []
-    for msg_data in state.get("messages", []):
-        converted_msg = _convert_to_base_message(msg_data)
-        if converted_msg:
-            processed_history_messages.append(converted_msg)
+    processed_history_messages: List[BaseMessage] = _history_window(state)
 
     if not processed_history_messages:
-        return {"internal_context_insights": None, "requires_schema_flag": False} # Default
+        return {"internal_context_insights": None, "requires_schema_flag": False, "prompt_cache_usage": {}} # Default
 
     latest_user_query_content: Optional[str] = None
     current_message_to_analyze = processed_history_messages[-1]
@@ -213,11 +361,12 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
         latest_user_query_content = _extract_string_content_from_message(current_message_to_analyze)
     
     if not latest_user_query_content or not latest_user_query_content.strip():
-        return {"internal_context_insights": None, "requires_schema_flag": False}
+        return {"internal_context_insights": None, "requires_schema_flag": False, "prompt_cache_usage": {}}
 
-    history_for_prompt_messages: List[BaseMessage] = []
-    if len(processed_history_messages) > 1:
-        history_for_prompt_messages = processed_history_messages[:-1]
+    # The window already excludes schema injections; its leading summary is added to the prompt separately
+    history_for_prompt_messages: List[BaseMessage] = processed_history_messages[:-1]
+    if state.get("history_summary"):
+        history_for_prompt_messages = history_for_prompt_messages[1:]
 
     MAX_HISTORY_MESSAGES_FOR_CONTEXTUALIZER = 4
     if len(history_for_prompt_messages) > MAX_HISTORY_MESSAGES_FOR_CONTEXTUALIZER:
@@ -226,26 +375,29 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
     chat_history_str = "\n".join(
         [f"{msg.type.upper()}: {str(msg.content).strip()}" for msg in history_for_prompt_messages]
     ).strip()
+    if state.get("history_summary"):
+        chat_history_str = f"{HISTORY_SUMMARY_PREFIX}{state['history_summary']}\n\n{chat_history_str}".strip()
     if not chat_history_str:
         chat_history_str = "No prior conversational history provided for this turn."
     
-    prompt_input_dict = {
-        "chat_history": chat_history_str,
-        "latest_user_query": latest_user_query_content
-    }
+    # Static instructions form the cacheable prefix; the per-turn history and query come last
+    contextualizer_messages = assemble_messages(
+        stable=[SystemMessage(content=CONTEXTUALIZER_SYSTEM_PROMPT)],
+        volatile=[HumanMessage(content=f"Chat history:\n{chat_history_str}\n\nLatest user query:\n{latest_user_query_content}")],
+    )
     
-    # Get the secondary LLM from the framework
-    secondary_llm = get_telogical_secondary_llm()
+    # Secondary LLM unless a cheaper model is configured for this node (NODE_MODELS / configurable.node_models)
+    secondary_llm = get_node_llm("contextualize_query", config, get_telogical_secondary_llm)
     # Use secondary_llm with structured output for QueryContextAnalysis
     structured_llm_contextualizer = secondary_llm.with_structured_output(QueryContextAnalysis)
-    contextualizer_prompt_template = ChatPromptTemplate.from_template(CONTEXTUALIZER_SYSTEM_PROMPT)
-    context_llm_chain = contextualizer_prompt_template | structured_llm_contextualizer
 
     formatted_insights_for_state: Optional[str] = None
     schema_needed_flag: bool = True # Default to False
 
+    usage_callback = None
     try:
-        analysis_result: QueryContextAnalysis = await context_llm_chain.ainvoke(prompt_input_dict)
+        with get_usage_metadata_callback() as usage_callback:
+            analysis_result: QueryContextAnalysis = await structured_llm_contextualizer.ainvoke(contextualizer_messages, config=config)
         # print(f"Contextualize Insights:\n{analysis_result.contextual_insights}") # Optional debug
         # print(f"Schema Needed Flag: {analysis_result.requires_database_access}") # Optional debug
         
@@ -271,16 +423,16 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
         )
         schema_needed_flag = False # Default to False on error to be safe
 
+    cache_report = prompt_cache_report(usage_callback.usage_metadata if usage_callback else {})
+    log_prompt_cache_report("contextualize_query", cache_report)
+
     return {
         "internal_context_insights": formatted_insights_for_state,
-        "requires_schema_flag": schema_needed_flag
+        "requires_schema_flag": schema_needed_flag,
+        "prompt_cache_usage": {"contextualize_query": cache_report},  # Reset per turn
     }
 
 
-SCHEMA_APPENDIX_DELIMITER_START = "\n\n--- BEGIN ATTACHED GRAPHQL SCHEMA (FOR AI REFERENCE) ---\n"
-SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
-
-
 # (Other imports, constants like SCHEMA_APPENDIX_DELIMITER_START/END,
 # helper functions _convert_to_base_message, _extract_string_content_from_message,
 # async_graphql_schema, etc., are assumed to be defined as before)
@@ -289,27 +441,31 @@ SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
 # helper functions like _convert_to_base_message, _extract_string_content_from_message,
 # async_graphql_schema, and global constants like SCHEMA_TRIGGER_KEYWORDS,
 # MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD, MAX_TURNS_BETWEEN_SCHEMA_INJECTION,
-# schema_injection_tracker, SCHEMA_APPENDIX_DELIMITER_START, SCHEMA_APPENDIX_DELIMITER_END
+# schema_injection_cache, SCHEMA_APPENDIX_DELIMITER_START, SCHEMA_APPENDIX_DELIMITER_END
 # are defined as in your complete code that you provided last)
 
 async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
     session_id = str(config.get("configurable", {}).get("thread_id", "default_session"))
-    if session_id not in schema_injection_tracker: # schema_injection_tracker should be defined globally
-        schema_injection_tracker[session_id] = {"turn_count": 0, "last_injection_turn": 0}
-    schema_injection_tracker[session_id]["turn_count"] += 1
-    current_turn = schema_injection_tracker[session_id]["turn_count"]
+    # Checkpointed state is authoritative; the front cache only fills in when it has no counters.
+    if state.get("schema_turn_count") is not None:
+        schema_tracker = {
+            "turn_count": state["schema_turn_count"],
+            "last_injection_turn": state.get("schema_last_injection_turn") or 0,
+        }
+    else:
+        schema_tracker = dict(await schema_injection_cache.aget(session_id) or {"turn_count": 0, "last_injection_turn": 0})
+    schema_tracker["turn_count"] += 1
+    current_turn = schema_tracker["turn_count"]
 
     additional_messages_for_state: List[BaseMessage] = []
     
     # --- 1. Process Incoming Messages from main graph state ---
-    processed_input_messages: List[BaseMessage] = []
-    for msg_data in state.get("messages", []):
-        converted_msg = _convert_to_base_message(msg_data) # Ensure helper is defined
-        if converted_msg:
-            processed_input_messages.append(converted_msg)
+    # Rolling window: running summary plus the recent turns, within the history token ceiling
+    processed_input_messages: List[BaseMessage] = _history_window(state)
 
     # --- 2. Get information from state (set by contextualize_query_node and previous runs) ---
     schema_to_use_for_this_run = state.get("graphql_schema")
+    schema_hash_for_this_run = state.get("graphql_schema_hash")
     context_insights_str = state.get("internal_context_insights")
     # query_needs_schema_flag is retrieved but its use for appending schema to HumanMessage is now superseded by current_turn check
     # query_needs_schema_flag = state.get("requires_schema_flag", True) # As per your snippet's default
@@ -324,18 +480,22 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     if not schema_to_use_for_this_run:
         should_fetch_new_schema_from_source = True
     elif latest_user_message_content and any(k.lower() in latest_user_message_content.lower() for k in SCHEMA_TRIGGER_KEYWORDS):
-        if (current_turn - schema_injection_tracker[session_id].get("last_injection_turn",0)) >= MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD:
+        if (current_turn - schema_tracker["last_injection_turn"]) >= MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD:
             should_fetch_new_schema_from_source = True
-    elif (current_turn - schema_injection_tracker[session_id].get("last_injection_turn",0)) >= MAX_TURNS_BETWEEN_SCHEMA_INJECTION:
+    elif (current_turn - schema_tracker["last_injection_turn"]) >= MAX_TURNS_BETWEEN_SCHEMA_INJECTION:
         should_fetch_new_schema_from_source = True
 
+    schema_changed_this_turn = False
     if should_fetch_new_schema_from_source:
         try:
-            schema_data = await async_graphql_schema()
+            schema_data = await async_graphql_schema(revalidate=True)
             fetched_schema_str = schema_data.get("documentation")
             if fetched_schema_str and fetched_schema_str.strip():
+                # Unchanged content (same hash) is already in the thread history: don't re-inject it.
+                schema_changed_this_turn = schema_data.get("content_hash") != schema_hash_for_this_run
                 schema_to_use_for_this_run = fetched_schema_str
-                schema_injection_tracker[session_id]["last_injection_turn"] = current_turn
+                schema_hash_for_this_run = schema_data.get("content_hash")
+                schema_tracker["last_injection_turn"] = current_turn
             elif not schema_to_use_for_this_run:
                 schema_to_use_for_this_run = None
         except Exception as e:
@@ -346,64 +506,31 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
 
     # --- New: Inject schema as a SystemMessage into RefinedAgentState.messages (to be returned by this node) ---
     if schema_to_use_for_this_run and schema_to_use_for_this_run.strip():
-        # Conditions: Schema is available AND (it's the first turn OR schema was just freshly fetched/updated this turn)
-        if current_turn == 1 or should_fetch_new_schema_from_source:
-            schema_system_content = (
-                f"Context: The following GraphQL schema was identified as relevant for the current turn "
-                f"and is available to the agent system if needed for query formulation or understanding capabilities:\n"
-                f"{SCHEMA_APPENDIX_DELIMITER_START}"
-                f"{schema_to_use_for_this_run}"
-                f"{SCHEMA_APPENDIX_DELIMITER_END}"
-            )
-            schema_system_message = SystemMessage(content=schema_system_content)
-            additional_messages_for_state.append(schema_system_message)
+        # Conditions: Schema is available AND its content differs from the copy already injected into this thread
+        if schema_changed_this_turn:
+            # Recorded in the thread history; the swarm itself gets the schema from the stable prefix below
+            additional_messages_for_state.append(schema_context_message(schema_to_use_for_this_run))
             # print(f"DEBUG: Added schema SystemMessage to additional_messages_for_state for RefinedAgentState.")
 
 
     # --- 4. Prepare messages_for_swarm ---
-    messages_for_swarm: List[BaseMessage] = []
-    
-    # 4a. Add Contextualizer's insights as a SystemMessage if available
+    # Layout for provider prefix caching (see prompt_layout): the agent prompt and tool schemas are
+    # placed first by create_react_agent, followed by the schema reference and other static documents,
+    # then the unmodified history, and only then the per-turn contextual insights.
+    stable_context_messages: List[BaseMessage] = []
+    if schema_to_use_for_this_run and schema_to_use_for_this_run.strip():
+        stable_context_messages.append(schema_context_message(schema_to_use_for_this_run))
+    stable_context_messages.extend(context_document_messages(PROMPT_CONTEXT_DOCUMENTS))
+
+    volatile_context_messages: List[BaseMessage] = []
     if context_insights_str:
-        messages_for_swarm.append(SystemMessage(content=context_insights_str))
-        # print(f"DEBUG: Prepended contextual insights to messages_for_swarm.")
-
-    # 4b. Prepare a mutable copy of the main conversation history
-    current_history_for_swarm = list(processed_input_messages)
-
-    # 4c. Append schema to the last HumanMessage ONLY IF it's the FIRST TURN of the session.
-    # The `query_needs_schema_flag` is NOT used for this decision anymore.
-    # print(f"DEBUG: Current turn for schema append check: {current_turn}")
-    if current_turn == 1 and schema_to_use_for_this_run and schema_to_use_for_this_run.strip():
-        last_human_message_index = -1
-        # Ensure there's at least one message and it's human, to avoid errors if history is unexpectedly empty
-        if current_history_for_swarm: 
-            for i in range(len(current_history_for_swarm) - 1, -1, -1):
-                if isinstance(current_history_for_swarm[i], HumanMessage):
-                    last_human_message_index = i
-                    break
-        
-        if last_human_message_index != -1:
-            original_human_message = current_history_for_swarm[last_human_message_index]
-            original_human_content = _extract_string_content_from_message(original_human_message)
-            
-            new_human_content = (
-                f"{original_human_content}"
-                f"{SCHEMA_APPENDIX_DELIMITER_START}" # Ensure these delimiters are defined globally
-                f"{schema_to_use_for_this_run}"
-                f"{SCHEMA_APPENDIX_DELIMITER_END}"
-            )
-            
-            modified_human_message = HumanMessage(content=new_human_content)
-            if hasattr(original_human_message, 'id') and original_human_message.id:
-                 modified_human_message.id = original_human_message.id
-            # Add other attributes if needed (e.g., name)
+        volatile_context_messages.append(SystemMessage(content=context_insights_str))
 
-            current_history_for_swarm[last_human_message_index] = modified_human_message
-            # print(f"DEBUG: Schema appended to HumanMessage because current_turn == 1.")
-    
-    # 4d. Add the (potentially modified on first turn) history to messages_for_swarm
-    messages_for_swarm.extend(current_history_for_swarm)
+    messages_for_swarm: List[BaseMessage] = assemble_messages(
+        history=processed_input_messages,
+        stable=stable_context_messages,
+        volatile=volatile_context_messages,
+    )
     
     # print(f"DEBUG: Messages for swarm prepared. Total messages: {len(messages_for_swarm)}") # Corrected print statement from your snippet
     # --- 5. Invoke the Swarm Agent ---
@@ -414,15 +541,33 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     # if schema_to_use_for_this_run:
     #     swarm_input_state["current_graphql_schema"] = schema_to_use_for_this_run
 
-    result = await compiled_graph.ainvoke(swarm_input_state, config=config)
+    swarm_config = config
+    if config.get("configurable", {}).get("stream_refined_output", STREAM_REFINED_OUTPUT_DEFAULT):
+        # Only the refined answer is streamed to the user; keep the swarm's draft tokens off /stream.
+        swarm_config = {**config, "tags": [*(config.get("tags") or []), "skip_stream"]}
+
+    with get_usage_metadata_callback() as usage_callback:
+        result = await compiled_graph.ainvoke(swarm_input_state, config=swarm_config)
+    cache_report = prompt_cache_report(usage_callback.usage_metadata)
+    log_prompt_cache_report("app_agent", cache_report)
 
     # --- 6. Extract Output from Swarm ---
     final_messages_from_swarm = result.get("messages", [])
     current_agent_tool_outputs: List[str] = []
+    wyscout_tool_calls: List[Dict[str, Any]] = []
+    tool_failed = False
     app_output_content = ""
     for msg_from_swarm in final_messages_from_swarm:
+        if isinstance(msg_from_swarm, AIMessage):
+            wyscout_tool_calls.extend(
+                {"name": call["name"], "args": call.get("args", {})}
+                for call in msg_from_swarm.tool_calls
+                if call["name"].startswith("wyscout_")
+            )
         if isinstance(msg_from_swarm, ToolMessage):
             current_agent_tool_outputs.append(str(msg_from_swarm.content or ""))
+            if msg_from_swarm.status == "error" or '"error"' in str(msg_from_swarm.content or ""):
+                tool_failed = True
         if isinstance(msg_from_swarm, AIMessage):
              app_output_content = str(msg_from_swarm.content or "")
              
@@ -493,6 +638,8 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     if not reasoning_narrative:
         reasoning_narrative = "Agent processed user query through multi-step workflow"
     
+    await schema_injection_cache.aset(session_id, schema_tracker)
+
     # --- 8. Return results ---
     # The 'messages' key here will ensure LangGraph appends additional_messages_for_state
     # to the RefinedAgentState.messages via the operator.add mechanism.
@@ -500,8 +647,15 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
         "app_output": app_output_content,
         "agent_tool_outputs": detailed_tool_outputs,  # Use the formatted tool outputs
         "graphql_schema": schema_to_use_for_this_run,      # Persist the schema string
+        "graphql_schema_hash": schema_hash_for_this_run,
+        "prompt_cache_usage": {**(state.get("prompt_cache_usage") or {}), "app_agent": cache_report},
         "internal_context_insights": reasoning_narrative,  # Store reasoning for refine_output_refined
         "requires_schema_flag": None,     # Clear for next cycle
+        "schema_turn_count": schema_tracker["turn_count"],
+        "schema_last_injection_turn": schema_tracker["last_injection_turn"],
+        "tools_used": wyscout_tool_calls,
+        # Answers built on failed tool calls are never cached
+        "answer_cache_key": None if tool_failed else state.get("answer_cache_key"),
         "messages": additional_messages_for_state           # Add collected messages to state
     }
 
@@ -639,50 +793,7 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
 #     }
 
 # ------------------------------------ Refined Agent Workflow Components ------------------------------------
-class RefinedOutput(BaseModel):
-    refined_text: str = Field(description="The final, polished text after removing AI reasoning, workflow narratives, and ensuring it aligns with Telogical's voice. This field should contain only the core information intended for the user, with original formatting and detail preserved.")
-
-async def refine_output_refined(state: RefinedAgentState) -> Dict[str, Any]:
-    app_output_to_refine = state["app_output"]
-    agent_tool_outputs: List[str] = state.get("agent_tool_outputs") or []
-    
-    LATEST_MESSAGE_TAG = "[LATEST_MESSAGE] "
-    last_human_query_content = "No specific user query found for context."
-
-    # Extract last human message from the accumulated history in RefinedAgentState
-    # This history includes messages from before run_app_agent_refined was called
-    temp_messages: List[BaseMessage] = []
-    for msg_data in state.get("messages", []): # state.messages is the graph-level history
-        converted = _convert_to_base_message(msg_data)
-        if converted:
-            temp_messages.append(converted)
-            
-    for msg in reversed(temp_messages):
-        if isinstance(msg, HumanMessage):
-            content_str = _extract_string_content_from_message(msg)
-            if content_str.startswith(LATEST_MESSAGE_TAG):
-                last_human_query_content = content_str[len(LATEST_MESSAGE_TAG):]
-            else:
-                last_human_query_content = content_str
-            break
-
-    formatted_tool_outputs = "No tool outputs were recorded or applicable for the previous agent step."
-    if agent_tool_outputs:
-        formatted_tool_outputs = "Tool Outputs from Previous Agent Step:\n" + "\n".join(
-            f"{i+1}. {output_content}" for i, output_content in enumerate(agent_tool_outputs)
-        )
-    elif isinstance(agent_tool_outputs, list) and not agent_tool_outputs:
-        formatted_tool_outputs = "The previous agent step recorded that no tools were used or no outputs were generated from tools."
-
-    # print(f"Last Human Query Content: {last_human_query_content}")
-    # print(f"Formatted Tool Outputs: {formatted_tool_outputs}")
-    
-    # (Refiner prompt remains the same as it was extensive and specific)
-    # ... [Your existing long refiner_prompt SystemMessage content] ...
-    # For brevity in this response, I'm not repeating the giant prompt string.
-    # Assume REFINE_SYSTEM_PROMPT_CONTENT contains that long string.
-    
-    REFINE_SYSTEM_PROMPT_CONTENT = """ 
+REFINE_SYSTEM_PROMPT_CONTENT = """ 
     You are the **Refinement Specialist** for Telogical Systems' AI assistant. Your designated role is to meticulously process the output generated by the primary AI analysis component (`Agent Output to Refine`), ensuring that every user-facing response is impeccably polished, professional, and authentically represents the voice and high standards of Telogical Systems LLC. Consider yourself the final quality assurance step, transforming detailed analytical output into a refined, client-ready communication that directly reflects Telogical's expertise in providing exhaustive and precise data.
     
     Your primary task is to **refine and enhance** the provided `Agent Output to Refine` using the `Original Query` for context and the `Supporting Tool Outputs` as the ground truth for data. This means you must **remove specific unwanted elements** (AI thinking processes) while **preserving and often augmenting the integrity, detail, and factual substance of the information**. **Crucially, all refinements must ensure the final output remains a direct, relevant, and coherent answer to the `Original Query` that prompted the agent's output.** The goal is to produce responses that present information as Telogical's official product,  mirroring the thoroughness of a senior data analyst and appropriately addressing the user's `Original Query`, not as an AI searching a database or narrating its thought process.
@@ -744,7 +855,9 @@ async def refine_output_refined(state: RefinedAgentState) -> Dict[str, Any]:
     - **ALL TELECOMMUNICATIONS DATA IS CURRENT AS OF: {current_date}**
     
     Your role is to be the definitive voice of Telogical Systems. Filter out the AI's procedural explanations and internal monologue, delivering clear, authoritative information about telecommunications market data. The goal is to provide user responses that sound like polished, customer-facing product outputs, without revealing the AI or technical querying behind the scenes.
-    
+    """
+
+REFINE_STRUCTURED_OUTPUT_INSTRUCTIONS = """
     Your final response should be structured to contain only the refined text. This will be captured in a field named `refined_text`.
     
     **Output Structure:**
@@ -754,51 +867,133 @@ async def refine_output_refined(state: RefinedAgentState) -> Dict[str, Any]:
     - refined_text: "Here are the 2025 promotions for AT&T in Charleston, SC (zip code 29056):\n\n- AT&T Fiber 300: $55/month\n- AT&T Fiber 1000: $70/month\n- AT&T Internet 100: $50/month\n\nThese packages include...\n\n---"
     """
 
-    refiner_prompt_template = ChatPromptTemplate.from_messages([
-        SystemMessage(content=REFINE_SYSTEM_PROMPT_CONTENT),
-        HumanMessage(content=f"Original Query: {last_human_query_content}\n\nAgent Output to Refine: {app_output_to_refine}\n\nSupporting Tool Outputs from Agent's Process: {formatted_tool_outputs}"),
-    ])
+# Stream the refined answer as plain-text tokens by default; callers can override per request
+# with `agent_config={"stream_refined_output": False}` to get the structured-output refiner.
+STREAM_REFINED_OUTPUT_DEFAULT = os.getenv("STREAM_REFINED_OUTPUT", "true").lower() == "true"
+
+REFINE_STREAMING_OUTPUT_INSTRUCTIONS = """
+    Respond with the refined text only. Do not wrap it in JSON, do not add a field name, a preamble or any closing remarks: every token you write is shown to the user as it is generated.
+    """
+
+class RefinedOutput(BaseModel):
+    refined_text: str = Field(description="The final, polished text after removing AI reasoning, workflow narratives, and ensuring it aligns with Telogical's voice. This field should contain only the core information intended for the user, with original formatting and detail preserved.")
 
-    # Get the primary LLM from the framework
-    primary_llm = get_telogical_primary_llm()
-    structured_llm = primary_llm.with_structured_output(RefinedOutput)
-    chain = refiner_prompt_template | structured_llm
+async def refine_output_refined(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    app_output_to_refine = state["app_output"]
+    agent_tool_outputs: List[str] = state.get("agent_tool_outputs") or []
     
-    try:
-        response_structured = await chain.ainvoke({})
-        if isinstance(response_structured, RefinedOutput):
-            refined_content = response_structured.refined_text
-        else: # Fallback if structured output fails unexpectedly
-            refined_content = f"Error: Refinement failed. Unexpected response type: {type(response_structured)}. Output: {str(app_output_to_refine)}"
-            print(f"Warning: Refiner LLM did not return RefinedOutput. Received: {response_structured}")
-    except Exception as e:
-        print(f"Error during refinement LLM call: {e}")
-        refined_content = f"Error: Refinement process encountered an exception. Original output: {str(app_output_to_refine)}"
+    last_human_query_content = "No specific user query found for context."
+
+    # Extract last human message from the accumulated history in RefinedAgentState
+    # This history includes messages from before run_app_agent_refined was called
+    temp_messages: List[BaseMessage] = []
+    for msg_data in state.get("messages", []): # state.messages is the graph-level history
+        converted = _convert_to_base_message(msg_data)
+        if converted:
+            temp_messages.append(converted)
+            
+    for msg in reversed(temp_messages):
+        if isinstance(msg, HumanMessage):
+            content_str = _extract_string_content_from_message(msg)
+            if content_str.startswith(LATEST_MESSAGE_TAG):
+                last_human_query_content = content_str[len(LATEST_MESSAGE_TAG):]
+            else:
+                last_human_query_content = content_str
+            break
+
+    formatted_tool_outputs = "No tool outputs were recorded or applicable for the previous agent step."
+    if agent_tool_outputs:
+        formatted_tool_outputs = "Tool Outputs from Previous Agent Step:\n" + "\n".join(
+            f"{i+1}. {output_content}" for i, output_content in enumerate(agent_tool_outputs)
+        )
+    elif isinstance(agent_tool_outputs, list) and not agent_tool_outputs:
+        formatted_tool_outputs = "The previous agent step recorded that no tools were used or no outputs were generated from tools."
+
+    # print(f"Last Human Query Content: {last_human_query_content}")
+    # print(f"Formatted Tool Outputs: {formatted_tool_outputs}")
+    
+    stream_refined_output = config.get("configurable", {}).get("stream_refined_output", STREAM_REFINED_OUTPUT_DEFAULT)
+    output_instructions = REFINE_STREAMING_OUTPUT_INSTRUCTIONS if stream_refined_output else REFINE_STRUCTURED_OUTPUT_INSTRUCTIONS
 
+    refiner_prompt_template = ChatPromptTemplate.from_messages([
+        SystemMessage(content=REFINE_SYSTEM_PROMPT_CONTENT + output_instructions),
+        HumanMessage(content=f"Original Query: {last_human_query_content}\n\nAgent Output to Refine: {app_output_to_refine}\n\nSupporting Tool Outputs from Agent's Process: {formatted_tool_outputs}"),
+    ])
 
-    # Create the final AI message with trace information to enable reasoning visualization
+    # Primary LLM unless a cheaper model is configured for this node (NODE_MODELS / configurable.node_models)
+    primary_llm = get_node_llm("refine_output", config, get_telogical_primary_llm)
+    refined_message_id: Optional[str] = None
+
+    with get_usage_metadata_callback() as usage_callback:
+        if stream_refined_output:
+            # Plain-text streaming: the chunks surface through LangGraph's "messages" stream mode,
+            # so /stream shows the refined answer token by token instead of waiting for the full text.
+            chain = refiner_prompt_template | primary_llm
+            try:
+                streamed_message: Optional[AIMessageChunk] = None
+                async for chunk in chain.astream({}, config=config):
+                    streamed_message = chunk if streamed_message is None else streamed_message + chunk
+                refined_content = str(streamed_message.content or "") if streamed_message is not None else ""
+                refined_message_id = streamed_message.id if streamed_message is not None else None
+                if not refined_content.strip():
+                    refined_content = f"Error: Refinement failed. The refiner returned no text. Output: {str(app_output_to_refine)}"
+            except Exception as e:
+                print(f"Error during streaming refinement LLM call: {e}")
+                refined_content = f"Error: Refinement process encountered an exception. Original output: {str(app_output_to_refine)}"
+        else:
+            structured_llm = primary_llm.with_structured_output(RefinedOutput)
+            chain = refiner_prompt_template | structured_llm
+
+            try:
+                response_structured = await chain.ainvoke({}, config=config)
+                if isinstance(response_structured, RefinedOutput):
+                    refined_content = response_structured.refined_text
+                else: # Fallback if structured output fails unexpectedly
+                    refined_content = f"Error: Refinement failed. Unexpected response type: {type(response_structured)}. Output: {str(app_output_to_refine)}"
+                    print(f"Warning: Refiner LLM did not return RefinedOutput. Received: {response_structured}")
+            except Exception as e:
+                print(f"Error during refinement LLM call: {e}")
+                refined_content = f"Error: Refinement process encountered an exception. Original output: {str(app_output_to_refine)}"
+    cache_report = prompt_cache_report(usage_callback.usage_metadata)
+    log_prompt_cache_report("refine_output", cache_report)
+    prompt_cache_usage = {**(state.get("prompt_cache_usage") or {}), "refine_output": cache_report}
+
+
+    # Create the final AI message with trace information to enable reasoning visualization.
+    # When streaming, it reuses the id of the streamed chunks so clients can pair tokens with it.
     final_ai_message = AIMessage(
         content=refined_content,
+        id=refined_message_id,
         custom_data={
             "trace": {
                 "reasoning": state.get("internal_context_insights", "Agent processed user query through multi-step workflow."),
-                "tool_calls": state.get("agent_tool_outputs", []) if state.get("agent_tool_outputs") else []
+                "tool_calls": state.get("agent_tool_outputs", []) if state.get("agent_tool_outputs") else [],
+                "prompt_cache": prompt_cache_usage,
             }
         }
     )
 
+    cache_key = state.get("answer_cache_key")
+    if cache_key and not refined_content.startswith("Error:"):
+        await cache_answer(cache_key, last_human_query_content, refined_content, state.get("tools_used") or [])
+
     return {
         # "refined_output": refined_content,
-        "messages": [final_ai_message] # This will be added to the state's messages
+        "messages": [final_ai_message], # This will be added to the state's messages
+        "prompt_cache_usage": prompt_cache_usage,
     }
 
 async def create_refined_agent_workflow(checkpointer):
     workflow = StateGraph(RefinedAgentState)
+    workflow.add_node("manage_history", manage_history_node)
+    workflow.add_node("answer_cache", answer_cache_node)
     workflow.add_node("contextualize_query", contextualize_query_node) # New node
     workflow.add_node("app_agent", run_app_agent_refined)
     workflow.add_node("refine_output", refine_output_refined)
     
-    workflow.add_edge(START, "contextualize_query")
+    workflow.add_edge(START, "manage_history")
+    workflow.add_edge("manage_history", "answer_cache")
+    workflow.add_conditional_edges("answer_cache", route_after_answer_cache, ["contextualize_query", END])
     workflow.add_edge("contextualize_query", "app_agent")
     workflow.add_edge("app_agent", "refine_output")
     workflow.add_edge("refine_output", END)
@@ -950,6 +1145,9 @@ async def dynamic_swarm():
     if _compiled_telogical_swarm is None:
         saver = await get_saver()
         _compiled_telogical_swarm = await create_swarm_workflow(saver)
+    elif _compiled_telogical_swarm.checkpointer is None:
+        # Compiled before the workers forked (see prefork_refined_agent): use this worker's saver
+        _compiled_telogical_swarm.checkpointer = await get_saver()
     return _compiled_telogical_swarm
 
 async def dynamic_swarm_refined():
@@ -959,8 +1157,43 @@ async def dynamic_swarm_refined():
         saver = await get_saver()
         _compiled_telogical_swarm_refined = await create_refined_agent_workflow(saver)
         # print("telogical_swarm_refined compiled.") # Optional: for debugging
+    elif _compiled_telogical_swarm_refined.checkpointer is None:
+        _compiled_telogical_swarm_refined.checkpointer = await get_saver()
     return _compiled_telogical_swarm_refined
 
+
+async def prefork_refined_agent() -> None:
+    """
+    Compile both graphs without a checkpointer, in a server process that forks its workers
+    afterwards, so the workers share the compiled graphs instead of compiling their own.
+
+    Nothing here opens a connection: the LLM clients only create their (empty) HTTP pools,
+    and each worker attaches its own Postgres saver on first use, since the pool is bound to
+    the worker's event loop and its sockets must not be shared across processes.
+    """
+    global _compiled_telogical_swarm, _compiled_telogical_swarm_refined
+    if _compiled_telogical_swarm_refined is None:
+        _compiled_telogical_swarm_refined = await create_refined_agent_workflow(None)
+    if _compiled_telogical_swarm is None:
+        _compiled_telogical_swarm = await create_swarm_workflow(None)
+
+
+async def prewarm_refined_agent() -> None:
+    """
+    Build everything the first request would otherwise build lazily: the Telogical
+    checkpointer pool, both compiled graphs and the LLM clients.
+    """
+    await dynamic_swarm_refined()
+    await dynamic_swarm()
+    get_telogical_primary_llm()
+    get_telogical_secondary_llm()
+    if os.getenv("WARMUP_LLM_PING", "false").lower() == "true":
+        # One-token calls open the HTTPS connections to both model endpoints ahead of traffic
+        await asyncio.gather(
+            get_telogical_primary_llm().ainvoke("ping", max_tokens=1),
+            get_telogical_secondary_llm().ainvoke("ping", max_tokens=1),
+        )
+
 # Example of how you might run the refined swarm (add appropriate inputs)
 # async def main():
 #     checkpointer = await get_saver()
@@ -0,0 +1,104 @@
+"""Answer cache in front of the refined workflow.
+
+Refined answers to standalone factual questions are cached under a normalized form of the
+question. An entry lives only as long as the most volatile Wyscout data the answer was built
+from (see tools.freshness). Only the first question of a thread is keyed: a follow-up can
+leave out its subject ("How many goals in the 2023 season?") and its answer then depends on
+earlier turns. Answers are cached only when at least one tool was used and no tool or
+refinement step failed.
+"""
+
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+from backend.agents.wyscout.tools.freshness import min_ttl_seconds
+from backend.core.accounting import record_cache_lookup
+from backend.core.cache import TTLCache, create_cache
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# Questions shorter than this (after normalization) are too vague to share an answer
+ANSWER_CACHE_MIN_QUESTION_WORDS = int(os.getenv("ANSWER_CACHE_MIN_QUESTION_WORDS", "3"))
+
+# Politeness and request phrasing that does not change what is being asked
+_FILLER_WORDS = {
+    "please", "pls", "can", "could", "would", "you", "tell", "show", "give", "me", "i", "want",
+    "to", "know", "the", "a", "an", "whats", "what", "is", "are", "list",
+}
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    content: str
+    question: str
+    tool_calls: list[dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    ttl_seconds: float = 0.0
+
+
+answer_cache: TTLCache[str, CachedAnswer] = create_cache(
+    "answers", maxsize=ANSWER_CACHE_MAX_ENTRIES, encode=vars, decode=lambda data: CachedAnswer(**data)
+)
+
+
+def _words(question: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.replace("'", "")
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip accents and punctuation, and drop filler words."""
+    return " ".join(word for word in _words(question) if word not in _FILLER_WORDS)
+
+
+def answer_cache_key(question: str, has_prior_turns: bool) -> str | None:
+    """
+    Cache key for `question`, or None if the question should not share a cached answer.
+
+    Follow-up questions are never keyed, whether or not they visibly refer back to earlier
+    turns. The key includes the UTC date so relative expressions ("today", "this week") never
+    cross a day boundary.
+    """
+    if has_prior_turns:
+        return None
+    normalized = normalize_question(question)
+    if len(normalized.split()) < ANSWER_CACHE_MIN_QUESTION_WORDS:
+        return None
+    return f"{datetime.now(UTC).date().isoformat()}:{normalized}"
+
+
+async def get_cached_answer(key: str) -> CachedAnswer | None:
+    answer = await answer_cache.aget(key)
+    record_cache_lookup("answer_cache", hit=answer is not None)
+    if answer is not None:
+        logger.info(f"Answer cache hit for '{answer.question}' (age {time.time() - answer.created_at:.0f}s)")
+    return answer
+
+
+async def cache_answer(key: str, question: str, content: str, tool_calls: Sequence[Mapping[str, Any]]) -> bool:
+    """Cache `content` for the TTL of the data its tools returned. Returns False if not cacheable."""
+    ttl = min_ttl_seconds(tool_calls)
+    if ttl is None or not content.strip():
+        return False
+    await answer_cache.aset(
+        key,
+        CachedAnswer(
+            content=content,
+            question=question,
+            tool_calls=[{"name": call["name"], "args": call.get("args", {})} for call in tool_calls],
+            ttl_seconds=ttl,
+        ),
+        ttl=ttl,
+    )
+    return True
@@ -0,0 +1,91 @@
+"""Static context documents (GraphQL schema reference, domain taxonomy) served from memory.
+
+The documents are read from disk once, normally during service startup, together with their
+content hash and token count. Callers get the cached copy; `revalidate=True` only costs an
+`os.stat` and re-reads the file when its modification time has changed.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from backend.core.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_DOCS_DIR = Path(
+    os.getenv("CONTEXT_DOCS_DIR", Path(__file__).resolve().parents[3] / "data")
+)
+
+# Logical document name -> file name inside CONTEXT_DOCS_DIR
+CONTEXT_DOCUMENT_FILES: dict[str, str] = {
+    "graphql_schema": "graphql-schema-docs.md",
+    "taxonomy": "taxonomy.md",
+}
+
+
+@dataclass(frozen=True)
+class ContextDocument:
+    name: str
+    path: Path
+    content: str
+    content_hash: str
+    token_count: int
+    mtime: float
+
+
+_documents: dict[str, ContextDocument] = {}
+_lock = threading.Lock()
+
+
+def _read_document(name: str, path: Path) -> ContextDocument:
+    content = path.read_text(encoding="utf-8")
+    return ContextDocument(
+        name=name,
+        path=path,
+        content=content,
+        content_hash=hashlib.sha256(content.encode("utf-8")).hexdigest(),
+        token_count=count_tokens(content),
+        mtime=path.stat().st_mtime,
+    )
+
+
+def load_context_documents() -> dict[str, ContextDocument]:
+    """Load every configured context document that is not cached yet. Safe to call repeatedly."""
+    with _lock:
+        for name, file_name in CONTEXT_DOCUMENT_FILES.items():
+            if name in _documents:
+                continue
+            path = CONTEXT_DOCS_DIR / file_name
+            try:
+                _documents[name] = _read_document(name, path)
+                logger.info(
+                    f"Loaded context document '{name}' ({_documents[name].token_count} tokens)"
+                )
+            except OSError as e:
+                logger.warning(f"Context document '{name}' could not be loaded from {path}: {e}")
+        return dict(_documents)
+
+
+def get_context_document(name: str, revalidate: bool = False) -> ContextDocument | None:
+    """
+    Return the cached context document `name`, loading it on first use.
+
+    With `revalidate=True` the file is re-read only if its modification time changed; the
+    returned document keeps the same content_hash when the content itself is unchanged.
+    """
+    document = _documents.get(name)
+    if document is None:
+        return load_context_documents().get(name)
+    if revalidate:
+        try:
+            if document.path.stat().st_mtime != document.mtime:
+                with _lock:
+                    document = _read_document(name, document.path)
+                    _documents[name] = document
+        except OSError as e:
+            logger.warning(f"Context document '{name}' could not be revalidated: {e}")
+    return document
@@ -0,0 +1,140 @@
+"""Rolling history window for the refined workflow.
+
+`RefinedAgentState.messages` is append-only, so the full conversation stays in the checkpoint
+(and in /history). What is sent to the models is bounded instead:
+
+- turns older than the last HISTORY_KEEP_TURNS are folded into a running summary, persisted in
+  the state together with the index of the first message that has not been summarized yet;
+- folding happens in batches of HISTORY_SUMMARY_BATCH_TURNS so the prompt prefix only changes
+  every few turns;
+- schema injections are dropped, the current schema travels in the stable prompt prefix;
+- the oldest remaining turns are dropped if the window still exceeds HISTORY_MAX_TOKENS.
+"""
+
+import logging
+import os
+from collections.abc import Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+from backend.agents.wyscout.prompt_layout import is_schema_injection
+from backend.agents.wyscout.prompts import HISTORY_SUMMARY_PROMPT
+from backend.core.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+HISTORY_SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH_TURNS", "4"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "12000"))
+
+HISTORY_SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+# Per-message overhead of the chat format (role, separators), as counted by OpenAI.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_token_count(message: BaseMessage) -> int:
+    tokens = _MESSAGE_OVERHEAD_TOKENS + count_tokens(str(message.content or ""))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += count_tokens(str(message.tool_calls))
+    return tokens
+
+
+def split_turns(messages: Sequence[BaseMessage | None]) -> list[tuple[int, int]]:
+    """
+    Split `messages` into turns, returned as (start, end) index ranges. A turn starts at a
+    HumanMessage; anything before the first HumanMessage belongs to the first turn.
+    """
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not starts:
+        return [(0, len(messages))] if messages else []
+    starts[0] = 0
+    ends = starts[1:] + [len(messages)]
+    return list(zip(starts, ends))
+
+
+def plan_history_fold(
+    messages: Sequence[BaseMessage | None],
+    keep_turns: int = HISTORY_KEEP_TURNS,
+    batch_turns: int = HISTORY_SUMMARY_BATCH_TURNS,
+) -> int:
+    """
+    Number of leading `messages` (the unsummarized part of the history, ending with the
+    current turn) that should be folded into the summary now, or 0 if no fold is due.
+    """
+    completed_turns = split_turns(messages)[:-1]
+    if len(completed_turns) < keep_turns + max(batch_turns, 1):
+        return 0
+    fold_turns = len(completed_turns) - keep_turns
+    return completed_turns[fold_turns - 1][1]
+
+
+def history_summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"{HISTORY_SUMMARY_PREFIX}{summary}")
+
+
+def windowed_history(
+    messages: Sequence[BaseMessage | None],
+    summary: str | None = None,
+    max_tokens: int = HISTORY_MAX_TOKENS,
+) -> list[BaseMessage]:
+    """
+    The history to send to a model: the running summary (if any) followed by the unsummarized
+    turns without schema injections, trimmed from the oldest turn until it fits `max_tokens`.
+    The latest turn is always kept.
+    """
+    turns: list[list[BaseMessage]] = []
+    for start, end in split_turns(messages):
+        turn = [
+            message
+            for message in messages[start:end]
+            if message is not None and not is_schema_injection(message)
+        ]
+        if turn:
+            turns.append(turn)
+
+    prefix: list[BaseMessage] = [history_summary_message(summary)] if summary else []
+    turn_tokens = [sum(message_token_count(message) for message in turn) for turn in turns]
+    total_tokens = sum(message_token_count(message) for message in prefix) + sum(turn_tokens)
+
+    dropped_turns = 0
+    while total_tokens > max_tokens and dropped_turns < len(turns) - 1:
+        total_tokens -= turn_tokens[dropped_turns]
+        dropped_turns += 1
+    if dropped_turns:
+        logger.info(
+            f"History window: dropped {dropped_turns} oldest turn(s) to stay within {max_tokens} tokens"
+        )
+    if total_tokens > max_tokens:
+        logger.warning(f"History window: latest turn alone uses {total_tokens} tokens (ceiling {max_tokens})")
+
+    return [*prefix, *(message for turn in turns[dropped_turns:] for message in turn)]
+
+
+async def summarize_history(
+    llm: BaseChatModel,
+    previous_summary: str | None,
+    messages: Sequence[BaseMessage | None],
+    config: RunnableConfig | None = None,
+) -> str:
+    """Fold `messages` into `previous_summary` with `llm` and return the new running summary."""
+    transcript = "\n".join(
+        f"{message.type.upper()}: {str(message.content or '').strip()}"
+        for message in messages
+        if message is not None and not is_schema_injection(message) and str(message.content or "").strip()
+    )
+    response = await llm.ainvoke(
+        [
+            SystemMessage(content=HISTORY_SUMMARY_PROMPT),
+            HumanMessage(
+                content=(
+                    f"Current summary:\n{previous_summary or 'None yet.'}\n\n"
+                    f"Conversation to fold into the summary:\n{transcript}"
+                )
+            ),
+        ],
+        config=config,
+    )
+    return str(response.content or "").strip()
@@ -0,0 +1,109 @@
+"""Prompt assembly for the refined workflow, laid out for provider-side prefix caching.
+
+OpenAI-compatible providers (including Azure OpenAI) reuse the longest prompt prefix they have
+already seen. Anything that changes from turn to turn must therefore come after everything
+that does not:
+
+1. system prompt and tool schemas (placed first by the provider integration),
+2. static context documents such as the GraphQL schema reference,
+3. the conversation history, in its original order and without rewritten messages,
+4. per-turn material such as the contextualizer's insights.
+"""
+
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+from backend.agents.wyscout.context_docs import get_context_document
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_APPENDIX_DELIMITER_START = "\n\n--- BEGIN ATTACHED GRAPHQL SCHEMA (FOR AI REFERENCE) ---\n"
+SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
+
+# Additional context documents (see context_docs.CONTEXT_DOCUMENT_FILES) placed in the stable
+# prefix after the schema, e.g. PROMPT_CONTEXT_DOCUMENTS="taxonomy".
+PROMPT_CONTEXT_DOCUMENTS = [
+    name.strip() for name in os.getenv("PROMPT_CONTEXT_DOCUMENTS", "").split(",") if name.strip()
+]
+
+
+def schema_context_message(schema: str) -> SystemMessage:
+    """The schema reference as a SystemMessage. Its wording is fixed so the prefix stays byte-identical."""
+    return SystemMessage(
+        content=(
+            f"Context: The following GraphQL schema was identified as relevant for the current turn "
+            f"and is available to the agent system if needed for query formulation or understanding capabilities:\n"
+            f"{SCHEMA_APPENDIX_DELIMITER_START}"
+            f"{schema}"
+            f"{SCHEMA_APPENDIX_DELIMITER_END}"
+        )
+    )
+
+
+def is_schema_injection(message: BaseMessage) -> bool:
+    """True for schema SystemMessages previously appended to the thread history."""
+    return (
+        isinstance(message, SystemMessage)
+        and isinstance(message.content, str)
+        and SCHEMA_APPENDIX_DELIMITER_START in message.content
+    )
+
+
+def context_document_messages(names: Sequence[str] = ()) -> list[SystemMessage]:
+    """SystemMessages for the named static context documents, in the given order."""
+    messages: list[SystemMessage] = []
+    for name in names:
+        document = get_context_document(name)
+        if document is None:
+            continue
+        messages.append(
+            SystemMessage(content=f"Reference document '{name}':\n\n{document.content}")
+        )
+    return messages
+
+
+def assemble_messages(
+    history: Sequence[BaseMessage] = (),
+    stable: Sequence[BaseMessage] = (),
+    volatile: Sequence[BaseMessage] = (),
+) -> list[BaseMessage]:
+    """
+    Lay out a prompt as stable prefix, then history, then volatile suffix.
+
+    Schema injections are removed from the history because the current schema is carried
+    once in the stable prefix instead.
+    """
+    return [
+        *stable,
+        *(message for message in history if not is_schema_injection(message)),
+        *volatile,
+    ]
+
+
+def prompt_cache_report(usage_metadata: Mapping[str, Mapping[str, Any]]) -> dict[str, int]:
+    """
+    Summarize provider token usage, keyed by model name as collected by
+    `get_usage_metadata_callback`, into input, cached-input and output token totals.
+    """
+    report = {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+    for usage in usage_metadata.values():
+        report["input_tokens"] += usage.get("input_tokens", 0) or 0
+        report["output_tokens"] += usage.get("output_tokens", 0) or 0
+        input_details: Mapping[str, Any] | None = usage.get("input_token_details")
+        if input_details:
+            report["cached_input_tokens"] += input_details.get("cache_read", 0) or 0
+    return report
+
+
+def log_prompt_cache_report(node: str, report: Mapping[str, int]) -> None:
+    if not report.get("input_tokens"):
+        return
+    hit_ratio = report["cached_input_tokens"] / report["input_tokens"]
+    logger.info(
+        f"Prompt cache [{node}]: {report['cached_input_tokens']}/{report['input_tokens']} "
+        f"input tokens served from cache ({hit_ratio:.0%})"
+    )
@@ -9,4 +9,11 @@ current_date = datetime.date.today()
 
 REFLECTION_PROMPT = " "
 MAIN_PROMPT = " "
+# Sent verbatim as the system message; the chat history and latest query follow in a separate
+# message, so keep this prompt free of per-turn content to preserve the cacheable prefix.
 CONTEXTUALIZER_SYSTEM_PROMPT = " "
+
+HISTORY_SUMMARY_PROMPT = """You maintain a running summary of a football scouting conversation between a user and an assistant backed by the Wyscout API.
+Update the current summary with the new conversation excerpt and return only the updated summary.
+Keep every fact a later question may depend on: players, teams, competitions, seasons, matches and their IDs, the metrics and filters the user asked about, key figures returned, and the user's stated preferences or open follow-ups.
+Drop greetings, repetition and formatting. Write compact bullet points starting with '* ', at most 300 words in total."""
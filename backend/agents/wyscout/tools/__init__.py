@@ -11,6 +11,22 @@ from backend.agents.wyscout.tools.search import wyscout_id_search
 from backend.agents.wyscout.tools.seasons import wyscout_season_info
 from backend.agents.wyscout.tools.teams import wyscout_team_info
 from backend.agents.wyscout.tools.videos import wyscout_video_tool
+from backend.agents.wyscout.tools.result_store import with_shared_results
+
+# Every tool checks the shared result store before calling Wyscout
+wyscout_advanced_stats = with_shared_results(wyscout_advanced_stats)
+wyscout_area_list = with_shared_results(wyscout_area_list)
+wyscout_coach_info = with_shared_results(wyscout_coach_info)
+wyscout_competition_info = with_shared_results(wyscout_competition_info)
+wyscout_match_events = with_shared_results(wyscout_match_events)
+wyscout_match_info = with_shared_results(wyscout_match_info)
+wyscout_player_info = with_shared_results(wyscout_player_info)
+wyscout_referee_info = with_shared_results(wyscout_referee_info)
+wyscout_round_info = with_shared_results(wyscout_round_info)
+wyscout_id_search = with_shared_results(wyscout_id_search)
+wyscout_season_info = with_shared_results(wyscout_season_info)
+wyscout_team_info = with_shared_results(wyscout_team_info)
+wyscout_video_tool = with_shared_results(wyscout_video_tool)
 
 
 __all__ = ["wyscout_advanced_stats", "wyscout_area_list", "wyscout_coach_info", "wyscout_competition_info",
@@ -26,6 +26,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
+from backend.agents.wyscout.tools.transport import wyscout_get
 import random 
 import re
 import pandas as pd 
@@ -126,9 +127,7 @@ class WyscoutAdvancedStatsTool:
         if 'fetch' in clean_params and isinstance(clean_params['fetch'], list):
             clean_params['fetch'] = ','.join(clean_params['fetch'])
         try:
-            async with session.get(url, headers=headers, params=clean_params, timeout=self.timeout) as response:
-                response.raise_for_status()
-                return await response.json()
+            return await wyscout_get(session, url, headers=headers, params=clean_params, timeout=self.timeout)
         except aiohttp.ClientResponseError as e:
             return {"error": f"API Error: {e.status}", "message": e.message}
         except Exception as e:
@@ -26,6 +26,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
+from backend.agents.wyscout.tools.transport import wyscout_get
 import random 
 import re
 import pandas as pd 
@@ -96,9 +97,7 @@ class WyscoutAreaTool:
         headers = {"Authorization": self.auth_token}
         url = f"{WYSCOUT_API_BASE_URL}{endpoint}"
         try:
-            async with session.get(url, headers=headers, timeout=self.timeout) as response:
-                response.raise_for_status()
-                return await response.json()
+            return await wyscout_get(session, url, headers=headers, timeout=self.timeout)
         except aiohttp.ClientResponseError as e:
             return [{"error": f"API Error: {e.status}", "message": e.message}]
         except Exception as e:
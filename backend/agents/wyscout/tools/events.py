@@ -26,6 +26,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
+from backend.agents.wyscout.tools.transport import wyscout_get
 import random 
 import re
 import pandas as pd 
@@ -122,14 +123,25 @@ class WyscoutMatchEventsTool:
                 clean_params[k] = ','.join(v) if isinstance(v, list) else v
         
         try:
-            async with session.get(url, headers=headers, params=clean_params, timeout=self.timeout) as response:
-                response.raise_for_status()
-                return await response.json()
+            return await wyscout_get(session, url, headers=headers, params=clean_params, timeout=self.timeout)
         except aiohttp.ClientResponseError as e:
             return [{"error": f"API Error: {e.status}", "message": e.message}]
         except Exception as e:
             return [{"error": "An unexpected error occurred", "details": str(e)}]
 
+    def _filter_events(self, events: List[Dict[str, Any]], input_data: MatchEventsInput) -> List[Dict[str, Any]]:
+        """Applies the client-side filters of `input_data` to a fetched event list."""
+        filtered_events = events
+        if input_data.filter_by_period:
+            filtered_events = [e for e in filtered_events if e.get('matchPeriod') in input_data.filter_by_period]
+        if input_data.filter_by_team_id:
+            filtered_events = [e for e in filtered_events if e.get('team', {}).get('id') == input_data.filter_by_team_id]
+        if input_data.filter_by_player_id:
+            filtered_events = [e for e in filtered_events if e.get('player', {}).get('id') == input_data.filter_by_player_id]
+        if input_data.filter_by_primary_types:
+            filtered_events = [e for e in filtered_events if e.get('type', {}).get('primary') in input_data.filter_by_primary_types]
+        return filtered_events
+
     async def _get_match_events_async(self, **kwargs) -> Dict[str, Any]:
         """Asynchronously fetches and then filters match events."""
         try:
@@ -153,15 +165,7 @@ class WyscoutMatchEventsTool:
             return full_events_list[0]
 
         # Step 2: Apply client-side filters if provided
-        filtered_events = full_events_list
-        if input_data.filter_by_period:
-            filtered_events = [e for e in filtered_events if e.get('matchPeriod') in input_data.filter_by_period]
-        if input_data.filter_by_team_id:
-            filtered_events = [e for e in filtered_events if e.get('team', {}).get('id') == input_data.filter_by_team_id]
-        if input_data.filter_by_player_id:
-            filtered_events = [e for e in filtered_events if e.get('player', {}).get('id') == input_data.filter_by_player_id]
-        if input_data.filter_by_primary_types:
-            filtered_events = [e for e in filtered_events if e.get('type', {}).get('primary') in input_data.filter_by_primary_types]
+        filtered_events = self._filter_events(full_events_list, input_data)
 
         return {
             "match_id": input_data.match_id,
@@ -0,0 +1,68 @@
+"""How long data returned by each Wyscout tool stays fresh.
+
+Every tool is mapped to a freshness class, and every class to a time-to-live. Anything derived
+from tool output (cached answers, cached tool results) must not outlive the most volatile data
+it used. Unknown tools are treated as live data.
+"""
+
+import os
+from collections.abc import Iterable, Mapping
+from enum import StrEnum
+from typing import Any
+
+
+class DataFreshness(StrEnum):
+    STATIC = "static"  # Areas and other lookup tables
+    REFERENCE = "reference"  # Biographical and structural data: people, competitions, season metadata
+    SEASONAL = "seasonal"  # Aggregates that move after each match day: career stats, advanced stats
+    LIVE = "live"  # Standings, fixtures, match data and events
+
+
+FRESHNESS_TTL_SECONDS: dict[DataFreshness, float] = {
+    DataFreshness.STATIC: float(os.getenv("WYSCOUT_TTL_STATIC_SECONDS", "604800")),
+    DataFreshness.REFERENCE: float(os.getenv("WYSCOUT_TTL_REFERENCE_SECONDS", "86400")),
+    DataFreshness.SEASONAL: float(os.getenv("WYSCOUT_TTL_SEASONAL_SECONDS", "3600")),
+    DataFreshness.LIVE: float(os.getenv("WYSCOUT_TTL_LIVE_SECONDS", "300")),
+}
+
+TOOL_FRESHNESS: dict[str, DataFreshness] = {
+    "wyscout_area_list": DataFreshness.STATIC,
+    "wyscout_id_search": DataFreshness.REFERENCE,
+    "wyscout_coach_info": DataFreshness.REFERENCE,
+    "wyscout_referee_info": DataFreshness.REFERENCE,
+    "wyscout_competition_info": DataFreshness.REFERENCE,
+    "wyscout_video_tool": DataFreshness.REFERENCE,
+    "wyscout_player_info": DataFreshness.SEASONAL,
+    "wyscout_team_info": DataFreshness.SEASONAL,
+    "wyscout_round_info": DataFreshness.SEASONAL,
+    "wyscout_advanced_stats": DataFreshness.SEASONAL,
+    "wyscout_season_info": DataFreshness.LIVE,
+    "wyscout_match_info": DataFreshness.LIVE,
+    "wyscout_match_events": DataFreshness.LIVE,
+}
+
+# Season calls that only request these actions read structural data, not live tables
+_SEASON_REFERENCE_ACTIONS = {"get_details", "get_teams", "get_players"}
+
+
+def tool_freshness(tool_name: str, args: Mapping[str, Any] | None = None) -> DataFreshness:
+    """Freshness class of a tool call, narrowed by its arguments where the tool allows it."""
+    freshness = TOOL_FRESHNESS.get(tool_name, DataFreshness.LIVE)
+    if tool_name == "wyscout_season_info" and args:
+        requested = {key for key, value in args.items() if key.startswith("get_") and value is True}
+        if requested and requested <= _SEASON_REFERENCE_ACTIONS:
+            freshness = DataFreshness.REFERENCE
+    return freshness
+
+
+def tool_ttl_seconds(tool_name: str, args: Mapping[str, Any] | None = None) -> float:
+    return FRESHNESS_TTL_SECONDS[tool_freshness(tool_name, args)]
+
+
+def min_ttl_seconds(tool_calls: Iterable[Mapping[str, Any]]) -> float | None:
+    """
+    TTL of data derived from all of `tool_calls` (dicts with "name" and "args", as in
+    AIMessage.tool_calls), or None if no tools were called.
+    """
+    ttls = [tool_ttl_seconds(call["name"], call.get("args")) for call in tool_calls]
+    return min(ttls) if ttls else None
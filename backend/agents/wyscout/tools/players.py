@@ -26,6 +26,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
+from backend.agents.wyscout.tools.transport import wyscout_get
 import random 
 import re
 import pandas as pd 
@@ -86,11 +87,9 @@ class WyscoutPlayerTool:
         headers = {"Authorization": self.auth_token}
         url = f"{WYSCOUT_API_BASE_URL}{endpoint}"
         try:
-            async with session.get(url, headers=headers, params=params, timeout=self.timeout) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    return {"error": f"API Error: {response.status}", "details": await response.text()}
+            return await wyscout_get(session, url, headers=headers, params=params, timeout=self.timeout)
+        except aiohttp.ClientResponseError as e:
+            return {"error": f"API Error: {e.status}", "details": e.message}
         except asyncio.TimeoutError:
             return {"error": "Request timed out"}
         except Exception as e:
@@ -0,0 +1,144 @@
+"""Cross-thread store for Wyscout tool results.
+
+Tool calls are looked up in the graph's configured store (see `initialize_store`) before
+Wyscout is called, keyed by tool name and the canonicalized, defaults-filled arguments.
+Entries expire after the freshness TTL of the call (see tools.freshness); stores with TTL
+support sweep them, and expired entries found on lookup are deleted. With the Postgres
+store the results are shared by every thread, user and service replica; with the in-memory
+store they are shared within one process.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+
+from langchain_core.runnables.config import run_in_executor
+from langchain_core.tools import StructuredTool
+from langgraph.config import get_store
+from langgraph.store.base import BaseStore
+from pydantic import ValidationError
+
+from backend.agents.wyscout.tools.freshness import tool_ttl_seconds
+from backend.core.accounting import record_cache_lookup
+from backend.core.metrics import TOOL_DURATION
+
+logger = logging.getLogger(__name__)
+
+TOOL_RESULT_STORE_ENABLED = os.getenv("TOOL_RESULT_STORE_ENABLED", "true").lower() == "true"
+TOOL_RESULT_NAMESPACE = ("wyscout", "tool_results")
+
+
+def canonical_tool_args(tool: StructuredTool, args: dict[str, Any]) -> dict[str, Any]:
+    """Arguments with schema defaults filled in and values in JSON form, so equal calls compare equal."""
+    schema = tool.args_schema
+    if isinstance(schema, type):
+        try:
+            return schema.model_validate(args).model_dump(mode="json")
+        except ValidationError:
+            pass
+    return json.loads(json.dumps(args, default=str))
+
+
+def tool_result_key(args: dict[str, Any]) -> str:
+    canonical = json.dumps(args, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _has_error(result: Any) -> bool:
+    """Tools report failures as {"error": ...}, at the top level or nested in per-request results."""
+    if isinstance(result, dict):
+        return "error" in result or any(_has_error(value) for value in result.values())
+    if isinstance(result, list):
+        return any(_has_error(value) for value in result)
+    return False
+
+
+def _current_store() -> BaseStore | None:
+    try:
+        return get_store()
+    except RuntimeError:
+        # Called outside a graph run (e.g. from a notebook); nothing to share with
+        return None
+
+
+async def _cached_call(tool: StructuredTool, args: dict[str, Any]) -> Any:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        outcome, result = await _store_or_call(tool, args)
+        return result
+    finally:
+        TOOL_DURATION.observe(time.perf_counter() - start, tool=tool.name, cache=outcome)
+
+
+async def _store_or_call(tool: StructuredTool, args: dict[str, Any]) -> tuple[str, Any]:
+    """Result of the tool call, and whether the shared store was hit, missed or is off."""
+    store = _current_store() if TOOL_RESULT_STORE_ENABLED else None
+    if store is None:
+        return "off", await run_in_executor(None, tool.func, **args)
+
+    canonical_args = canonical_tool_args(tool, args)
+    namespace = (*TOOL_RESULT_NAMESPACE, tool.name)
+    key = tool_result_key(canonical_args)
+
+    try:
+        item = await store.aget(namespace, key)
+    except Exception as e:
+        logger.warning(f"Tool result store lookup failed for {tool.name}: {e}")
+        item = None
+    hit = item is not None and item.value.get("expires_at", 0) > time.time()
+    record_cache_lookup("tool_results", hit=hit)
+    if hit:
+        logger.info(f"Tool result store hit for {tool.name} (age {time.time() - item.value['fetched_at']:.0f}s)")
+        return "hit", item.value["result"]
+    if item is not None:
+        # Expired; drop it so results that are not fetched again do not pile up
+        try:
+            await store.adelete(namespace, key)
+        except Exception as e:
+            logger.warning(f"Tool result store delete failed for {tool.name}: {e}")
+
+    result = await run_in_executor(None, tool.func, **args)
+    if _has_error(result):
+        return "miss", result
+
+    fetched_at = time.time()
+    ttl_seconds = tool_ttl_seconds(tool.name, canonical_args)
+    try:
+        await store.aput(
+            namespace,
+            key,
+            {
+                "args": canonical_args,
+                "result": result,
+                "fetched_at": fetched_at,
+                "expires_at": fetched_at + ttl_seconds,
+            },
+            index=False,
+            # Stores with TTL support sweep the entry themselves (the TTL is in minutes)
+            **({"ttl": ttl_seconds / 60} if store.supports_ttl else {}),
+        )
+    except Exception as e:
+        logger.warning(f"Tool result store write failed for {tool.name}: {e}")
+    return "miss", result
+
+
+def with_shared_results(tool: StructuredTool) -> StructuredTool:
+    """
+    The same tool, with an async implementation that consults the shared result store first.
+    The synchronous path is left uncached.
+    """
+
+    async def coroutine(**kwargs: Any) -> Any:
+        return await _cached_call(tool, kwargs)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=tool.func,
+        coroutine=coroutine,
+    )
@@ -26,6 +26,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
+from backend.agents.wyscout.tools.transport import wyscout_get
 import random 
 import re
 import pandas as pd 
@@ -154,24 +155,22 @@ class WyscoutIdSearch:
 
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=clean_params, timeout=self.timeout) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    
-                    results = data if isinstance(data, list) else data.get(f'{entity_type}s', [])
-
-                    if not results:
-                        return {"message": f"No {entity_type} found matching '{search_term}'."}
-
-                    # Apply the appropriate parser based on entity type
-                    parser_map = {
-                        'player': self._parse_player_results,
-                        'team': self._parse_team_results,
-                        'competition': self._parse_competition_results,
-                        'referee': self._parse_referee_results # NEW
-                    }
-                    parsed_results = parser_map[entity_type](results)
-                    return {"potential_matches": parsed_results[:limit]}
+                data = await wyscout_get(session, url, headers=headers, params=clean_params, timeout=self.timeout)
+
+            results = data if isinstance(data, list) else data.get(f'{entity_type}s', [])
+
+            if not results:
+                return {"message": f"No {entity_type} found matching '{search_term}'."}
+
+            # Apply the appropriate parser based on entity type
+            parser_map = {
+                'player': self._parse_player_results,
+                'team': self._parse_team_results,
+                'competition': self._parse_competition_results,
+                'referee': self._parse_referee_results # NEW
+            }
+            parsed_results = parser_map[entity_type](results)
+            return {"potential_matches": parsed_results[:limit]}
 
         except aiohttp.ClientResponseError as e:
             return {"error": f"API Error: {e.status}", "message": e.message}
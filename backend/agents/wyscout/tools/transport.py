@@ -0,0 +1,191 @@
+"""Shared HTTP path for the Wyscout tools, with optional record/replay of the traffic.
+
+Every tool sends its GET requests through `wyscout_get`. WYSCOUT_HTTP_MODE selects:
+
+- live (default): call the API.
+- record: call the API and also save each request/response pair as a gzip-compressed JSON
+  cassette under WYSCOUT_CASSETTE_DIR, with the Authorization header scrubbed.
+- replay: never touch the network; serve the recorded response for the same path and query,
+  either after the originally measured time (WYSCOUT_REPLAY_TIMING=original) or immediately
+  (WYSCOUT_REPLAY_TIMING=none). A request without a cassette fails with CassetteMissingError.
+
+Cassettes are keyed by method, path relative to WYSCOUT_API_BASE_URL and sorted query
+parameters, so recordings made against production replay against any base URL. Re-recording
+a request overwrites its cassette.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from backend.core.accounting import record_wyscout_call
+from backend.core.metrics import WYSCOUT_REQUEST_DURATION, WYSCOUT_RESPONSES
+from backend.core.tracing import SPAN_KIND_CLIENT, current_span, start_span
+
+logger = logging.getLogger(__name__)
+
+WYSCOUT_API_BASE_URL = os.getenv("WYSCOUT_API_BASE_URL", "https://apirest.wyscout.com/v2")
+WYSCOUT_HTTP_MODE = os.getenv("WYSCOUT_HTTP_MODE", "live").lower()  # live | record | replay
+WYSCOUT_CASSETTE_DIR = Path(os.getenv("WYSCOUT_CASSETTE_DIR", "cassettes/wyscout"))
+WYSCOUT_REPLAY_TIMING = os.getenv("WYSCOUT_REPLAY_TIMING", "original").lower()  # original | none
+
+# Never written to a cassette
+SCRUBBED_HEADERS = {"authorization", "cookie", "set-cookie", "proxy-authorization"}
+REDACTED = "<redacted>"
+
+
+class CassetteMissingError(Exception):
+    """Raised in replay mode when no cassette was recorded for a request."""
+
+
+def _relative_path(url: str) -> str:
+    base_path = URL(WYSCOUT_API_BASE_URL).path.rstrip("/")
+    path = URL(url).path
+    return path[len(base_path):] if base_path and path.startswith(base_path) else path
+
+
+def _clean_params(params: Mapping[str, Any] | None) -> dict[str, str]:
+    return {str(k): str(v) for k, v in (params or {}).items() if v is not None}
+
+
+def cassette_key(method: str, url: str, params: Mapping[str, Any] | None = None) -> str:
+    # Query parameters already encoded in the URL count the same as those passed separately
+    query = {**dict(URL(url).query), **_clean_params(params)}
+    canonical = json.dumps([method.upper(), _relative_path(url), sorted(query.items())], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def cassette_path(key: str) -> Path:
+    return WYSCOUT_CASSETTE_DIR / key[:2] / f"{key}.json.gz"
+
+
+def _scrub(headers: Mapping[str, str]) -> dict[str, str]:
+    return {k: REDACTED if k.lower() in SCRUBBED_HEADERS else v for k, v in headers.items()}
+
+
+def _write_cassette(key: str, interaction: dict[str, Any]) -> None:
+    path = cassette_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(interaction, f, separators=(",", ":"))
+    tmp_path.replace(path)
+
+
+@lru_cache(maxsize=512)
+def _read_cassette(key: str) -> dict[str, Any]:
+    path = cassette_path(key)
+    if not path.is_file():
+        raise CassetteMissingError(f"No cassette {path.name} in {WYSCOUT_CASSETTE_DIR}")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _count_response(status: int, response_bytes: int) -> None:
+    WYSCOUT_RESPONSES.inc(status=status)
+    record_wyscout_call(response_bytes, error=status >= 400)
+    span = current_span()
+    if span is not None:
+        span.set_attribute("http.response.status_code", status)
+        span.set_attribute("http.response.body.size", response_bytes)
+
+
+def _response_error(url: str, status: int, reason: str, headers: Mapping[str, str]) -> aiohttp.ClientResponseError:
+    """The same exception `raise_for_status` gives, so the tools' error handling is unchanged."""
+    request_headers = CIMultiDictProxy(CIMultiDict(headers))
+    request_info = aiohttp.RequestInfo(URL(url), "GET", request_headers, URL(url))
+    return aiohttp.ClientResponseError(request_info, (), status=status, message=reason)
+
+
+async def _replay(url: str, params: Mapping[str, Any] | None, headers: Mapping[str, str]) -> Any:
+    key = cassette_key("GET", url, params)
+    interaction = await asyncio.to_thread(_read_cassette, key)
+    if WYSCOUT_REPLAY_TIMING == "original":
+        await asyncio.sleep(interaction.get("elapsed", 0.0))
+    response = interaction["response"]
+    _count_response(response["status"], len(response["body"]))
+    if response["status"] >= 400:
+        raise _response_error(url, response["status"], response.get("reason", ""), headers)
+    return json.loads(response["body"])
+
+
+async def _record(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: Mapping[str, Any] | None,
+    headers: Mapping[str, str],
+    timeout: Any,
+) -> Any:
+    start = time.perf_counter()
+    async with session.get(url, headers=headers, params=params, timeout=timeout) as response:
+        body = await response.text()
+        elapsed = time.perf_counter() - start
+        status, reason = response.status, response.reason or ""
+        response_headers = {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "retry-after")}
+
+    interaction = {
+        "recorded_at": datetime.now(UTC).isoformat(),
+        "elapsed": round(elapsed, 4),
+        "request": {
+            "method": "GET",
+            "path": _relative_path(url),
+            "params": _clean_params(params),
+            "headers": _scrub(headers),
+        },
+        "response": {"status": status, "reason": reason, "headers": response_headers, "body": body},
+    }
+    _count_response(status, len(body))
+    key = cassette_key("GET", url, params)
+    try:
+        await asyncio.to_thread(_write_cassette, key, interaction)
+    except OSError as e:
+        logger.warning(f"Could not write Wyscout cassette for {interaction['request']['path']}: {e}")
+
+    if status >= 400:
+        raise _response_error(url, status, reason, headers)
+    return json.loads(body)
+
+
+async def wyscout_get(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: Mapping[str, str],
+    params: Mapping[str, Any] | None = None,
+    timeout: Any = None,
+) -> Any:
+    """
+    GET `url` and return the decoded JSON body. Raises aiohttp.ClientResponseError for 4xx/5xx
+    responses, like `response.raise_for_status()`, in every mode.
+    """
+    path = _relative_path(url)
+    span_attributes = {"http.request.method": "GET", "url.path": path, "wyscout.http_mode": WYSCOUT_HTTP_MODE}
+    with start_span(f"GET {path}", SPAN_KIND_CLIENT, **span_attributes):
+        start = time.perf_counter()
+        try:
+            if WYSCOUT_HTTP_MODE == "replay":
+                return await _replay(url, params, headers)
+            if WYSCOUT_HTTP_MODE == "record":
+                return await _record(session, url, params, headers, timeout)
+            async with session.get(url, headers=headers, params=params, timeout=timeout) as response:
+                body = await response.read()
+                _count_response(response.status, len(body))
+                response.raise_for_status()
+                return await response.json()
+        except (TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError):
+            WYSCOUT_RESPONSES.inc(status="error")
+            raise
+        finally:
+            WYSCOUT_REQUEST_DURATION.observe(time.perf_counter() - start)
@@ -10,6 +10,7 @@ from backend.schema import (
     ChatHistoryInput,
     ChatMessage,
     Feedback,
+    JobStatus,
     ServiceMetadata,
     StreamInput,
     UserInput,
@@ -42,13 +43,6 @@ class AgentClient:
         if base_url is None:
             base_url = os.getenv("TELOGICAL_API_URL", "http://0.0.0.0")
 
-        Args:
-            base_url (str): The base URL of the agent service.
-            agent (str): The name of the default agent to use.
-            timeout (float, optional): The timeout for requests.
-            get_info (bool, optional): Whether to fetch agent information on init.
-                Default: True
-        """
         self.base_url = base_url
         self.auth_secret = os.getenv("AUTH_SECRET")
         self.timeout = timeout
@@ -183,7 +177,18 @@ class AgentClient:
 
         return ChatMessage.model_validate(response.json())
 
+    @staticmethod
+    def _is_stream_end(line: str) -> bool:
+        return line.strip() == "data: [DONE]"
+
     def _parse_stream_line(self, line: str) -> ChatMessage | str | None:
+        """
+        Parse one line of the SSE stream. Returns None for lines with nothing to yield: blank
+        lines, comments, unknown frame types and the final [DONE].
+
+        Several frames can arrive in one network chunk, and a token frame can hold several
+        coalesced tokens; both look the same line by line.
+        """
         line = line.strip()
         if line.startswith("data: "):
             data = line[6:]
@@ -257,10 +262,10 @@ class AgentClient:
             ) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
-                    if line.strip():
-                        parsed = self._parse_stream_line(line)
-                        if parsed is None:
-                            break
+                    if self._is_stream_end(line):
+                        break
+                    parsed = self._parse_stream_line(line)
+                    if parsed is not None:
                         yield parsed
         except httpx.HTTPError as e:
             raise AgentClientError(f"Error: {e}")
@@ -315,10 +320,10 @@ class AgentClient:
                 ) as response:
                     response.raise_for_status()
                     async for line in response.aiter_lines():
-                        if line.strip():
-                            parsed = self._parse_stream_line(line)
-                            if parsed is None:
-                                break
+                        if self._is_stream_end(line):
+                            break
+                        parsed = self._parse_stream_line(line)
+                        if parsed is not None:
                             yield parsed
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
@@ -347,14 +352,24 @@ class AgentClient:
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
 
-    def get_history(self, thread_id: str) -> ChatHistory:
+    def get_history(
+        self,
+        thread_id: str,
+        before: str | None = None,
+        since: str | None = None,
+        limit: int | None = None,
+    ) -> ChatHistory:
         """
         Get chat history.
 
         Args:
             thread_id (str, optional): Thread ID for identifying a conversation
+            before (str, optional): Only messages before the message with this ID (previous page)
+            since (str, optional): Only messages after the message with this ID (incremental);
+                not together with `before`
+            limit (int, optional): Maximum number of messages to return
         """
-        request = ChatHistoryInput(thread_id=thread_id)
+        request = ChatHistoryInput(thread_id=thread_id, before=before, since=since, limit=limit)
         try:
             response = httpx.post(
                 f"{self.base_url}/history",
@@ -367,3 +382,147 @@ class AgentClient:
             raise AgentClientError(f"Error: {e}")
 
         return ChatHistory.model_validate(response.json())
+
+    async def aget_history(
+        self,
+        thread_id: str,
+        before: str | None = None,
+        since: str | None = None,
+        limit: int | None = None,
+    ) -> ChatHistory:
+        """
+        Get chat history asynchronously. See `get_history` for the arguments.
+        """
+        request = ChatHistoryInput(thread_id=thread_id, before=before, since=since, limit=limit)
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    f"{self.base_url}/history",
+                    json=request.model_dump(),
+                    headers=self._headers,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
+
+        return ChatHistory.model_validate(response.json())
+
+    def submit_job(
+        self,
+        message: str,
+        model: str | None = None,
+        thread_id: str | None = None,
+        user_id: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+    ) -> JobStatus:
+        """
+        Run the agent as a background job, for questions that take minutes. Returns at once;
+        use get_job with the job_id to follow its progress and fetch the result.
+
+        Args:
+            message (str): The message to send to the agent
+            model (str, optional): LLM model to use for the agent
+            thread_id (str, optional): Thread ID for continuing a conversation
+            user_id (str, optional): User ID for continuing a conversation across multiple threads
+            agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
+        request = UserInput(message=message)
+        if thread_id:
+            request.thread_id = thread_id
+        if model:
+            request.model = model  # type: ignore[assignment]
+        if agent_config:
+            request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
+        try:
+            response = httpx.post(
+                f"{self.base_url}/{self.agent}/jobs",
+                json=request.model_dump(),
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+
+        return JobStatus.model_validate(response.json())
+
+    async def asubmit_job(
+        self,
+        message: str,
+        model: str | None = None,
+        thread_id: str | None = None,
+        user_id: str | None = None,
+        agent_config: dict[str, Any] | None = None,
+    ) -> JobStatus:
+        """
+        Run the agent as a background job asynchronously. See `submit_job` for the arguments.
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
+        request = UserInput(message=message)
+        if thread_id:
+            request.thread_id = thread_id
+        if model:
+            request.model = model  # type: ignore[assignment]
+        if agent_config:
+            request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    f"{self.base_url}/{self.agent}/jobs",
+                    json=request.model_dump(),
+                    headers=self._headers,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
+
+        return JobStatus.model_validate(response.json())
+
+    def get_job(self, job_id: str, since: int = 0) -> JobStatus:
+        """
+        Get the state of a background job, its progress events and, once complete, its result.
+
+        Args:
+            job_id (str): ID returned by submit_job
+            since (int, optional): Only progress events from this index on; pass the previous
+                events_total to poll incrementally
+        """
+        try:
+            response = httpx.get(
+                f"{self.base_url}/jobs/{job_id}",
+                params={"since": since},
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise AgentClientError(f"Error: {e}")
+
+        return JobStatus.model_validate(response.json())
+
+    async def aget_job(self, job_id: str, since: int = 0) -> JobStatus:
+        """
+        Get the state of a background job asynchronously. See `get_job` for the arguments.
+        """
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.get(
+                    f"{self.base_url}/jobs/{job_id}",
+                    params={"since": since},
+                    headers=self._headers,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
+
+        return JobStatus.model_validate(response.json())
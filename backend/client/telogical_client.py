@@ -43,13 +43,6 @@ class TelogicalClient(AgentClient):
         if base_url is None:
             base_url = os.getenv("TELOGICAL_API_URL", "http://0.0.0.0")
 
-        Args:
-            base_url (str): The base URL of the agent service.
-            agent (str): The name of the default agent to use.
-            timeout (float, optional): The timeout for requests.
-            get_info (bool, optional): Whether to fetch agent information on init.
-                Default: True
-        """
         super().__init__(base_url, agent, timeout, get_info)
         self.trace_enabled = True  # Whether to collect trace information
         
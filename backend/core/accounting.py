@@ -0,0 +1,265 @@
+"""Per-run cost and work accounting.
+
+A `WorkAccounting` collects what one agent run cost: Wyscout calls and bytes downloaded,
+cache hits and misses, LLM calls and tokens, tool calls and wall time per graph node. The
+service creates one per request (see `_handle_input`), makes it current for the run with
+`accounting_scope` and passes an `AccountingCallbackHandler` in the run's callbacks:
+
+- LLM usage, tool calls and node timings come from the LangChain callbacks;
+- Wyscout traffic and cache lookups are reported by the code doing them through
+  `record_wyscout_call` and `record_cache_lookup`, which find the run via a context variable
+  (it follows the run into LangGraph tasks and into the tools' executor threads).
+
+`finish_accounting` freezes the totals, adds them to per-thread and per-user aggregates
+(shared by the workers on the host with SHARED_CACHE_BACKEND=sqlite, otherwise per process)
+and returns them for the final ChatMessage.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from backend.core.cache import TTLCache, create_cache
+from backend.core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+ACCOUNTING_ENABLED = os.getenv("ACCOUNTING_ENABLED", "true").lower() == "true"
+ACCOUNTING_MAX_THREADS = int(os.getenv("ACCOUNTING_MAX_THREADS", "10000"))
+ACCOUNTING_MAX_USERS = int(os.getenv("ACCOUNTING_MAX_USERS", "10000"))
+# Runs above this many seconds or LLM tokens are logged at warning level
+ACCOUNTING_EXPENSIVE_SECONDS = float(os.getenv("ACCOUNTING_EXPENSIVE_SECONDS", "60"))
+ACCOUNTING_EXPENSIVE_TOKENS = int(os.getenv("ACCOUNTING_EXPENSIVE_TOKENS", "50000"))
+
+_current_accounting: ContextVar[Optional["WorkAccounting"]] = ContextVar("work_accounting", default=None)
+
+
+@dataclass
+class WorkAccounting:
+    run_id: str
+    thread_id: str
+    user_id: str
+    started_at: float = field(default_factory=time.time)
+    wyscout_calls: int = 0
+    wyscout_errors: int = 0
+    wyscout_bytes: int = 0
+    cache_hits: Counter[str] = field(default_factory=Counter)
+    cache_misses: Counter[str] = field(default_factory=Counter)
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    llm_calls_by_model: Counter[str] = field(default_factory=Counter)
+    tool_calls: Counter[str] = field(default_factory=Counter)
+    node_seconds: defaultdict[str, float] = field(default_factory=lambda: defaultdict(float))
+    wall_seconds: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _totals: dict[str, Any] | None = field(default=None, repr=False)
+
+    def totals(self) -> dict[str, Any]:
+        with self._lock:
+            wall_seconds = self.wall_seconds if self.wall_seconds is not None else time.time() - self.started_at
+            return {
+                "run_id": self.run_id,
+                "wall_seconds": round(wall_seconds, 3),
+                "wyscout": {"calls": self.wyscout_calls, "errors": self.wyscout_errors, "bytes": self.wyscout_bytes},
+                "cache": {"hits": dict(self.cache_hits), "misses": dict(self.cache_misses)},
+                "llm": {
+                    "calls": self.llm_calls,
+                    "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens,
+                    "cached_prompt_tokens": self.cached_prompt_tokens,
+                    "calls_by_model": dict(self.llm_calls_by_model),
+                },
+                "tool_calls": dict(self.tool_calls),
+                "node_seconds": {node: round(seconds, 3) for node, seconds in self.node_seconds.items()},
+            }
+
+
+@dataclass
+class AccountingAggregate:
+    """Running totals over the runs of one thread or one user."""
+
+    runs: int = 0
+    wall_seconds: float = 0.0
+    wyscout_calls: int = 0
+    wyscout_bytes: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: Counter[str] = field(default_factory=Counter)
+    last_run_at: float = 0.0
+
+    def __post_init__(self) -> None:
+        # Read back from a shared cache as a plain dict
+        self.tool_calls = Counter(self.tool_calls)
+
+    def add(self, totals: dict[str, Any]) -> None:
+        self.runs += 1
+        self.wall_seconds += totals["wall_seconds"]
+        self.wyscout_calls += totals["wyscout"]["calls"]
+        self.wyscout_bytes += totals["wyscout"]["bytes"]
+        self.cache_hits += sum(totals["cache"]["hits"].values())
+        self.cache_misses += sum(totals["cache"]["misses"].values())
+        self.llm_calls += totals["llm"]["calls"]
+        self.prompt_tokens += totals["llm"]["prompt_tokens"]
+        self.completion_tokens += totals["llm"]["completion_tokens"]
+        self.tool_calls.update(totals["tool_calls"])
+        self.last_run_at = time.time()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "wyscout_calls": self.wyscout_calls,
+            "wyscout_bytes": self.wyscout_bytes,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tool_calls": dict(self.tool_calls),
+            "last_run_at": self.last_run_at,
+        }
+
+
+_thread_totals: TTLCache[str, AccountingAggregate] = create_cache(
+    "accounting_threads", maxsize=ACCOUNTING_MAX_THREADS, encode=vars, decode=lambda data: AccountingAggregate(**data)
+)
+_user_totals: TTLCache[str, AccountingAggregate] = create_cache(
+    "accounting_users", maxsize=ACCOUNTING_MAX_USERS, encode=vars, decode=lambda data: AccountingAggregate(**data)
+)
+
+
+def current_accounting() -> WorkAccounting | None:
+    return _current_accounting.get()
+
+
+@contextmanager
+def accounting_scope(accounting: WorkAccounting | None) -> Iterator[None]:
+    """Make `accounting` the current run's accounting for the duration of the block."""
+    token = _current_accounting.set(accounting)
+    try:
+        yield
+    finally:
+        _current_accounting.reset(token)
+
+
+def record_wyscout_call(response_bytes: int, error: bool = False) -> None:
+    accounting = _current_accounting.get()
+    if accounting is None:
+        return
+    with accounting._lock:
+        accounting.wyscout_calls += 1
+        accounting.wyscout_errors += int(error)
+        accounting.wyscout_bytes += response_bytes
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+    accounting = _current_accounting.get()
+    if accounting is None:
+        return
+    with accounting._lock:
+        (accounting.cache_hits if hit else accounting.cache_misses)[cache] += 1
+
+
+async def _aggregate(cache: TTLCache[str, AccountingAggregate], key: str, totals: dict[str, Any]) -> None:
+    def add(aggregate: AccountingAggregate | None) -> AccountingAggregate:
+        aggregate = aggregate or AccountingAggregate()
+        aggregate.add(totals)
+        return aggregate
+
+    # One atomic step, so runs finishing at once in different workers all count
+    await cache.aupdate(key, add)
+
+
+async def finish_accounting(accounting: WorkAccounting) -> dict[str, Any]:
+    """Freeze the run's totals and add them to the thread and user aggregates (once)."""
+    if accounting._totals is not None:
+        return accounting._totals
+    accounting.wall_seconds = time.time() - accounting.started_at
+    totals = accounting.totals()
+    accounting._totals = totals
+    await _aggregate(_thread_totals, accounting.thread_id, totals)
+    await _aggregate(_user_totals, accounting.user_id, totals)
+
+    tokens = totals["llm"]["prompt_tokens"] + totals["llm"]["completion_tokens"]
+    expensive = totals["wall_seconds"] >= ACCOUNTING_EXPENSIVE_SECONDS or tokens >= ACCOUNTING_EXPENSIVE_TOKENS
+    logger.log(
+        logging.WARNING if expensive else logging.INFO,
+        f"Run {accounting.run_id} (thread {accounting.thread_id}, user {accounting.user_id}): "
+        f"{totals['wall_seconds']:.1f}s, {totals['llm']['calls']} LLM calls / {tokens} tokens, "
+        f"{totals['wyscout']['calls']} Wyscout calls / {totals['wyscout']['bytes']} bytes, tools {totals['tool_calls']}",
+    )
+    return totals
+
+
+async def get_thread_accounting(thread_id: str) -> dict[str, Any] | None:
+    aggregate = await _thread_totals.aget(thread_id)
+    return aggregate.snapshot() if aggregate is not None else None
+
+
+async def get_user_accounting(user_id: str) -> dict[str, Any] | None:
+    aggregate = await _user_totals.aget(user_id)
+    return aggregate.snapshot() if aggregate is not None else None
+
+
+class AccountingCallbackHandler(BaseCallbackHandler):
+    """Records LLM usage, tool calls and per-node wall time of a run into its WorkAccounting."""
+
+    run_inline = True
+
+    def __init__(self, accounting: WorkAccounting) -> None:
+        self.accounting = accounting
+        self._node_started: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, metadata: dict[str, Any] | None = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables it calls
+        if node and kwargs.get("name") == node:
+            self._node_started[run_id] = (node, time.perf_counter())
+
+    def _node_finished(self, run_id: UUID) -> None:
+        started = self._node_started.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            with self.accounting._lock:
+                self.accounting.node_seconds[node] += time.perf_counter() - start
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_finished(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_finished(run_id)
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        with self.accounting._lock:
+            self.accounting.tool_calls[name] += 1
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                model = (getattr(message, "response_metadata", None) or {}).get("model_name", "unknown")
+                with self.accounting._lock:
+                    self.accounting.llm_calls += 1
+                    self.accounting.llm_calls_by_model[model] += 1
+                    self.accounting.prompt_tokens += usage.get("input_tokens", 0) or 0
+                    self.accounting.completion_tokens += usage.get("output_tokens", 0) or 0
+                    self.accounting.cached_prompt_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
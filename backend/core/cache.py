@@ -0,0 +1,413 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# "memory": every worker process keeps its own caches. "sqlite": caches created with
+# `create_cache` live in one SQLite file shared by all workers on the host.
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "memory").lower()
+# The file and its directory are created readable by the service's user only
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH",
+    os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "wyscout", "shared-cache.sqlite3"),
+)
+# Seconds a worker waits for another worker's write before giving up on a cache operation
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", "2"))
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class BoundedTTLCache(Generic[K, V]):
+    """
+    In-process LRU cache with an optional per-entry time-to-live.
+
+    The cache never holds more than `maxsize` entries: inserting into a full cache evicts
+    the least recently used entry. Expired entries are dropped lazily on access and on insert.
+    It is safe to share between the event loop and executor threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float | None, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at: float | None, now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        """Return the cached value for `key`, refreshing its LRU position, or `default`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry  # type: ignore[misc]
+            if self._expired(expires_at, now):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store `value` under `key`. `ttl` overrides the cache-wide TTL for this entry."""
+        now = time.monotonic()
+        entry_ttl = ttl if ttl is not None else self.ttl
+        expires_at = now + entry_ttl if entry_ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self._evict(now)
+
+    def update(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V:
+        """Store `func(current value or None)` under `key` as one atomic step and return it."""
+        now = time.monotonic()
+        entry_ttl = ttl if ttl is not None else self.ttl
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            current = None if entry is _MISSING or self._expired(entry[0], now) else entry[1]  # type: ignore[index]
+            value = func(current)
+            self._data[key] = (now + entry_ttl if entry_ttl is not None else None, value)
+            self._data.move_to_end(key)
+            self._evict(now)
+        return value
+
+    def items(self) -> list[tuple[K, V]]:
+        """Unexpired entries, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (expires_at, value) in self._data.items() if not self._expired(expires_at, now)]
+
+    def pop(self, key: K, default: Any = None) -> V | Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[1]  # type: ignore[index]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self, now: float) -> None:
+        # Drop expired entries from the cold end first, then trim to size.
+        while self._data:
+            oldest_key = next(iter(self._data))
+            if not self._expired(self._data[oldest_key][0], now):
+                break
+            del self._data[oldest_key]
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    # Async variants of the methods above, for symmetry with SQLiteTTLCache; nothing here blocks
+
+    async def aget(self, key: K, default: Any = None) -> V | Any:
+        return self.get(key, default)
+
+    async def aset(self, key: K, value: V, ttl: float | None = None) -> None:
+        self.set(key, value, ttl)
+
+    async def aupdate(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V:
+        return self.update(key, func, ttl)
+
+    async def aitems(self) -> list[tuple[K, V]]:
+        return self.items()
+
+    async def apop(self, key: K, default: Any = None) -> V | Any:
+        return self.pop(key, default)
+
+
+def prepare_cache_file(path: str) -> None:
+    """
+    Create the cache file readable and writable by this user only (SQLite gives its -wal and
+    -shm files the same mode). Raises PermissionError if the file belongs to another user.
+    """
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    if os.stat(path).st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    os.chmod(path, 0o600)
+
+
+class SQLiteTTLCache(Generic[K, V]):
+    """
+    TTL cache stored in a SQLite file, shared by every worker process on the host.
+
+    It has the interface of BoundedTTLCache; keys are stored as strings and values as JSON,
+    converted with `encode` before writing and `decode` after reading. Expiry uses wall-clock
+    time. Expired entries are skipped on read; they and the entries written longest ago beyond
+    `maxsize` are deleted every TRIM_EVERY writes. `update` runs in a single write transaction,
+    so read-modify-writes from different workers are not lost. A cache that cannot be read or
+    written (locked for longer than SHARED_CACHE_TIMEOUT, or a value written by an incompatible
+    release) behaves like a miss and logs a warning.
+
+    The synchronous methods block on the database; code on the event loop uses the async
+    variants, which run them in the default executor.
+    """
+
+    TRIM_EVERY = 64
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float | None = None,
+        path: str = SHARED_CACHE_PATH,
+        encode: Callable[[V], Any] = _identity,
+        decode: Callable[[Any], V] = _identity,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process: connections must not cross a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=SHARED_CACHE_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "cache TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL, written_at REAL NOT NULL, PRIMARY KEY (cache, key))"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _expires_at(self, ttl: float | None) -> float | None:
+        entry_ttl = ttl if ttl is not None else self.ttl
+        return time.time() + entry_ttl if entry_ttl is not None else None
+
+    def _read(self, connection: sqlite3.Connection, key: K) -> Any:
+        row = connection.execute(
+            "SELECT value FROM cache_entries WHERE cache = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self.name, str(key), time.time()),
+        ).fetchone()
+        return _MISSING if row is None else self._loads(row[0])
+
+    def _loads(self, data: str) -> V:
+        return self.decode(json.loads(data))
+
+    def _write(self, connection: sqlite3.Connection, key: K, value: V, ttl: float | None) -> None:
+        connection.execute(
+            "INSERT OR REPLACE INTO cache_entries (cache, key, value, expires_at, written_at) VALUES (?, ?, ?, ?, ?)",
+            (self.name, str(key), json.dumps(self.encode(value)), self._expires_at(ttl), time.time()),
+        )
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY == 0:
+            self._trim(connection)
+
+    def _trim(self, connection: sqlite3.Connection) -> None:
+        connection.execute("DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?", (self.name, time.time()))
+        connection.execute(
+            "DELETE FROM cache_entries WHERE cache = ? AND key IN ("
+            "SELECT key FROM cache_entries WHERE cache = ? ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+            (self.name, self.name, self.maxsize),
+        )
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        try:
+            value = self._read(self._connection(), key)
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            logger.warning(f"Shared cache '{self.name}' read failed: {e}")
+            return default
+        return default if value is _MISSING else value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        try:
+            self._write(self._connection(), key, value, ttl)
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            logger.warning(f"Shared cache '{self.name}' write failed: {e}")
+
+    def update(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V:
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.name}' update of {key} skipped: {e}")
+            return func(None)
+        try:
+            try:
+                current = self._read(connection, key)
+            except (ValueError, TypeError):
+                current = _MISSING
+            value = func(None if current is _MISSING else current)
+            self._write(connection, key, value, ttl)
+            connection.execute("COMMIT")
+            return value
+        except BaseException as e:
+            with contextlib.suppress(sqlite3.Error):
+                connection.execute("ROLLBACK")
+            if not isinstance(e, (sqlite3.Error, ValueError, TypeError)):
+                raise
+            logger.warning(f"Shared cache '{self.name}' update of {key} failed: {e}")
+            return func(None)
+
+    def items(self) -> list[tuple[str, V]]:
+        """Unexpired entries, oldest written first."""
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value FROM cache_entries WHERE cache = ? AND (expires_at IS NULL OR expires_at > ?) "
+                "ORDER BY written_at",
+                (self.name, time.time()),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.name}' read failed: {e}")
+            return []
+        entries = []
+        for key, value in rows:
+            try:
+                entries.append((key, self._loads(value)))
+            except (ValueError, TypeError):
+                continue
+        return entries
+
+    def pop(self, key: K, default: Any = None) -> V | Any:
+        value = self.get(key, _MISSING)
+        try:
+            self._connection().execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?", (self.name, str(key)))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.name}' delete failed: {e}")
+        return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        try:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE cache = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (self.name, time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            return 0
+        return row[0]
+
+    async def aget(self, key: K, default: Any = None) -> V | Any:
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def aset(self, key: K, value: V, ttl: float | None = None) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def aupdate(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V:
+        return await asyncio.to_thread(self.update, key, func, ttl)
+
+    async def aitems(self) -> list[tuple[str, V]]:
+        return await asyncio.to_thread(self.items)
+
+    async def apop(self, key: K, default: Any = None) -> V | Any:
+        return await asyncio.to_thread(self.pop, key, default)
+
+
+class TTLCache(Protocol[K, V]):
+    """What callers of `create_cache` may rely on, whichever backend is configured."""
+
+    def get(self, key: K, default: Any = None) -> V | Any: ...
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None: ...
+
+    def update(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V: ...
+
+    def items(self) -> list[tuple[Any, V]]: ...
+
+    def pop(self, key: K, default: Any = None) -> V | Any: ...
+
+    def clear(self) -> None: ...
+
+    def __contains__(self, key: object) -> bool: ...
+
+    def __len__(self) -> int: ...
+
+    async def aget(self, key: K, default: Any = None) -> V | Any: ...
+
+    async def aset(self, key: K, value: V, ttl: float | None = None) -> None: ...
+
+    async def aupdate(self, key: K, func: Callable[[V | None], V], ttl: float | None = None) -> V: ...
+
+    async def aitems(self) -> list[tuple[Any, V]]: ...
+
+    async def apop(self, key: K, default: Any = None) -> V | Any: ...
+
+
+_caches: dict[str, TTLCache[Any, Any]] = {}
+
+
+_shared_cache_file_error: OSError | None = None
+_shared_cache_file_checked = False
+
+
+def _shared_cache_file_usable() -> bool:
+    global _shared_cache_file_checked, _shared_cache_file_error
+    if not _shared_cache_file_checked:
+        _shared_cache_file_checked = True
+        try:
+            prepare_cache_file(SHARED_CACHE_PATH)
+        except OSError as e:
+            _shared_cache_file_error = e
+            logger.warning(f"Shared cache file unusable, caches stay per process: {e}")
+    return _shared_cache_file_error is None
+
+
+def create_cache(
+    name: str,
+    maxsize: int,
+    ttl: float | None = None,
+    shared: bool = True,
+    encode: Callable[[Any], Any] = _identity,
+    decode: Callable[[Any], Any] = _identity,
+) -> TTLCache[Any, Any]:
+    """
+    A named cache on the configured SHARED_CACHE_BACKEND. `shared=False` keeps it in-process
+    whatever the backend, for caches of cheap derived values that are not worth a round trip.
+    A shared cache stores JSON: `encode` turns a value into JSON-serializable data and
+    `decode` turns that data back into the value.
+    """
+    cache: TTLCache[Any, Any]
+    if shared and SHARED_CACHE_BACKEND == "sqlite" and _shared_cache_file_usable():
+        cache = SQLiteTTLCache(name, maxsize=maxsize, ttl=ttl, encode=encode, decode=decode)
+    else:
+        cache = BoundedTTLCache(maxsize=maxsize, ttl=ttl)
+    _caches[name] = cache
+    return cache
+
+
+def cache_sizes() -> dict[str, int]:
+    """Entries per cache created with `create_cache`; shared caches count every worker's entries."""
+    return {name: len(cache) for name, cache in _caches.items()}
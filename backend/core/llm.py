@@ -1,12 +1,17 @@
+import logging
 import os
 from functools import cache
-from typing import TypeAlias, Optional, Dict, Any
+from typing import Callable, TypeAlias, Optional, Dict, Any
 
 from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models import BaseChatModel
 from langchain_community.chat_models import FakeListChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from pydantic import TypeAdapter, ValidationError
 
+from backend.core.llm_gateway import GatewayChatModel, get_model_limiter
 from backend.core.settings import settings
 from backend.schema.models import (
     AllModelEnum,
@@ -23,6 +28,8 @@ from backend.schema.models import (
     VertexAIModelName,
 )
 
+logger = logging.getLogger(__name__)
+
 _MODEL_TABLE = (
     {m: m.value for m in OpenAIModelName}
     | {m: m.value for m in OpenAICompatibleName}
@@ -57,11 +64,18 @@ ModelT: TypeAlias = (
 # Cache of Telogical-specific models (used by dynamic agents)
 _telogical_primary_llm: Optional[AzureChatOpenAI] = None
 _telogical_secondary_llm: Optional[ChatOpenAI] = None
+_telogical_primary_gateway: Optional[GatewayChatModel] = None
+_telogical_secondary_gateway: Optional[GatewayChatModel] = None
+
+# Route Telogical model calls through the LLM gateway (concurrency limits, hedging, per-node stats)
+LLM_GATEWAY_ENABLED = os.getenv("LLM_GATEWAY_ENABLED", "true").lower() == "true"
+LLM_MAX_CONCURRENCY_PRIMARY = int(os.getenv("LLM_MAX_CONCURRENCY_PRIMARY", "16"))
+LLM_MAX_CONCURRENCY_SECONDARY = int(os.getenv("LLM_MAX_CONCURRENCY_SECONDARY", "32"))
 
 
-def get_telogical_primary_llm() -> AzureChatOpenAI:
+def get_telogical_primary_client() -> AzureChatOpenAI:
     """
-    Get the primary Telogical LLM (Azure OpenAI)
+    Get the primary Telogical LLM client (Azure OpenAI)
     """
     global _telogical_primary_llm
     if _telogical_primary_llm is None:
@@ -79,14 +93,16 @@ def get_telogical_primary_llm() -> AzureChatOpenAI:
             api_version=api_version,
             azure_endpoint=endpoint,
             api_key=api_key,
+            # Report token usage on streamed calls too, for accounting and prompt cache stats
+            stream_usage=True,
         )
     
     return _telogical_primary_llm
 
 
-def get_telogical_secondary_llm() -> ChatOpenAI:
+def get_telogical_secondary_client() -> ChatOpenAI:
     """
-    Get the secondary Telogical LLM (OpenAI)
+    Get the secondary Telogical LLM client (OpenAI)
     """
     global _telogical_secondary_llm
     if _telogical_secondary_llm is None:
@@ -99,12 +115,54 @@ def get_telogical_secondary_llm() -> ChatOpenAI:
             
         _telogical_secondary_llm = ChatOpenAI(
             model=model_name,
-            api_key=api_key
+            api_key=api_key,
+            stream_usage=True,
         )
     
     return _telogical_secondary_llm
 
 
+def get_telogical_primary_llm() -> BaseChatModel:
+    """
+    Get the primary Telogical LLM behind the gateway; with LLM_HEDGING_ENABLED, hedged to the
+    secondary LLM when the primary is slower than its recent p95
+    """
+    global _telogical_primary_gateway
+    if not LLM_GATEWAY_ENABLED:
+        return get_telogical_primary_client()
+    if _telogical_primary_gateway is None:
+        get_model_limiter("telogical-primary", LLM_MAX_CONCURRENCY_PRIMARY)
+        get_model_limiter("telogical-secondary", LLM_MAX_CONCURRENCY_SECONDARY)
+        try:
+            secondary = get_telogical_secondary_client()
+        except ValueError as e:
+            logger.warning(f"Secondary LLM unavailable, primary calls will not be hedged: {e}")
+            secondary = None
+        _telogical_primary_gateway = GatewayChatModel(
+            primary=get_telogical_primary_client(),
+            primary_name="telogical-primary",
+            secondary=secondary,
+            secondary_name="telogical-secondary" if secondary is not None else None,
+        )
+    return _telogical_primary_gateway
+
+
+def get_telogical_secondary_llm() -> BaseChatModel:
+    """
+    Get the secondary Telogical LLM behind the gateway (concurrency limit only)
+    """
+    global _telogical_secondary_gateway
+    if not LLM_GATEWAY_ENABLED:
+        return get_telogical_secondary_client()
+    if _telogical_secondary_gateway is None:
+        get_model_limiter("telogical-secondary", LLM_MAX_CONCURRENCY_SECONDARY)
+        _telogical_secondary_gateway = GatewayChatModel(
+            primary=get_telogical_secondary_client(),
+            primary_name="telogical-secondary",
+        )
+    return _telogical_secondary_gateway
+
+
 @cache
 def get_model(model_name: AllModelEnum, /) -> ModelT:
     # NOTE: models with streaming=True will send tokens as they are generated
@@ -114,7 +172,7 @@ def get_model(model_name: AllModelEnum, /) -> ModelT:
         raise ValueError(f"Unsupported model: {model_name}")
 
     if model_name in OpenAIModelName:
-        return ChatOpenAI(model=api_model_name, temperature=0.5, streaming=True)
+        return ChatOpenAI(model=api_model_name, temperature=0.5, streaming=True, stream_usage=True)
     if model_name in OpenAICompatibleName:
         if not settings.COMPATIBLE_BASE_URL or not settings.COMPATIBLE_MODEL:
             raise ValueError("OpenAICompatible base url and endpoint must be configured")
@@ -136,6 +194,7 @@ def get_model(model_name: AllModelEnum, /) -> ModelT:
             api_version=settings.AZURE_OPENAI_API_VERSION,
             temperature=0.5,
             streaming=True,
+            stream_usage=True,
             timeout=60,
             max_retries=3,
         )
@@ -155,3 +214,46 @@ def get_model(model_name: AllModelEnum, /) -> ModelT:
         return FakeToolModel(responses=["This is a test response from the fake model."])
 
     raise ValueError(f"Unsupported model: {model_name}")
+
+
+def override_telogical_llms(primary: BaseChatModel, secondary: BaseChatModel) -> None:
+    """
+    Replace the Telogical primary/secondary clients, e.g. with scripted fakes for offline
+    benchmarks. Takes effect for agents compiled afterwards.
+    """
+    global _telogical_primary_llm, _telogical_secondary_llm
+    global _telogical_primary_gateway, _telogical_secondary_gateway
+    _telogical_primary_llm = primary  # type: ignore[assignment]
+    _telogical_secondary_llm = secondary  # type: ignore[assignment]
+    _telogical_primary_gateway = None
+    _telogical_secondary_gateway = None
+
+
+@cache
+def _get_gateway_model(model_name: AllModelEnum, /) -> BaseChatModel:
+    if not LLM_GATEWAY_ENABLED:
+        return get_model(model_name)
+    return GatewayChatModel(primary=get_model(model_name), primary_name=str(model_name))
+
+
+def get_node_llm(
+    node: str, config: Optional[RunnableConfig], default: Callable[[], BaseChatModel]
+) -> BaseChatModel:
+    """
+    The model for workflow node `node`: `configurable["node_models"][node]` from the run config,
+    then settings.NODE_MODELS, then `default()`. Unknown or unavailable models fall back to the
+    default with a warning.
+    """
+    overrides = ((config or {}).get("configurable") or {}).get("node_models") or {}
+    requested = overrides.get(node) or settings.NODE_MODELS.get(node)
+    if not requested:
+        return default()
+    try:
+        model_name = TypeAdapter(AllModelEnum).validate_python(requested)
+    except ValidationError:
+        logger.warning(f"Unknown model '{requested}' for node '{node}', using the default model")
+        return default()
+    if model_name not in settings.AVAILABLE_MODELS:
+        logger.warning(f"Model '{model_name}' for node '{node}' is not configured, using the default model")
+        return default()
+    return _get_gateway_model(model_name)
@@ -0,0 +1,442 @@
+"""LLM gateway: concurrency limits, tail-latency hedging and per-node call accounting.
+
+`GatewayChatModel` is a chat model that forwards to a primary model and, optionally, a secondary
+one. Every model gets a fixed number of concurrent call slots; callers beyond that wait in FIFO
+order for up to LLM_QUEUE_TIMEOUT_SECONDS. With LLM_HEDGING_ENABLED=true, when the primary has
+not answered within its recent p95 latency (time to first token when streaming), the same request
+is sent to the secondary and whichever answers first is used; the other call is cancelled.
+Latency and token usage of every call are recorded per LangGraph node.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableBinding, ensure_config
+
+from backend.core.metrics import LLM_CALL_DURATION, LLM_TOKENS, GaugeCallback
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# Until enough calls have been observed, hedge after this many seconds
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "20"))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "2"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "120"))
+
+
+def _unwrap(model: Runnable) -> tuple[BaseChatModel, dict[str, Any]]:
+    """The chat model under any `bind`/`bind_tools` bindings, and the call kwargs bound to it."""
+    bound: dict[str, Any] = {}
+    while isinstance(model, RunnableBinding):
+        bound = {**model.kwargs, **bound}
+        model = model.bound
+    if not isinstance(model, BaseChatModel):
+        raise TypeError(f"LLM gateway can only wrap chat models, got {type(model).__name__}")
+    return model, bound
+
+
+def _call_kwargs(bound: dict[str, Any], kwargs: dict[str, Any]) -> dict[str, Any]:
+    """
+    Bound and call kwargs for the wrapped model's `_generate`/`_astream`. The LangSmith hints that
+    `with_structured_output` binds (`ls_structured_output_format`) are removed by the public
+    `invoke`/`astream` before the provider call, so they are removed here too.
+    """
+    return {
+        key: value
+        for key, value in {**bound, **kwargs}.items()
+        if not key.startswith("ls_") and key != "structured_output_format"
+    }
+
+
+def _with_generation_info(message: BaseMessage, generation_info: dict[str, Any] | None) -> AIMessage:
+    if generation_info:
+        message.response_metadata = {**generation_info, **message.response_metadata}
+    return message  # type: ignore[return-value]
+
+
+# Wrapped models are called through their `_generate`/`_astream` rather than `invoke`/`astream`,
+# so no callback manager is configured for them: neither handlers inherited from the caller nor
+# the ones added by configure hooks (`get_usage_metadata_callback`, tracing) see the inner call.
+# The gateway reports each call once, under its own run.
+
+
+def _inner_generate(
+    model: Runnable, messages: list[BaseMessage], stop: list[str] | None, **kwargs: Any
+) -> AIMessage:
+    chat_model, bound = _unwrap(model)
+    if chat_model.rate_limiter:
+        chat_model.rate_limiter.acquire(blocking=True)
+    result = chat_model._generate(messages, stop=stop, **_call_kwargs(bound, kwargs))
+    generation = result.generations[0]
+    return _with_generation_info(generation.message, generation.generation_info)
+
+
+async def _inner_agenerate(
+    model: Runnable, messages: list[BaseMessage], stop: list[str] | None, **kwargs: Any
+) -> AIMessage:
+    chat_model, bound = _unwrap(model)
+    if chat_model.rate_limiter:
+        await chat_model.rate_limiter.aacquire(blocking=True)
+    result = await chat_model._agenerate(messages, stop=stop, **_call_kwargs(bound, kwargs))
+    generation = result.generations[0]
+    return _with_generation_info(generation.message, generation.generation_info)
+
+
+async def _inner_astream(
+    model: Runnable, messages: list[BaseMessage], stop: list[str] | None, **kwargs: Any
+) -> AsyncIterator[AIMessageChunk]:
+    chat_model, bound = _unwrap(model)
+    kwargs = _call_kwargs(bound, kwargs)
+    if type(chat_model)._astream is BaseChatModel._astream and type(chat_model)._stream is BaseChatModel._stream:
+        # No streaming support: the whole answer is one chunk
+        message = await _inner_agenerate(chat_model, messages, stop, **kwargs)
+        yield AIMessageChunk(**message.model_dump(exclude={"type"}))
+        return
+    if chat_model.rate_limiter:
+        await chat_model.rate_limiter.aacquire(blocking=True)
+    async for generation in chat_model._astream(messages, stop=stop, **kwargs):
+        yield _with_generation_info(generation.message, generation.generation_info)  # type: ignore[misc]
+
+
+def _percentile(samples: Sequence[float], q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ModelLimiter:
+    """Concurrency slots and recent latencies of one model."""
+
+    def __init__(self, name: str, max_concurrency: int) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.latencies: deque[float] = deque(maxlen=LLM_LATENCY_WINDOW)
+        self.first_token_latencies: deque[float] = deque(maxlen=LLM_LATENCY_WINDOW)
+        self.in_flight = 0
+        self.queued = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), LLM_QUEUE_TIMEOUT_SECONDS)
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def hedge_threshold(self, streaming: bool) -> float | None:
+        samples = self.first_token_latencies if streaming else self.latencies
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return _percentile(samples, LLM_HEDGE_PERCENTILE)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "latency_p50": _percentile(self.latencies, 0.5),
+            "latency_p95": _percentile(self.latencies, 0.95),
+            "first_token_p95": _percentile(self.first_token_latencies, 0.95),
+        }
+
+
+_limiters: dict[str, ModelLimiter] = {}
+
+GaugeCallback(
+    "llm_gateway_queued",
+    "LLM calls waiting for a concurrency slot, by model.",
+    ["model"],
+    lambda: {(name,): limiter.queued for name, limiter in _limiters.items()},
+)
+GaugeCallback(
+    "llm_gateway_in_flight",
+    "LLM calls holding a concurrency slot, by model.",
+    ["model"],
+    lambda: {(name,): limiter.in_flight for name, limiter in _limiters.items()},
+)
+
+
+def get_model_limiter(name: str, max_concurrency: int = 16) -> ModelLimiter:
+    """The limiter for model `name`; `max_concurrency` only applies when it is first created."""
+    if name not in _limiters:
+        _limiters[name] = ModelLimiter(name, max_concurrency)
+    return _limiters[name]
+
+
+@dataclass
+class NodeLLMStats:
+    calls: int = 0
+    errors: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency_seconds_total: float = 0.0
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=LLM_LATENCY_WINDOW))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_seconds_total": round(self.latency_seconds_total, 3),
+            "latency_p50": _percentile(self.latencies, 0.5),
+            "latency_p95": _percentile(self.latencies, 0.95),
+        }
+
+
+_node_stats: dict[str, NodeLLMStats] = {}
+
+
+def record_llm_call(
+    node: str,
+    latency: float,
+    usage: dict[str, Any] | None = None,
+    hedged: bool = False,
+    hedge_won: bool = False,
+    error: bool = False,
+) -> None:
+    stats = _node_stats.setdefault(node, NodeLLMStats())
+    stats.calls += 1
+    stats.errors += int(error)
+    stats.hedged += int(hedged)
+    stats.hedge_wins += int(hedge_won)
+    stats.latency_seconds_total += latency
+    stats.latencies.append(latency)
+    LLM_CALL_DURATION.observe(latency, node=node, outcome="error" if error else "ok")
+    if usage:
+        input_tokens = usage.get("input_tokens", 0) or 0
+        output_tokens = usage.get("output_tokens", 0) or 0
+        stats.input_tokens += input_tokens
+        stats.output_tokens += output_tokens
+        LLM_TOKENS.inc(input_tokens, node=node, kind="input")
+        LLM_TOKENS.inc(output_tokens, node=node, kind="output")
+
+
+def get_llm_gateway_stats() -> dict[str, Any]:
+    """Current per-model limiter state and per-node call statistics of this process."""
+    return {
+        "models": {name: limiter.snapshot() for name, limiter in _limiters.items()},
+        "nodes": {node: stats.snapshot() for node, stats in _node_stats.items()},
+    }
+
+
+def _current_node(run_manager: Any) -> str:
+    """The LangGraph node making the call, or "unknown" outside a graph."""
+    node = (getattr(run_manager, "metadata", None) or {}).get("langgraph_node")
+    if node is None:
+        # `astream` does not hand the run's metadata to the run manager, but the node's config
+        # is still the current runnable config of the calling context
+        node = (ensure_config().get("metadata") or {}).get("langgraph_node")
+    return node or "unknown"
+
+
+async def _first_success(
+    start: Sequence[Callable[[], Awaitable[T]]], hedge_after: float | None
+) -> tuple[int, T, bool]:
+    """
+    Start `start[0]`; if it has not succeeded after `hedge_after` seconds (or fails), start
+    `start[1]` as well. Returns the index and result of the first call to succeed, and whether
+    the hedge was started; the other call is cancelled. If every call fails, the primary's
+    exception is raised.
+    """
+    tasks = [asyncio.ensure_future(start[0]())]
+    try:
+        if len(start) > 1:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done or tasks[0].exception() is not None:
+                tasks.append(asyncio.ensure_future(start[1]()))
+        while True:
+            pending = [task for task in tasks if not task.done()]
+            for index, task in enumerate(tasks):
+                if task.done() and task.exception() is None:
+                    return index, task.result(), len(tasks) > 1
+            if not pending:
+                raise tasks[0].exception()  # type: ignore[misc]
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        cancelled = [task for task in tasks if not task.done()]
+        for task in cancelled:
+            task.cancel()
+        await asyncio.gather(*cancelled, return_exceptions=True)
+
+
+class GatewayChatModel(BaseChatModel):
+    """Chat model that routes calls through the gateway (see module docstring)."""
+
+    primary: Runnable
+    primary_name: str
+    secondary: Runnable | None = None
+    secondary_name: str | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-gateway"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"primary": self.primary_name, "secondary": self.secondary_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "GatewayChatModel":  # type: ignore[override]
+        return self.model_copy(
+            update={
+                "primary": self.primary.bind_tools(tools, **kwargs),  # type: ignore[attr-defined]
+                "secondary": (
+                    self.secondary.bind_tools(tools, **kwargs)  # type: ignore[attr-defined]
+                    if self.secondary is not None
+                    else None
+                ),
+            }
+        )
+
+    def _models(self) -> list[tuple[Runnable, ModelLimiter]]:
+        models = [(self.primary, get_model_limiter(self.primary_name))]
+        if self.secondary is not None and self.secondary_name and LLM_HEDGING_ENABLED:
+            models.append((self.secondary, get_model_limiter(self.secondary_name)))
+        return models
+
+    def _hedge_after(self, streaming: bool) -> float:
+        threshold = get_model_limiter(self.primary_name).hedge_threshold(streaming)
+        return max(threshold if threshold is not None else LLM_HEDGE_DEFAULT_SECONDS, LLM_HEDGE_MIN_SECONDS)
+
+    def _record(
+        self, run_manager: Any, start: float, usage: Any, hedged: bool, winner: int, error: bool = False
+    ) -> None:
+        node = _current_node(run_manager)
+        latency = time.perf_counter() - start
+        record_llm_call(node, latency, usage, hedged=hedged, hedge_won=winner == 1, error=error)
+        if hedged and not error:
+            logger.info(
+                f"LLM gateway [{node}]: hedged to {self.secondary_name}, "
+                f"{'secondary' if winner == 1 else 'primary'} answered after {latency:.1f}s"
+            )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Synchronous callers bypass limits and hedging
+        message = _inner_generate(self.primary, messages, stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        models = self._models()
+
+        def call(model: Runnable, limiter: ModelLimiter) -> Callable[[], Awaitable[AIMessage]]:
+            async def run() -> AIMessage:
+                async with limiter.slot():
+                    call_start = time.perf_counter()
+                    message = await _inner_agenerate(model, messages, stop, **kwargs)
+                    limiter.latencies.append(time.perf_counter() - call_start)
+                    return message
+
+            return run
+
+        start = time.perf_counter()
+        try:
+            winner, message, hedged = await _first_success(
+                [call(model, limiter) for model, limiter in models], self._hedge_after(streaming=False)
+            )
+        except Exception:
+            self._record(run_manager, start, None, hedged=len(models) > 1, winner=0, error=True)
+            raise
+        self._record(run_manager, start, message.usage_metadata, hedged=hedged, winner=winner)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        models = self._models()
+
+        async def limited_stream(model: Runnable, limiter: ModelLimiter) -> AsyncIterator[AIMessageChunk]:
+            async with limiter.slot():
+                call_start = time.perf_counter()
+                first = True
+                async for chunk in _inner_astream(model, messages, stop, **kwargs):
+                    if first:
+                        limiter.first_token_latencies.append(time.perf_counter() - call_start)
+                        first = False
+                    yield chunk
+                limiter.latencies.append(time.perf_counter() - call_start)
+
+        streams = [limited_stream(model, limiter) for model, limiter in models]
+
+        def first_chunk(stream: AsyncIterator[AIMessageChunk]) -> Callable[[], Awaitable[AIMessageChunk | None]]:
+            async def run() -> AIMessageChunk | None:
+                try:
+                    return await stream.__anext__()
+                except StopAsyncIteration:
+                    return None
+
+            return run
+
+        start = time.perf_counter()
+        usage: dict[str, Any] | None = None
+        winner, hedged = 0, False
+        try:
+            winner, chunk, hedged = await _first_success(
+                [first_chunk(stream) for stream in streams], self._hedge_after(streaming=True)
+            )
+            # The losing stream's pending read has been cancelled; release its slot
+            for index, stream in enumerate(streams):
+                if index != winner:
+                    await stream.aclose()  # type: ignore[attr-defined]
+            stream = streams[winner]
+            while chunk is not None:
+                if chunk.usage_metadata:
+                    usage = {
+                        key: (usage or {}).get(key, 0) + chunk.usage_metadata.get(key, 0)
+                        for key in ("input_tokens", "output_tokens")
+                    }
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(generation.text, chunk=generation)
+                yield generation
+                chunk = await anext(stream, None)
+        except Exception:
+            self._record(run_manager, start, usage, hedged=hedged, winner=winner, error=True)
+            raise
+        finally:
+            for stream in streams:
+                await stream.aclose()  # type: ignore[attr-defined]
+        self._record(run_manager, start, usage, hedged=hedged, winner=winner)
@@ -0,0 +1,257 @@
+"""Process metrics in the Prometheus text exposition format.
+
+A small dependency-free registry of counters, gauges and histograms with labels, rendered by
+`render_metrics` for the service's /metrics endpoint. The metrics below are updated by the code
+they describe (tools, Wyscout transport, LLM gateway, caches, checkpointer, SSE streams);
+values that already live elsewhere, such as the LLM gateway's queue depths, are read when the
+endpoint is scraped through `GaugeCallback`.
+
+All values are per worker process; Prometheus sums them across the workers it scrapes.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from functools import wraps
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelValues = tuple[str, ...]
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, float]]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, values, value in self.samples():
+            labelnames = self.labelnames + (("le",) if len(values) > len(self.labelnames) else ())
+            lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, float]]:
+        for key, value in sorted(self.values().items()):
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class GaugeCallback(_Metric):
+    """A gauge whose values are read from `collect` (label values -> value) at scrape time."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], dict[LabelValues, float]],
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, float]]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.warning(f"Could not collect metric {self.name}: {e}")
+            return
+        for key, value in sorted(values.items()):
+            if value is not None:
+                yield self.name, key, value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, float]]:
+        with self._lock:
+            series = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (_format_value(bound),), cumulative
+            yield f"{self.name}_count", key, cumulative
+            yield f"{self.name}_sum", key, total
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+TOOL_DURATION = Histogram(
+    "wyscout_tool_duration_seconds",
+    "Duration of Wyscout tool calls, by tool and shared result store outcome (hit, miss, off, error).",
+    ["tool", "cache"],
+)
+WYSCOUT_RESPONSES = Counter(
+    "wyscout_http_responses_total",
+    "Wyscout API responses by HTTP status code ('error' when no response was received).",
+    ["status"],
+)
+WYSCOUT_REQUEST_DURATION = Histogram(
+    "wyscout_http_request_duration_seconds", "Duration of Wyscout API requests, including the body download."
+)
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "Duration of LLM calls through the gateway, by graph node and outcome.",
+    ["node", "outcome"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens used through the gateway, by graph node and kind.", ["node", "kind"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result (hit, miss).", ["cache", "result"])
+CHECKPOINTER_DURATION = Histogram(
+    "checkpointer_operation_duration_seconds", "Duration of checkpointer operations.", ["operation"]
+)
+ACTIVE_STREAMS = Gauge("sse_active_streams", "SSE responses currently streaming.")
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    f"Event-loop scheduling delay, sampled every {EVENT_LOOP_LAG_INTERVAL}s.",
+    buckets=LAG_BUCKETS,
+)
+
+
+def _cache_hit_ratios() -> dict[LabelValues, float]:
+    totals: dict[str, list[float]] = {}
+    for (cache, result), value in CACHE_LOOKUPS.values().items():
+        totals.setdefault(cache, [0.0, 0.0])[0 if result == "hit" else 1] += value
+    return {(cache,): hits / (hits + misses) for cache, (hits, misses) in totals.items() if hits + misses}
+
+
+CACHE_HIT_RATIO = GaugeCallback("cache_hit_ratio", "Share of cache lookups that were hits since start.", ["cache"], _cache_hit_ratios)
+
+
+def instrument_checkpointer(saver: Any) -> Any:
+    """Time the checkpointer's async read and write methods into CHECKPOINTER_DURATION."""
+    for operation in ("aget_tuple", "aput", "aput_writes", "alist"):
+        method = getattr(saver, operation, None)
+        if method is None or getattr(method, "_timed", False):
+            continue
+        if operation == "alist":
+            # Async generator: time until it is exhausted
+            def timed_list(*args: Any, _method: Any = method, **kwargs: Any) -> Any:
+                async def generator() -> Any:
+                    start = time.perf_counter()
+                    try:
+                        async for item in _method(*args, **kwargs):
+                            yield item
+                    finally:
+                        CHECKPOINTER_DURATION.observe(time.perf_counter() - start, operation="alist")
+
+                return generator()
+
+            timed: Any = timed_list
+        else:
+
+            @wraps(method)
+            async def timed(*args: Any, _method: Any = method, _operation: str = operation, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await _method(*args, **kwargs)
+                finally:
+                    CHECKPOINTER_DURATION.observe(time.perf_counter() - start, operation=_operation)
+
+        timed._timed = True
+        setattr(saver, operation, timed)
+    return saver
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    """Observe how late a sleep of `interval` wakes up, forever (run as a background task)."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
@@ -0,0 +1,223 @@
+"""Opt-in CPU and memory profiling of single agent runs.
+
+A request asks for a profile with the `X-Profile` header or the `profile` key of
+`agent_config`, e.g. `X-Profile: cpu,memory` or `{"profile": "memory"}` (`true` means both):
+
+- cpu: a stack sampler thread records every PROFILE_SAMPLE_INTERVAL seconds what each thread of
+  the process is executing and aggregates the stacks in collapsed ("folded") form, ready for
+  flamegraph tools. It samples the whole process, so concurrent requests on the same worker
+  show up too; profile on a quiet worker for a clean picture.
+- memory: tracemalloc traces allocations during the run; the artifact lists the source lines
+  that allocated the most memory still alive at the end of the run, plus the traced peak.
+
+Artifacts are written as JSON to PROFILE_DIR/<run_id>.json (the newest PROFILE_MAX_ARTIFACTS
+are kept) and served by GET /profiles/{run_id}. Without the header or flag nothing is started.
+
+Profiling slows down the whole worker, so requests for a profile are ignored unless
+PROFILING_ENABLED=true and AUTH_SECRET is set (only authenticated clients reach the service).
+One run per worker is profiled at a time; a run asking for a profile while another is being
+profiled runs unprofiled.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+from backend.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "200"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "50"))
+
+PROFILE_MODES = ("cpu", "memory")
+MAX_STACK_DEPTH = 128
+
+# The sampler and tracemalloc are process-wide, so overlapping profiles would mix their runs
+_profile_lock = threading.Lock()
+_artifacts_lock = threading.Lock()
+# Tracing started outside the service (PYTHONTRACEMALLOC) is left running after a profile
+_TRACING_AT_STARTUP = tracemalloc.is_tracing()
+
+if PROFILING_ENABLED and not settings.AUTH_SECRET:
+    logger.warning("PROFILING_ENABLED is set but AUTH_SECRET is not; requests for a profile are ignored")
+
+
+def requested_profile_modes(header: str | None, agent_config: dict[str, Any]) -> frozenset[str]:
+    """Profile modes asked for by the X-Profile header or agent_config["profile"] (which is removed)."""
+    flag = agent_config.pop("profile", None)
+    if not PROFILING_ENABLED or not settings.AUTH_SECRET:
+        return frozenset()
+    requested: set[str] = set()
+    for value in (header, flag):
+        if value is None or value is False:
+            continue
+        if value is True or (isinstance(value, str) and value.strip().lower() in ("1", "true", "all")):
+            requested.update(PROFILE_MODES)
+        elif isinstance(value, str):
+            requested.update(mode.strip().lower() for mode in value.split(","))
+        else:
+            requested.update(str(mode).lower() for mode in value)
+    return frozenset(requested & set(PROFILE_MODES))
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all other threads at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: list[str] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, peak: int) -> dict[str, Any]:
+    stats = after.compare_to(before, "lineno")
+    return {
+        "traced_peak_bytes": peak,
+        "net_allocated_bytes": sum(stat.size_diff for stat in stats),
+        "top_allocations": [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:PROFILE_TOP_ALLOCATIONS]
+        ],
+    }
+
+
+def artifact_path(run_id: str) -> Path:
+    return PROFILE_DIR / f"{run_id}.json"
+
+
+def _write_artifact(run_id: str, artifact: dict[str, Any]) -> None:
+    with _artifacts_lock:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = artifact_path(run_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(artifact))
+        tmp_path.replace(path)
+        artifacts = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in artifacts[:-PROFILE_MAX_ARTIFACTS]:
+            old.unlink(missing_ok=True)
+
+
+def _start_profile(modes: frozenset[str]) -> tuple[StackSampler | None, tracemalloc.Snapshot | None]:
+    sampler = None
+    before = None
+    if "memory" in modes:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+    if "cpu" in modes:
+        sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+        sampler.start()
+    return sampler, before
+
+
+def _finish_profile(
+    run_id: str,
+    artifact: dict[str, Any],
+    sampler: StackSampler | None,
+    before: tracemalloc.Snapshot | None,
+) -> None:
+    if sampler is not None:
+        sampler.stop()
+        artifact["cpu"] = {
+            "sample_interval": sampler.interval,
+            "samples": sampler.sample_count,
+            "collapsed_stacks": dict(sampler.samples.most_common()),
+        }
+    if before is not None:
+        try:
+            _, peak = tracemalloc.get_traced_memory()
+            artifact["memory"] = _memory_report(before, tracemalloc.take_snapshot(), peak)
+        finally:
+            if not _TRACING_AT_STARTUP:
+                tracemalloc.stop()
+    try:
+        _write_artifact(run_id, artifact)
+        logger.info(f"Profile of run {run_id} ({', '.join(artifact['modes'])}) written to {artifact_path(run_id)}")
+    except OSError as e:
+        logger.warning(f"Could not write profile of run {run_id}: {e}")
+
+
+@asynccontextmanager
+async def profile_run(run_id: str, modes: frozenset[str]) -> AsyncIterator[None]:
+    """
+    Profile the block with the given modes and store the artifact under `run_id`. Starting
+    and finishing the profile (snapshots, report, artifact file) run in the default executor.
+    """
+    if not modes:
+        yield
+        return
+    if not _profile_lock.acquire(blocking=False):
+        logger.warning(f"Run {run_id} not profiled: another run on this worker is being profiled")
+        yield
+        return
+
+    try:
+        sampler, before = await asyncio.to_thread(_start_profile, modes)
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            artifact: dict[str, Any] = {
+                "run_id": run_id,
+                "modes": sorted(modes),
+                "started_at": started_at,
+                "wall_seconds": round(time.perf_counter() - start, 3),
+            }
+            await asyncio.to_thread(_finish_profile, run_id, artifact, sampler, before)
+    finally:
+        _profile_lock.release()
+
+
+def load_profile(run_id: str) -> dict[str, Any] | None:
+    path = artifact_path(run_id)
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text())
+
+
+def collapsed_stacks(profile: dict[str, Any]) -> str:
+    """The CPU samples of a profile as folded stacks, one "stack count" line each."""
+    stacks = profile.get("cpu", {}).get("collapsed_stacks", {})
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
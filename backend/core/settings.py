@@ -1,3 +1,4 @@
+import logging
 from enum import StrEnum
 from json import loads
 from typing import Annotated, Any
@@ -9,9 +10,10 @@ from pydantic import (
     HttpUrl,
     SecretStr,
     TypeAdapter,
+    ValidationError,
     computed_field,
 )
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
 from backend.schema.models import (
     AllModelEnum,
@@ -29,6 +31,8 @@ from backend.schema.models import (
     VertexAIModelName,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class DatabaseType(StrEnum):
     SQLITE = "sqlite"
@@ -41,6 +45,29 @@ def check_str_is_http(x: str) -> str:
     return str(http_url_adapter.validate_python(x))
 
 
+def parse_node_models(value: Any) -> dict[str, AllModelEnum]:  # type: ignore[valid-type]
+    """NODE_MODELS as a dict; malformed JSON and unknown models are dropped with a warning."""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        try:
+            value = loads(value)
+        except ValueError as e:
+            logger.warning(f"NODE_MODELS is not valid JSON, ignoring it: {e}")
+            return {}
+    if not isinstance(value, dict):
+        logger.warning(f"NODE_MODELS must be a JSON object of node names to models, ignoring {value!r}")
+        return {}
+    model_adapter = TypeAdapter(AllModelEnum)
+    node_models = {}
+    for node, model in value.items():
+        try:
+            node_models[str(node)] = model_adapter.validate_python(model)
+        except ValidationError:
+            logger.warning(f"NODE_MODELS: unknown model {model!r} for node '{node}', ignoring it")
+    return node_models
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=find_dotenv(),
@@ -114,6 +141,12 @@ class Settings(BaseSettings):
         default_factory=dict, description="Map of model names to Azure deployment IDs"
     )
 
+    # Per-node model overrides for the refined workflow, e.g.
+    # NODE_MODELS='{"contextualize_query": "gpt-4o-mini", "refine_output": "gpt-4o-mini"}'
+    NODE_MODELS: Annotated[dict[str, AllModelEnum], NoDecode, BeforeValidator(parse_node_models)] = Field(  # type: ignore[valid-type]
+        default_factory=dict
+    )
+
     def model_post_init(self, __context: Any) -> None:
         api_keys = {
             Provider.OPENAI: self.OPENAI_API_KEY,
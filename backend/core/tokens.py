@@ -0,0 +1,32 @@
+import logging
+import os
+from functools import cache
+
+logger = logging.getLogger(__name__)
+
+# Encoding used by the GPT-4o / GPT-4.1 family that backs the Telogical deployments.
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Rough characters-per-token ratio used when the tokenizer cannot be loaded (e.g. offline).
+_FALLBACK_CHARS_PER_TOKEN = 4
+
+
+@cache
+def _get_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"Tokenizer '{TOKENIZER_ENCODING}' unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in `text`, falling back to a length-based estimate without tiktoken."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // _FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
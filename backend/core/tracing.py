@@ -0,0 +1,461 @@
+"""Request tracing with parent/child spans, exported as OpenTelemetry (OTLP JSON) spans.
+
+Each /invoke or /stream request gets a `Tracer` whose trace id is the request's run_id. The
+request is the root span; a `TracingCallbackHandler` in the run's callbacks turns the LangChain
+runs below it into child spans:
+
+    request -> graph -> manage_history, answer_cache, contextualize_query
+                     -> app_agent -> swarm agent nodes -> llm calls, tools -> Wyscout HTTP GETs
+                     -> refine_output
+
+Only graph nodes, LLM calls and tool calls become spans; the runnables in between are skipped
+and their children attach to the nearest traced ancestor. Code outside the callbacks (the
+Wyscout transport, the checkpointer read in the service) opens spans with `start_span`, which
+finds the tracer through a context variable and its parent through the LangChain run it is
+executing in.
+
+With TRACING_ENABLED=true, every trace is written when its request finishes as one line of
+OTLP JSON (`{"resourceSpans": [...]}`) to TRACING_EXPORTER=file (TRACING_FILE) or stdout, so it
+works offline and can be loaded into any OpenTelemetry collector or viewer later. Traces are
+written by a background exporter thread, so the event loop never waits on the write; traces
+beyond TRACING_EXPORT_QUEUE_SIZE waiting to be written are dropped. For a quick look at the
+critical path:
+
+    python -m backend.core.tracing traces/spans.jsonl [--trace <run_id>]
+
+prints a text waterfall of the last (or the given) trace.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()  # file | stdout
+TRACING_FILE = Path(os.getenv("TRACING_FILE", "traces/spans.jsonl"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "wyscout-agent-service")
+# Longest attribute value kept (tool inputs can be large)
+TRACING_MAX_ATTRIBUTE_LENGTH = int(os.getenv("TRACING_MAX_ATTRIBUTE_LENGTH", "1024"))
+TRACING_EXPORT_QUEUE_SIZE = int(os.getenv("TRACING_EXPORT_QUEUE_SIZE", "1000"))
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar("tracer", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_queue: queue.Queue[list[dict[str, Any]] | None] = queue.Queue(maxsize=TRACING_EXPORT_QUEUE_SIZE)
+_exporter_lock = threading.Lock()
+_exporter: threading.Thread | None = None
+
+
+def _span_id() -> str:
+    return uuid4().hex[:16]
+
+
+def _attribute_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return {"stringValue": text[:TRACING_MAX_ATTRIBUTE_LENGTH]}
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    parent_span_id: str | None
+    kind: int = SPAN_KIND_INTERNAL
+    span_id: str = field(default_factory=_span_id)
+    start_time: int = field(default_factory=time.time_ns)
+    end_time: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    status_code: int = STATUS_UNSET
+    status_message: str = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:TRACING_MAX_ATTRIBUTE_LENGTH]
+        self.events.append(
+            {
+                "timeUnixNano": str(time.time_ns()),
+                "name": "exception",
+                "attributes": [
+                    {"key": "exception.type", "value": _attribute_value(type(error).__name__)},
+                    {"key": "exception.message", "value": _attribute_value(str(error))},
+                ],
+            }
+        )
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+
+    def to_otlp(self) -> dict[str, Any]:
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or time.time_ns()),
+            "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class Tracer:
+    """Spans of one request. The trace id is the request's run_id."""
+
+    def __init__(self, run_id: UUID, name: str, attributes: dict[str, Any] | None = None) -> None:
+        self.trace_id = run_id.hex
+        self.root = Span(name=name, trace_id=self.trace_id, parent_span_id=None, kind=SPAN_KIND_SERVER)
+        for key, value in (attributes or {}).items():
+            self.root.set_attribute(key, value)
+        self.spans: list[Span] = [self.root]
+        # LangChain run id -> its span, and -> its parent run id (for runs without a span too)
+        self._run_spans: dict[UUID, Span] = {}
+        self._run_parents: dict[UUID, UUID | None] = {}
+        self._lock = threading.Lock()
+        self._exported = False
+
+    def span_for_run(self, run_id: UUID | None) -> Span:
+        """The span of `run_id` or of its nearest traced ancestor (the root if none)."""
+        with self._lock:
+            seen = 0
+            while run_id is not None and seen < 1000:
+                if run_id in self._run_spans:
+                    return self._run_spans[run_id]
+                run_id = self._run_parents.get(run_id)
+                seen += 1
+        return self.root
+
+    def track_run(self, run_id: UUID, parent_run_id: UUID | None) -> None:
+        with self._lock:
+            self._run_parents[run_id] = parent_run_id
+
+    def start_run_span(
+        self, run_id: UUID, parent_run_id: UUID | None, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any
+    ) -> Span:
+        self.track_run(run_id, parent_run_id)
+        span = self.new_span(name, self.span_for_run(parent_run_id), kind, **attributes)
+        with self._lock:
+            self._run_spans[run_id] = span
+        return span
+
+    def run_span(self, run_id: UUID) -> Span | None:
+        with self._lock:
+            return self._run_spans.get(run_id)
+
+    def new_span(self, name: str, parent: Span, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Span:
+        span = Span(name=name, trace_id=self.trace_id, parent_span_id=parent.span_id, kind=kind)
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent: Span | None = None, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span]:
+        span = self.new_span(name, parent or self.root, kind, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        """End the root span and export the trace (once)."""
+        if self._exported:
+            return
+        self._exported = True
+        if error is not None:
+            self.root.record_exception(error)
+        self.root.end()
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        _start_exporter()
+        try:
+            _export_queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning(f"Trace export queue full, dropping trace {self.trace_id}")
+
+
+def _start_exporter() -> None:
+    global _exporter
+    with _exporter_lock:
+        # Also restarts the thread in a worker forked from a process that had one
+        if _exporter is None or not _exporter.is_alive():
+            _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+            _exporter.start()
+
+
+def _export_loop() -> None:
+    while (spans := _export_queue.get()) is not None:
+        try:
+            export_spans(spans)
+        except OSError as e:
+            logger.warning(f"Could not export trace: {e}")
+
+
+@atexit.register
+def flush_traces(timeout: float = 5.0) -> None:
+    """Write the traces still queued; called at interpreter exit."""
+    exporter = _exporter
+    if exporter is None or not exporter.is_alive():
+        return
+    try:
+        _export_queue.put(None, timeout=timeout)
+    except queue.Full:
+        return
+    exporter.join(timeout)
+
+
+def export_spans(spans: list[dict[str, Any]]) -> None:
+    """Write one trace as a line of OTLP JSON. Blocking; `Tracer.finish` runs it in the exporter thread."""
+    line = json.dumps(
+        {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACING_SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        },
+        separators=(",", ":"),
+    )
+    if TRACING_EXPORTER == "stdout":
+        print(line, flush=True)
+        return
+    TRACING_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with TRACING_FILE.open("a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextmanager
+def tracing_scope(tracer: Tracer | None) -> Iterator[None]:
+    """Make `tracer` the current request's tracer for the duration of the block."""
+    token = _current_tracer.set(tracer)
+    try:
+        yield
+    finally:
+        _current_tracer.reset(token)
+
+
+def _current_langchain_run_id() -> UUID | None:
+    """Run id of the LangChain runnable or tool this code executes in, if any."""
+    config = var_child_runnable_config.get() or {}
+    return getattr(config.get("callbacks"), "parent_run_id", None)
+
+
+def current_span() -> Span | None:
+    """The innermost span opened with `start_span` in this context, if any."""
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span | None]:
+    """
+    A span under the enclosing `start_span` span, or else under the LangChain run the caller
+    executes in. Yields None (and costs nothing) outside a traced request.
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    parent = _current_span.get() or tracer.span_for_run(_current_langchain_run_id())
+    with tracer.span(name, parent, kind, **attributes) as span:
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns graph nodes, LLM calls and tool calls of a run into spans of its Tracer."""
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer) -> None:
+        self.tracer = tracer
+
+    def _end(self, run_id: UUID, error: BaseException | None = None) -> Span | None:
+        span = self.tracer.run_span(run_id)
+        if span is not None:
+            if error is not None:
+                span.record_exception(error)
+            span.end()
+        return span
+
+    def on_chain_start(
+        self,
+        serialized: Any,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        node = metadata.get("langgraph_node")
+        if parent_run_id is None:
+            self.tracer.start_run_span(run_id, None, f"graph {name or 'run'}")
+        elif node and name == node:
+            self.tracer.start_run_span(
+                run_id,
+                parent_run_id,
+                node,
+                **{"langgraph.node": node, "langgraph.step": metadata.get("langgraph_step"), "langgraph.checkpoint_ns": metadata.get("checkpoint_ns")},
+            )
+        else:
+            self.tracer.track_run(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(
+        self, serialized: dict[str, Any], prompts: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def _start_llm(self, serialized: dict[str, Any], run_id: UUID, parent_run_id: UUID | None, kwargs: dict[str, Any]) -> None:
+        metadata = kwargs.get("metadata") or {}
+        model = metadata.get("ls_model_name") or kwargs.get("name") or (serialized or {}).get("name") or "llm"
+        self.tracer.start_run_span(
+            run_id, parent_run_id, f"llm {model}", SPAN_KIND_CLIENT,
+            **{"gen_ai.request.model": model, "langgraph.node": metadata.get("langgraph_node")},
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._end(run_id)
+        if span is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                span.set_attribute("gen_ai.usage.input_tokens", usage.get("input_tokens"))
+                span.set_attribute("gen_ai.usage.output_tokens", usage.get("output_tokens"))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self.tracer.start_run_span(run_id, parent_run_id, f"tool {name}", **{"tool.name": name, "tool.input": input_str})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+
+def _load_trace(path: Path, trace_id: str | None) -> list[dict[str, Any]]:
+    found: list[dict[str, Any]] = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            spans = [
+                span
+                for resource in json.loads(line)["resourceSpans"]
+                for scope in resource["scopeSpans"]
+                for span in scope["spans"]
+            ]
+            if spans and (trace_id is None or spans[0]["traceId"] == trace_id):
+                found = spans
+    return found
+
+
+def format_waterfall(spans: list[dict[str, Any]], width: int = 60) -> str:
+    """Text waterfall of one trace: spans in tree order with their offset and duration bars."""
+    if not spans:
+        return "No spans"
+    children: dict[str | None, list[dict[str, Any]]] = {}
+    for span in spans:
+        children.setdefault(span.get("parentSpanId"), []).append(span)
+    start = min(int(span["startTimeUnixNano"]) for span in spans)
+    total = max(int(span["endTimeUnixNano"]) for span in spans) - start or 1
+
+    lines = [f"trace {spans[0]['traceId']}  total {total / 1e9:.3f}s"]
+
+    def visit(span: dict[str, Any], depth: int) -> None:
+        begin = int(span["startTimeUnixNano"]) - start
+        duration = int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])
+        offset = int(begin / total * width)
+        bar = " " * offset + "#" * max(1, int(duration / total * width))
+        error = " ERROR" if span.get("status", {}).get("code") == STATUS_ERROR else ""
+        label = ("  " * depth + span["name"])[:48]
+        lines.append(f"{label:<48} {begin / 1e9:>8.3f}s {duration / 1e9:>8.3f}s |{bar:<{width}}|{error}")
+        for child in sorted(children.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+            visit(child, depth + 1)
+
+    for root in children.get(None, []):
+        visit(root, 0)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the waterfall of a trace exported by the service")
+    parser.add_argument("file", nargs="?", default=str(TRACING_FILE), help="OTLP JSON lines file")
+    parser.add_argument("--trace", help="run_id / trace id (default: the last trace in the file)")
+    args = parser.parse_args()
+    trace_id = UUID(args.trace).hex if args.trace else None
+    spans = _load_trace(Path(args.file), trace_id)
+    if not spans:
+        sys.exit(f"No trace found in {args.file}")
+    print(format_waterfall(spans))
+
+
+if __name__ == "__main__":
+    main()
@@ -99,11 +99,24 @@ async def get_telogical_postgres_saver() -> AsyncPostgresSaver:
         
         _telogical_async_pool = AsyncConnectionPool(
             conninfo=db_uri,
-            max_size=20,  # Adjust as needed
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "4")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "20")),
             kwargs=connection_kwargs,
+            open=False,
         )
+        # Wait until min_size connections are established so the first requests don't pay for them
+        await _telogical_async_pool.open(wait=True, timeout=float(os.getenv("DB_POOL_OPEN_TIMEOUT", "30")))
         
         _telogical_async_saver = AsyncPostgresSaver(_telogical_async_pool)
         await _telogical_async_saver.setup()  # Ensure tables are created
     
     return _telogical_async_saver
+
+
+async def close_telogical_postgres_pool() -> None:
+    """Close the Telogical connection pool, if it was opened."""
+    global _telogical_async_pool, _telogical_async_saver
+    if _telogical_async_pool is not None:
+        await _telogical_async_pool.close()
+    _telogical_async_pool = None
+    _telogical_async_saver = None
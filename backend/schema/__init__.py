@@ -6,6 +6,7 @@ from backend.schema.schema import (
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    JobStatus,
     ServiceMetadata,
     StreamInput,
     UserInput,
@@ -22,4 +23,5 @@ __all__ = [
     "FeedbackResponse",
     "ChatHistoryInput",
     "ChatHistory",
+    "JobStatus",
 ]
@@ -1,9 +1,10 @@
 from typing import Any, Literal, NotRequired
 
-from pydantic import BaseModel, Field, SerializeAsAny
+from pydantic import BaseModel, Field, SerializeAsAny, model_validator
 from typing_extensions import TypedDict
 
 from backend.schema.models import AllModelEnum, AnthropicModelName, OpenAIModelName
+from backend.schema.task_data import TaskData
 
 
 class AgentInfo(BaseModel):
@@ -113,6 +114,11 @@ class ChatMessage(BaseModel):
         default=None,
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
+    id: str | None = Field(
+        description="ID of the message in the thread's history, used as a /history cursor.",
+        default=None,
+        examples=["run-847c6285-8fc9-4560-a83f-4e6285809254-0"],
+    )
     response_metadata: dict[str, Any] = Field(
         description="Response metadata. For example: response headers, logprobs, token counts.",
         default={},
@@ -169,7 +175,68 @@ class ChatHistoryInput(BaseModel):
         description="Thread ID to persist and continue a multi-turn conversation.",
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
+    before: str | None = Field(
+        description="Return the messages before the message with this ID (the previous page). "
+        "Cannot be combined with `since`.",
+        default=None,
+    )
+    since: str | None = Field(
+        description="Return only the messages after the message with this ID (incremental update).",
+        default=None,
+    )
+    limit: int | None = Field(
+        description="Maximum number of messages to return: the newest ones, or with `since` the oldest "
+        "ones after it. A page never starts with tool results, so it can hold a few more.",
+        default=None,
+        ge=1,
+    )
+
+    @model_validator(mode="after")
+    def check_one_cursor(self) -> "ChatHistoryInput":
+        if self.before is not None and self.since is not None:
+            raise ValueError("`before` and `since` cannot be used together")
+        return self
 
 
 class ChatHistory(BaseModel):
     messages: list[ChatMessage]
+    has_more: bool = Field(
+        description="Whether there are more messages beyond this page (older ones, or newer ones with `since`).",
+        default=False,
+    )
+
+
+class JobStatus(BaseModel):
+    """State, progress and result of a background job."""
+
+    job_id: str = Field(
+        description="Job ID, used to poll for progress and fetch the result.",
+        examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
+    )
+    agent_id: str = Field(
+        description="Agent running the job.",
+        examples=["telogical-assistant"],
+    )
+    thread_id: str = Field(
+        description="Thread the job runs in; its history is available from /history.",
+        examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
+    )
+    status: Literal["queued", "running", "complete", "error"] = Field(
+        description="Current state of the job.",
+        examples=["running"],
+    )
+    created_at: float = Field(description="Submission time (Unix seconds).")
+    started_at: float | None = Field(description="Start of the latest attempt (Unix seconds).", default=None)
+    finished_at: float | None = Field(description="Completion time (Unix seconds).", default=None)
+    attempts: int = Field(
+        description="Runs started for this job; a job whose worker stopped is resumed from its checkpoint.",
+        default=0,
+    )
+    events: list[TaskData] = Field(
+        description="Progress events from index `events_offset` on. Only the latest events are kept.",
+        default=[],
+    )
+    events_offset: int = Field(description="Index of the first event in `events`.", default=0)
+    events_total: int = Field(description="Progress events recorded so far; poll again with `since` set to it.", default=0)
+    result: ChatMessage | None = Field(description="Final answer, once the job is complete.", default=None)
+    error: str | None = Field(description="Why the job failed, when status is error.", default=None)
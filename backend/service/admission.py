@@ -0,0 +1,249 @@
+"""Admission control for agent runs: global and per-user concurrency limits with a wait queue.
+
+Every /invoke and /stream request needs a slot before its run starts, and holds it until the
+run (or the stream) ends:
+
+- at most ADMISSION_MAX_IN_FLIGHT runs at once on this worker, at most ADMISSION_MAX_PER_USER
+  of them for one user_id, and at most ADMISSION_MAX_BATCH_IN_FLIGHT batch runs;
+- a request that cannot start waits in a queue of ADMISSION_QUEUE_SIZE places for up to
+  ADMISSION_QUEUE_TIMEOUT seconds. Interactive requests are admitted before batch ones, and in
+  arrival order within a priority;
+- a request is rejected at once with 429 and a Retry-After header when the queue is full or
+  its user already has ADMISSION_MAX_QUEUED_PER_USER requests waiting, and after the timeout.
+
+Callers mark bulk work with `X-Priority: batch` (or agent_config `{"priority": "batch"}`).
+Requests without a user_id are limited together as one user.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator, AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import HTTPException, status
+
+from backend.core.metrics import Counter as MetricCounter
+from backend.core.metrics import GaugeCallback
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "4"))
+ADMISSION_MAX_BATCH_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_BATCH_IN_FLIGHT", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+ADMISSION_MAX_QUEUED_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "4"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+ANONYMOUS_USER = "anonymous"
+
+ADMISSION_REJECTIONS = MetricCounter(
+    "admission_rejections_total", "Requests rejected with 429 by admission control, by reason.", ["reason"]
+)
+
+
+def request_priority(header: str | None, agent_config: dict[str, Any]) -> int:
+    """Priority asked for by the X-Priority header or agent_config["priority"] (which is removed)."""
+    value = agent_config.pop("priority", None) or header or "interactive"
+    return PRIORITIES.get(str(value).strip().lower(), PRIORITY_INTERACTIVE)
+
+
+@dataclass
+class AdmissionSlot:
+    """A granted slot; `release` is idempotent so every exit path can call it."""
+
+    controller: "AdmissionController"
+    user_id: str
+    priority: int
+    admitted_at: float = field(default_factory=time.monotonic)
+    released: bool = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    user_id: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_per_user: int = ADMISSION_MAX_PER_USER,
+        max_batch_in_flight: int = ADMISSION_MAX_BATCH_IN_FLIGHT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_queued_per_user: int = ADMISSION_MAX_QUEUED_PER_USER,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_batch_in_flight = max_batch_in_flight
+        self.queue_size = queue_size
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.batch_in_flight = 0
+        self.user_in_flight: Counter[str] = Counter()
+        self.user_queued: Counter[str] = Counter()
+        self._waiters: list[_Waiter] = []
+        self._sequence = itertools.count()
+        # Smoothed time a slot is held, to suggest a Retry-After
+        self._mean_hold_seconds = 5.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.future.done())
+
+    def _can_admit(self, user_id: str, priority: int) -> bool:
+        return (
+            self.in_flight < self.max_in_flight
+            and self.user_in_flight[user_id] < self.max_per_user
+            and (priority != PRIORITY_BATCH or self.batch_in_flight < self.max_batch_in_flight)
+        )
+
+    def _admit(self, user_id: str, priority: int) -> AdmissionSlot:
+        self.in_flight += 1
+        self.user_in_flight[user_id] += 1
+        if priority == PRIORITY_BATCH:
+            self.batch_in_flight += 1
+        return AdmissionSlot(self, user_id, priority)
+
+    def _release(self, slot: AdmissionSlot) -> None:
+        self.in_flight -= 1
+        self.user_in_flight[slot.user_id] -= 1
+        if self.user_in_flight[slot.user_id] <= 0:
+            del self.user_in_flight[slot.user_id]
+        if slot.priority == PRIORITY_BATCH:
+            self.batch_in_flight -= 1
+        held = time.monotonic() - slot.admitted_at
+        self._mean_hold_seconds = 0.9 * self._mean_hold_seconds + 0.1 * held
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while their limits allow."""
+        skipped: list[_Waiter] = []
+        while self._waiters and self.in_flight < self.max_in_flight:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            if self._can_admit(waiter.user_id, waiter.priority):
+                self.user_queued[waiter.user_id] -= 1
+                waiter.future.set_result(self._admit(waiter.user_id, waiter.priority))
+            else:
+                # Blocked by its own user's or the batch limit; let others past
+                skipped.append(waiter)
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the queue length and mean run duration."""
+        waves = (self.queued + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(self._mean_hold_seconds * waves))
+
+    def _reject(self, reason: str, detail: str) -> HTTPException:
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        logger.warning(f"Admission rejected ({reason}): {detail}")
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    def _hand_back(self, waiter: _Waiter) -> None:
+        # Admitted by _dispatch just as the wait timed out or was cancelled: release the slot
+        if waiter.future.done() and not waiter.future.cancelled():
+            waiter.future.result().release()
+
+    async def acquire(self, user_id: str | None, priority: int = PRIORITY_INTERACTIVE) -> AdmissionSlot:
+        """A slot for a run of `user_id`, waiting in the queue if needed. Raises HTTP 429."""
+        user_id = user_id or ANONYMOUS_USER
+        # Nobody of the same or a higher priority may be waiting for the slot we would take
+        ahead = any(w.priority <= priority and not w.future.done() for w in self._waiters)
+        if not ahead and self._can_admit(user_id, priority):
+            return self._admit(user_id, priority)
+
+        if self.queued >= self.queue_size:
+            raise self._reject("queue_full", "Service is at capacity, retry later")
+        if self.user_queued[user_id] >= self.max_queued_per_user:
+            raise self._reject("user_limit", f"Too many concurrent requests for user {user_id}")
+
+        waiter = _Waiter(priority, next(self._sequence), user_id, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self.user_queued[user_id] += 1
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except TimeoutError:
+            self._hand_back(waiter)
+            raise self._reject("queue_timeout", f"No capacity within {self.queue_timeout:g}s, retry later")
+        except asyncio.CancelledError:
+            self._hand_back(waiter)
+            raise
+        finally:
+            if not waiter.future.done():
+                # Timed out or cancelled while waiting: give up the place in the queue
+                waiter.future.cancel()
+                self.user_queued[user_id] -= 1
+            if self.user_queued[user_id] <= 0:
+                del self.user_queued[user_id]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "batch_in_flight": self.batch_in_flight,
+            "queued": self.queued,
+            "users_in_flight": len(self.user_in_flight),
+            "mean_hold_seconds": round(self._mean_hold_seconds, 3),
+        }
+
+
+admission_controller = AdmissionController()
+
+GaugeCallback(
+    "admission_in_flight",
+    "Agent runs holding an admission slot, by priority.",
+    ["priority"],
+    lambda: {
+        ("interactive",): admission_controller.in_flight - admission_controller.batch_in_flight,
+        ("batch",): admission_controller.batch_in_flight,
+    },
+)
+GaugeCallback("admission_queued", "Requests waiting for an admission slot.", [], lambda: {(): admission_controller.queued})
+
+
+async def admit(user_id: str | None, priority: int) -> AdmissionSlot | None:
+    """A slot from the shared controller, or None when ADMISSION_ENABLED is off."""
+    if not ADMISSION_ENABLED:
+        return None
+    return await admission_controller.acquire(user_id, priority)
+
+
+def release(slot: AdmissionSlot | None) -> None:
+    if slot is not None:
+        slot.release()
+
+
+async def release_when_done(frames: AsyncIterator[str], slot: AdmissionSlot | None) -> AsyncGenerator[str, None]:
+    """Pass `frames` through, releasing `slot` when the stream ends or is abandoned."""
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        release(slot)
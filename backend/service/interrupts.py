@@ -0,0 +1,84 @@
+"""Per-thread interrupt flags, so requests do not load the whole checkpoint to find interrupts.
+
+A run that ends in a LangGraph interrupt leaves its thread waiting for the user's answer; the
+next request on the thread must resume it with `Command(resume=...)` instead of starting a new
+turn. Checking that with `agent.aget_state` loads the latest checkpoint with the full message
+history before any work starts, so request start latency grew with conversation length.
+
+Instead the service keeps a small flag per thread in the agent's store: `{"interrupted": true}` when a run ends in an interrupt and
+`{"interrupted": false}` when a resumed run completes, and looking it up is a single-row read.
+A thread without a flag (new, or last run before the flags existed) is checked once against
+its checkpoint and the result stored as its flag, so threads interrupted before the flags
+were introduced are still resumed.
+
+The flags are only kept in a store shared by all workers (Postgres). With DATABASE_TYPE=sqlite
+the store is an InMemoryStore private to each worker process, so a worker could keep a stale
+flag after another one recorded an interrupt; those agents, agents without a store and
+INTERRUPT_CHECK=state use the checkpoint-based check on every request.
+"""
+
+import logging
+import os
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.pregel import Pregel
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
+
+logger = logging.getLogger(__name__)
+
+INTERRUPT_CHECK = os.getenv("INTERRUPT_CHECK", "flag").lower()  # flag | state
+INTERRUPT_NAMESPACE = ("service", "interrupted_threads")
+
+
+async def _state_has_interrupts(agent: Pregel, config: RunnableConfig) -> bool:
+    state = await agent.aget_state(config=config)
+    return any(getattr(task, "interrupts", None) for task in state.tasks)
+
+
+def _flag_store(agent: Pregel) -> BaseStore | None:
+    """The store to keep interrupt flags in, or None to check the checkpoint instead."""
+    store = getattr(agent, "store", None)
+    if INTERRUPT_CHECK == "state" or store is None or isinstance(store, InMemoryStore):
+        return None
+    return store
+
+
+async def is_thread_interrupted(agent: Pregel, config: RunnableConfig) -> bool:
+    """Whether the thread of `config` is waiting to be resumed from an interrupt."""
+    store = _flag_store(agent)
+    if store is None:
+        return await _state_has_interrupts(agent, config)
+    thread_id = config["configurable"]["thread_id"]
+    try:
+        flag = await store.aget(INTERRUPT_NAMESPACE, thread_id)
+    except Exception as e:
+        logger.warning(f"Interrupt flag lookup failed for thread {thread_id}, reading the checkpoint: {e}")
+        return await _state_has_interrupts(agent, config)
+    if flag is not None:
+        # Flags written before they recorded a value only existed while the thread was interrupted
+        return bool(flag.value.get("interrupted", True))
+
+    interrupted = await _state_has_interrupts(agent, config)
+    await _put_flag(store, thread_id, interrupted, config)
+    return interrupted
+
+
+async def _put_flag(store: BaseStore, thread_id: str, interrupted: bool, config: RunnableConfig) -> None:
+    value: dict[str, Any] = {"interrupted": interrupted, "run_id": str(config.get("run_id"))}
+    try:
+        await store.aput(INTERRUPT_NAMESPACE, thread_id, value, index=False)
+    except Exception as e:
+        logger.warning(f"Could not update the interrupt flag of thread {thread_id}: {e}")
+
+
+async def update_interrupt_flag(agent: Pregel, config: RunnableConfig, interrupted: bool, resumed: bool) -> None:
+    """
+    Record how a run ended: set the flag when it was interrupted, clear it when it resumed an
+    interrupted thread and completed. Other runs need no write.
+    """
+    store = _flag_store(agent)
+    if store is None or not (interrupted or resumed):
+        return
+    await _put_flag(store, config["configurable"]["thread_id"], interrupted, config)
@@ -0,0 +1,320 @@
+"""Background jobs for questions that take longer than a request or an SSE stream may stay open.
+
+POST /jobs saves the job in the agents' store (namespace ("service", "jobs")) and returns at
+once with its job_id. JOBS_WORKERS tasks per service worker
+run the queued jobs; clients poll GET /jobs/{job_id}, follow /jobs/{job_id}/stream, or fetch
+the result whenever they come back.
+
+Progress is recorded as TaskData events, the custom-event shape the Streamlit app already
+draws: one when the job is queued, starts and ends, and one per graph node that finishes. The
+job record, with its latest JOBS_MAX_EVENTS events, is saved when the job changes state and at
+most every JOBS_PROGRESS_INTERVAL seconds in between.
+
+The agent run is checkpointed like any other run of the job's thread. The worker holding a job
+renews its lease every JOBS_LEASE_SECONDS / 3; once a lease has lapsed (the worker stopped), a
+worker with spare capacity claims the job and continues the run from the thread's last
+checkpoint, up to JOBS_MAX_ATTEMPTS runs in all.
+
+Polling and lease takeover need a store shared by every worker and replica (Postgres). With
+DATABASE_TYPE=sqlite the store is an InMemoryStore private to each worker process: a job would
+only be found on the worker that accepted it, so jobs are then only offered when the service
+runs a single worker (SERVICE_WORKERS=1), and a job does not survive a restart.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
+
+from backend.core.metrics import GaugeCallback
+from backend.schema.schema import ChatMessage, JobStatus, UserInput
+from backend.schema.task_data import TaskData
+from backend.service.workers import worker_id
+
+logger = logging.getLogger(__name__)
+
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))
+JOBS_MAX_PER_USER = int(os.getenv("JOBS_MAX_PER_USER", "5"))
+JOBS_MAX_EVENTS = int(os.getenv("JOBS_MAX_EVENTS", "200"))
+JOBS_PROGRESS_INTERVAL = float(os.getenv("JOBS_PROGRESS_INTERVAL", "2"))
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+# Worker processes of the service (set by docker/gunicorn.conf.py)
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "1"))
+
+JOB_NAMESPACE = ("service", "jobs")
+JOB_TASK_NAME = "Background job"
+ACTIVE_STATES = ("queued", "running")
+
+
+@dataclass
+class Job:
+    job_id: str
+    agent_id: str
+    thread_id: str
+    user_id: str | None
+    input: dict[str, Any]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    attempts: int = 0
+    events: list[dict[str, Any]] = field(default_factory=list)
+    events_total: int = 0
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    owner: str | None = None
+    heartbeat_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_record(cls, value: dict[str, Any]) -> "Job":
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: item for key, item in value.items() if key in names})
+
+    def add_event(self, task: TaskData) -> None:
+        self.events.append(task.model_dump())
+        self.events_total += 1
+        del self.events[:-JOBS_MAX_EVENTS]
+
+    def job_task(self, state: str, result: str | None = None, **data: Any) -> TaskData:
+        """The event for the job as a whole; all of them share the job_id as run_id."""
+        return TaskData(name=JOB_TASK_NAME, run_id=self.job_id, state=state, result=result, data=data)  # type: ignore[arg-type]
+
+    def status_model(self, since: int = 0) -> JobStatus:
+        """The job as returned by the API, with the progress events from index `since` on."""
+        offset = self.events_total - len(self.events)
+        start = max(since, offset)
+        return JobStatus(
+            job_id=self.job_id,
+            agent_id=self.agent_id,
+            thread_id=self.thread_id,
+            status=self.status,  # type: ignore[arg-type]
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            attempts=self.attempts,
+            events=[TaskData.model_validate(event) for event in self.events[start - offset :]],
+            events_offset=start,
+            events_total=self.events_total,
+            result=ChatMessage.model_validate(self.result) if self.result is not None else None,
+            error=self.error,
+        )
+
+
+ReportProgress = Callable[[TaskData], Awaitable[None]]
+ExecuteJob = Callable[[Job, ReportProgress], Awaitable[ChatMessage]]
+
+
+class JobPool:
+    """The jobs this worker holds, and the tasks running them."""
+
+    def __init__(self) -> None:
+        self._store: BaseStore | None = None
+        self._execute: ExecuteJob | None = None
+        self._queue: asyncio.Queue[Job] = asyncio.Queue()
+        self._jobs: dict[str, Job] = {}  # queued or running here, by job_id
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self, store: BaseStore, execute: ExecuteJob) -> None:
+        if not JOBS_ENABLED:
+            return
+        if isinstance(store, InMemoryStore) and SERVICE_WORKERS > 1:
+            logger.warning(
+                f"Background jobs disabled: the store is private to each of the {SERVICE_WORKERS} "
+                "worker processes (DATABASE_TYPE=sqlite), so jobs could not be found or resumed "
+                "by the other workers"
+            )
+            return
+        self._store = store
+        self._execute = execute
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(JOBS_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._keep_leases()))
+
+    async def stop(self) -> None:
+        # Running jobs are left as they are: their lease lapses and another worker resumes them
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def counts(self) -> dict[str, int]:
+        return {state: sum(1 for job in self._jobs.values() if job.status == state) for state in ACTIVE_STATES}
+
+    async def _save(self, job: Job) -> None:
+        job.heartbeat_at = time.time()
+        await self._store.aput(JOB_NAMESPACE, job.job_id, asdict(job), index=False)  # type: ignore[union-attr]
+
+    def _reject(self, detail: str) -> HTTPException:
+        logger.warning(f"Job rejected: {detail}")
+        retry_after = int(JOBS_LEASE_SECONDS)
+        return HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    async def submit(self, agent_id: str, user_input: UserInput) -> Job:
+        """Save a new job and queue it on this worker. Raises HTTP 429 when too many are waiting."""
+        if not JOBS_ENABLED or self._store is None:
+            raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail="Background jobs are not available")
+        if len(self._jobs) >= JOBS_MAX_QUEUED:
+            raise self._reject("Too many background jobs, retry later")
+        if sum(1 for job in self._jobs.values() if job.user_id == user_input.user_id) >= JOBS_MAX_PER_USER:
+            raise self._reject(f"Too many background jobs for user {user_input.user_id}")
+
+        # A fixed thread, so a resumed attempt continues the same checkpointed run
+        thread_id = user_input.thread_id or str(uuid4())
+        user_input = user_input.model_copy(update={"thread_id": thread_id})
+        job = Job(
+            job_id=str(uuid4()),
+            agent_id=agent_id,
+            thread_id=thread_id,
+            user_id=user_input.user_id,
+            input=user_input.model_dump(mode="json"),
+            owner=worker_id(),
+        )
+        job.add_event(job.job_task("new", message=user_input.message))
+        await self._save(job)
+        self._jobs[job.job_id] = job
+        self._queue.put_nowait(job)
+        logger.info(f"Job {job.job_id} queued for agent {agent_id} (thread {thread_id})")
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            # Held here: fresher than the saved record
+            return job
+        item = await self._store.aget(JOB_NAMESPACE, job_id) if self._store is not None else None
+        return Job.from_record(item.value) if item is not None else None
+
+    async def frames(self, job_id: str, since: int = 0) -> AsyncGenerator[str, None]:
+        """
+        SSE frames for a job, in the format of /stream: each progress event as a custom message
+        carrying TaskData, then the result message (or an error) and [DONE] once the job ends.
+        """
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                yield f"data: {json.dumps({'type': 'error', 'content': 'Job not found'})}\n\n"
+                break
+            job_status = job.status_model(since)
+            for task in job_status.events:
+                message = ChatMessage(type="custom", content="", custom_data=task.model_dump())
+                yield f"data: {json.dumps({'type': 'message', 'content': message.model_dump()})}\n\n"
+            since = job_status.events_total
+            if job_status.result is not None:
+                yield f"data: {json.dumps({'type': 'message', 'content': job_status.result.model_dump()})}\n\n"
+            if job_status.status == "error":
+                yield f"data: {json.dumps({'type': 'error', 'content': job_status.error})}\n\n"
+            if job_status.status not in ACTIVE_STATES:
+                break
+            await asyncio.sleep(JOBS_POLL_INTERVAL)
+        yield "data: [DONE]\n\n"
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Could not record the outcome of job {job.job_id}: {e}")
+            finally:
+                self._jobs.pop(job.job_id, None)
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.attempts += 1
+        job.add_event(job.job_task("running", attempt=job.attempts))
+        await self._save(job)
+        last_saved = time.monotonic()
+
+        async def report(task: TaskData) -> None:
+            nonlocal last_saved
+            job.add_event(task)
+            if time.monotonic() - last_saved >= JOBS_PROGRESS_INTERVAL:
+                await self._save(job)
+                last_saved = time.monotonic()
+
+        try:
+            result = await self._execute(job, report)  # type: ignore[misc]
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed on attempt {job.attempts}: {e}")
+            job.status = "error"
+            job.error = "Unexpected error"
+            job.add_event(job.job_task("complete", "error", error=job.error))
+        else:
+            job.status = "complete"
+            job.result = result.model_dump()
+            job.add_event(job.job_task("complete", "success", run_id=result.run_id))
+        job.finished_at = time.time()
+        await self._save(job)
+        logger.info(f"Job {job.job_id} {job.status} after {job.finished_at - job.started_at:.1f}s")
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(JOBS_LEASE_SECONDS / 3)
+            try:
+                for job in list(self._jobs.values()):
+                    await self._save(job)
+                await self._claim_abandoned()
+            except Exception as e:
+                logger.warning(f"Job lease renewal failed: {e}")
+
+    async def _claim_abandoned(self) -> None:
+        """Take over jobs whose worker stopped renewing their lease, as far as this worker has room."""
+        room = JOBS_WORKERS - len(self._jobs)
+        if room <= 0:
+            return
+        now = time.time()
+        abandoned: list[Job] = []
+        for state in ACTIVE_STATES:
+            items = await self._store.asearch(JOB_NAMESPACE, filter={"status": state}, limit=JOBS_MAX_QUEUED)  # type: ignore[union-attr]
+            abandoned.extend(
+                Job.from_record(item.value)
+                for item in items
+                if item.key not in self._jobs and now - item.value.get("heartbeat_at", 0) > JOBS_LEASE_SECONDS
+            )
+        if not abandoned:
+            return
+
+        claimed = abandoned[:room]
+        for job in claimed:
+            job.owner = worker_id()
+            await self._save(job)
+        # Workers claiming at the same moment: the last claim saved wins, the others back off
+        await asyncio.sleep(1)
+        for job in claimed:
+            item = await self._store.aget(JOB_NAMESPACE, job.job_id)  # type: ignore[union-attr]
+            if item is None or item.value.get("owner") != worker_id():
+                continue
+            if job.attempts >= JOBS_MAX_ATTEMPTS:
+                job.status = "error"
+                job.error = f"Gave up after {job.attempts} attempts"
+                job.finished_at = time.time()
+                job.add_event(job.job_task("complete", "error", error=job.error))
+                await self._save(job)
+                logger.error(f"Job {job.job_id}: {job.error}")
+                continue
+            logger.warning(f"Resuming abandoned job {job.job_id} (attempt {job.attempts + 1})")
+            self._jobs[job.job_id] = job
+            self._queue.put_nowait(job)
+
+
+job_pool = JobPool()
+
+GaugeCallback(
+    "background_jobs",
+    "Background jobs held by this worker, by state.",
+    ["state"],
+    lambda: {(state,): count for state, count in job_pool.counts().items()},
+)
@@ -1,44 +1,115 @@
+import asyncio
+import contextlib
 import inspect
 import json
 import logging
 import warnings
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from functools import partial
 from typing import Annotated, Any
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from langchain_core._api import LangChainBetaWarning
-from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
 from langchain_core.runnables import RunnableConfig
 from langgraph.pregel import Pregel
 from langgraph.types import Command, Interrupt
 from langsmith import Client as LangsmithClient
-
-from backend.agents.agents import DEFAULT_AGENT, get_agent, get_all_agent_info
+from starlette.background import BackgroundTask
+
+from backend.agents.agents import (
+    DEFAULT_AGENT,
+    get_agent,
+    get_all_agent_info,
+    prefork_agent,
+    prewarm_agent,
+)
+from backend.agents.wyscout.context_docs import load_context_documents
 from backend.core import settings
+from backend.core.accounting import (
+    ACCOUNTING_ENABLED,
+    AccountingCallbackHandler,
+    WorkAccounting,
+    accounting_scope,
+    finish_accounting,
+    get_thread_accounting,
+    get_user_accounting,
+)
+from backend.core.metrics import (
+    ACTIVE_STREAMS,
+    METRICS_ENABLED,
+    instrument_checkpointer,
+    monitor_event_loop_lag,
+    render_metrics,
+)
+from backend.core.profiling import (
+    collapsed_stacks,
+    load_profile,
+    profile_run,
+    requested_profile_modes,
+)
+from backend.core.tracing import (
+    TRACING_ENABLED,
+    Tracer,
+    TracingCallbackHandler,
+    start_span,
+    tracing_scope,
+)
 from backend.memory import initialize_database, initialize_store
+from backend.memory.postgres import close_telogical_postgres_pool
 from backend.schema.schema import (
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    JobStatus,
     ServiceMetadata,
     StreamInput,
     UserInput,
 )
+from backend.schema.task_data import TaskData
+from backend.service.admission import admit, release, release_when_done, request_priority
+from backend.service.interrupts import is_thread_interrupted, update_interrupt_flag
+from backend.service.jobs import Job, ReportProgress, job_pool
+from backend.service.sse import SSEToken, sse_frames
 from backend.service.utils import (
+    cached_chat_message,
     convert_message_content_to_string,
     langchain_to_chat_message,
     remove_tool_calls,
 )
+from backend.service.warmup import (
+    mark_not_ready,
+    mark_ready,
+    mark_warmup_started,
+    run_warmup_step,
+    warmup_status,
+)
+from backend.service.workers import (
+    list_workers,
+    mark_worker_started,
+    publish_worker_state,
+    worker_state,
+)
 
 warnings.filterwarnings("ignore", category=LangChainBetaWarning)
 logger = logging.getLogger(__name__)
 
+# Nodes whose AI message is the run's answer; the streamed one carries the run's accounting
+FINAL_ANSWER_NODES = {"refine_output", "answer_cache"}
+
 
 def verify_bearer(
     http_auth: Annotated[
@@ -57,9 +128,14 @@ def verify_bearer(
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Configurable lifespan that initializes the appropriate database checkpointer and store
-    based on settings.
+    based on settings, then warms up every registered agent (compiled graphs, connection
+    pools, LLM clients) before the service reports ready on /health.
     """
+    mark_worker_started()
+    mark_warmup_started()
     try:
+        # Load static context documents (schema reference, taxonomy) and their token counts once
+        await run_warmup_step("context_documents", _load_context_documents, required=False)
         # Initialize both checkpointer (for short-term memory) and store (for long-term memory)
         async with initialize_database() as saver, initialize_store() as store:
             # Set up both components
@@ -72,17 +148,53 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             # Configure agents with both memory components
             agent_infos = get_all_agent_info()
             for a in agent_infos:
+                # Compile the agent's graphs and open its pools and model clients ahead of traffic
+                await run_warmup_step(f"agent:{a.key}", partial(prewarm_agent, a.key), required=False)
                 agent = await get_agent(a.key)
                 # Set checkpointer for thread-scoped memory (conversation history)
-                agent.checkpointer = saver
+                agent.checkpointer = instrument_checkpointer(saver)
                 # Set store for long-term memory (cross-conversation knowledge)
                 agent.store = store
-            yield
+            lag_monitor = asyncio.create_task(monitor_event_loop_lag()) if METRICS_ENABLED else None
+            mark_ready()
+            heartbeat = asyncio.create_task(publish_worker_state())
+            job_pool.start(store, _execute_job)
+            try:
+                yield
+            finally:
+                mark_not_ready()
+                await job_pool.stop()
+                for task in (lag_monitor, heartbeat):
+                    if task is not None:
+                        task.cancel()
+                        with contextlib.suppress(asyncio.CancelledError):
+                            await task
+                await close_telogical_postgres_pool()
     except Exception as e:
         logger.error(f"Error during database/store initialization: {e}")
         raise
 
 
+async def _load_context_documents() -> None:
+    load_context_documents()
+
+
+async def prefork() -> None:
+    """
+    Startup work shared by all workers, for servers that import the app once and then fork
+    the workers (gunicorn with preload_app, see docker/gunicorn.conf.py): the context
+    documents and the agents' compiled graphs. Connection pools, the checkpointer and the
+    store are opened by each worker in `lifespan`.
+    """
+    await _load_context_documents()
+    for a in get_all_agent_info():
+        try:
+            await prefork_agent(a.key)
+        except Exception as e:
+            # The worker's warmup builds whatever is missing
+            logger.warning(f"Pre-fork warmup of agent {a.key} failed: {e}")
+
+
 app = FastAPI(lifespan=lifespan)
 router = APIRouter(dependencies=[Depends(verify_bearer)])
 
@@ -99,10 +211,13 @@ async def info() -> ServiceMetadata:
     )
 
 
-async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str, Any], UUID]:
+async def _handle_input(
+    user_input: UserInput, agent: Pregel
+) -> tuple[dict[str, Any], UUID, WorkAccounting | None, Tracer | None]:
     """
     Parse user input and handle any required interrupt resumption.
-    Returns kwargs for agent invocation and the run_id.
+    Returns kwargs for agent invocation, the run_id, the run's work accounting (None when
+    ACCOUNTING_ENABLED is off) and its tracer (None when TRACING_ENABLED is off).
     """
     run_id = uuid4()
     thread_id = user_input.thread_id or str(uuid4())
@@ -110,9 +225,9 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
 
     configurable = {"thread_id": thread_id, "model": user_input.model, "user_id": user_id}
 
+    message_history = None
     if user_input.agent_config:
         # Extract message_history if provided, as we'll handle it specially
-        message_history = None
         if "message_history" in user_input.agent_config:
             message_history = user_input.agent_config.pop("message_history")
         
@@ -126,19 +241,33 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
         # Update configurable with remaining agent_config items
         configurable.update(user_input.agent_config)
 
+    accounting = None
+    callbacks = []
+    if ACCOUNTING_ENABLED:
+        accounting = WorkAccounting(run_id=str(run_id), thread_id=thread_id, user_id=user_id)
+        callbacks.append(AccountingCallbackHandler(accounting))
+    tracer = None
+    if TRACING_ENABLED:
+        # The run_id is the trace id, so a run's trace can be found from its messages
+        tracer = Tracer(
+            run_id,
+            "POST /stream" if isinstance(user_input, StreamInput) else "POST /invoke",
+            {"thread_id": thread_id, "user_id": user_id, "model": str(user_input.model)},
+        )
+        callbacks.append(TracingCallbackHandler(tracer))
+
     config = RunnableConfig(
         configurable=configurable,
         run_id=run_id,
+        callbacks=callbacks,
     )
 
     # Check for interrupts that need to be resumed
-    state = await agent.aget_state(config=config)
-    interrupted_tasks = [
-        task for task in state.tasks if hasattr(task, "interrupts") and task.interrupts
-    ]
+    with tracing_scope(tracer), start_span("interrupt_check"):
+        interrupted = await is_thread_interrupted(agent, config)
 
     # Prepare input messages
-    if interrupted_tasks:
+    if interrupted:
         # assume user input is response to resume agent execution from interrupt
         input = Command(resume=user_input.message)
     else:
@@ -175,12 +304,22 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
         "config": config,
     }
 
-    return kwargs, run_id
+    return kwargs, run_id, accounting, tracer
+
+
+async def _attach_accounting(chat_message: ChatMessage, accounting: WorkAccounting | None) -> None:
+    if accounting is not None:
+        chat_message.custom_data = {**chat_message.custom_data, "accounting": await finish_accounting(accounting)}
 
 
 @router.post("/{agent_id}/invoke")
 @router.post("/invoke")
-async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMessage:
+async def invoke(
+    user_input: UserInput,
+    agent_id: str = DEFAULT_AGENT,
+    x_profile: Annotated[str | None, Header()] = None,
+    x_priority: Annotated[str | None, Header()] = None,
+) -> ChatMessage:
     """
     Invoke an agent with user input to retrieve a final response.
 
@@ -188,6 +327,12 @@ async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMe
     Use thread_id to persist and continue a multi-turn conversation. run_id kwarg
     is also attached to messages for recording feedback.
     Use user_id to persist and continue a conversation across multiple threads.
+
+    Send `X-Profile: cpu,memory` (or agent_config `{"profile": true}`) to profile the run
+    (with PROFILING_ENABLED and AUTH_SECRET set); the profile is then available from
+    /profiles/{run_id}.
+    Send `X-Priority: batch` for bulk work; it yields to interactive requests and gets 429
+    with Retry-After when the service or the user is at its concurrency limit.
     """
     # NOTE: Currently this only returns the last message or interrupt.
     # In the case of an agent outputting multiple AIMessages (such as the background step
@@ -195,9 +340,20 @@ async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMe
     # you'd want to include it. You could update the API to return a list of ChatMessages
     # in that case.
     agent: Pregel = await get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
+    profile_modes = requested_profile_modes(x_profile, user_input.agent_config)
+    slot = await admit(user_input.user_id, request_priority(x_priority, user_input.agent_config))
     try:
-        response_events: list[tuple[str, Any]] = await agent.ainvoke(**kwargs, stream_mode=["updates", "values"])  # type: ignore # fmt: skip
+        return await _invoke_admitted(user_input, agent, profile_modes)
+    finally:
+        release(slot)
+
+
+async def _invoke_admitted(user_input: UserInput, agent: Pregel, profile_modes: frozenset[str]) -> ChatMessage:
+    kwargs, run_id, accounting, tracer = await _handle_input(user_input, agent)
+    try:
+        with accounting_scope(accounting), tracing_scope(tracer):
+            async with profile_run(str(run_id), profile_modes):
+                response_events: list[tuple[str, Any]] = await agent.ainvoke(**kwargs, stream_mode=["updates", "values"])  # type: ignore # fmt: skip
         response_type, response = response_events[-1]
         if response_type == "values":
             # Normal response, the agent completed successfully
@@ -211,120 +367,153 @@ async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMe
         else:
             raise ValueError(f"Unexpected response type: {response_type}")
 
+        await update_interrupt_flag(
+            agent,
+            kwargs["config"],
+            interrupted=response_type == "updates",
+            resumed=isinstance(kwargs["input"], Command),
+        )
         output.run_id = str(run_id)
+        await _attach_accounting(output, accounting)
+        if tracer is not None:
+            tracer.finish()
         return output
     except Exception as e:
         logger.error(f"An exception occurred: {e}")
+        if tracer is not None:
+            tracer.finish(error=e)
         raise HTTPException(status_code=500, detail="Unexpected error")
 
 
 async def message_generator(
-    user_input: StreamInput, agent_id: str = DEFAULT_AGENT
-) -> AsyncGenerator[str, None]:
+    user_input: StreamInput, agent_id: str = DEFAULT_AGENT, profile_modes: frozenset[str] = frozenset()
+) -> AsyncGenerator[str | SSEToken, None]:
     """
     Generate a stream of messages from the agent.
 
-    This is the workhorse method for the /stream endpoint.
+    This is the workhorse method for the /stream endpoint. It yields SSE frames, and LLM
+    tokens as SSEToken for `sse_frames` to frame (and possibly coalesce).
     """
     agent: Pregel = await get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
+    kwargs, run_id, accounting, tracer = await _handle_input(user_input, agent)
+    ACTIVE_STREAMS.inc()
+    interrupted = False
 
     try:
-        # Process streamed events from the graph and yield messages over the SSE stream.
-        async for stream_event in agent.astream(
-            **kwargs, stream_mode=["updates", "messages", "custom"]
-        ):
-            if not isinstance(stream_event, tuple):
-                continue
-            stream_mode, event = stream_event
-            new_messages = []
-            if stream_mode == "updates":
-                for node, updates in event.items():
-                    # A simple approach to handle agent interrupts.
-                    # In a more sophisticated implementation, we could add
-                    # some structured ChatMessage type to return the interrupt value.
-                    if node == "__interrupt__":
-                        interrupt: Interrupt
-                        for interrupt in updates:
-                            new_messages.append(AIMessage(content=interrupt.value))
+        with accounting_scope(accounting), tracing_scope(tracer):
+            async with profile_run(str(run_id), profile_modes):
+                # Process streamed events from the graph and yield messages over the SSE stream.
+                async for stream_event in agent.astream(
+                    **kwargs, stream_mode=["updates", "messages", "custom"]
+                ):
+                    if not isinstance(stream_event, tuple):
                         continue
-                    updates = updates or {}
-                    update_messages = updates.get("messages", [])
-                    # special cases for using langgraph-supervisor library
-                    if node == "supervisor":
-                        # Get only the last AIMessage since supervisor includes all previous messages
-                        ai_messages = [msg for msg in update_messages if isinstance(msg, AIMessage)]
-                        if ai_messages:
-                            update_messages = [ai_messages[-1]]
-                    if node in ("research_expert", "math_expert"):
-                        # By default the sub-agent output is returned as an AIMessage.
-                        # Convert it to a ToolMessage so it displays in the UI as a tool response.
-                        msg = ToolMessage(
-                            content=update_messages[0].content,
-                            name=node,
-                            tool_call_id="",
-                        )
-                        update_messages = [msg]
-                    new_messages.extend(update_messages)
-
-            if stream_mode == "custom":
-                new_messages = [event]
-
-            # LangGraph streaming may emit tuples: (field_name, field_value)
-            # e.g. ('content', <str>), ('tool_calls', [ToolCall,...]), ('additional_kwargs', {...}), etc.
-            # We accumulate only supported fields into `parts` and skip unsupported metadata.
-            # More info at: https://langchain-ai.github.io/langgraph/cloud/how-tos/stream_messages/
-            processed_messages = []
-            current_message: dict[str, Any] = {}
-            for message in new_messages:
-                if isinstance(message, tuple):
-                    key, value = message
-                    # Store parts in temporary dict
-                    current_message[key] = value
-                else:
-                    # Add complete message if we have one in progress
+                    stream_mode, event = stream_event
+                    new_messages = []
+                    final_messages: list[Any] = []
+                    if stream_mode == "updates":
+                        for node, updates in event.items():
+                            # A simple approach to handle agent interrupts.
+                            # In a more sophisticated implementation, we could add
+                            # some structured ChatMessage type to return the interrupt value.
+                            if node == "__interrupt__":
+                                interrupted = True
+                                interrupt: Interrupt
+                                for interrupt in updates:
+                                    new_messages.append(AIMessage(content=interrupt.value))
+                                continue
+                            updates = updates or {}
+                            update_messages = updates.get("messages", [])
+                            # special cases for using langgraph-supervisor library
+                            if node == "supervisor":
+                                # Get only the last AIMessage since supervisor includes all previous messages
+                                ai_messages = [msg for msg in update_messages if isinstance(msg, AIMessage)]
+                                if ai_messages:
+                                    update_messages = [ai_messages[-1]]
+                            if node in ("research_expert", "math_expert"):
+                                # By default the sub-agent output is returned as an AIMessage.
+                                # Convert it to a ToolMessage so it displays in the UI as a tool response.
+                                msg = ToolMessage(
+                                    content=update_messages[0].content,
+                                    name=node,
+                                    tool_call_id="",
+                                )
+                                update_messages = [msg]
+                            new_messages.extend(update_messages)
+                            if node in FINAL_ANSWER_NODES:
+                                final_messages.extend(msg for msg in update_messages if isinstance(msg, AIMessage))
+
+                    if stream_mode == "custom":
+                        new_messages = [event]
+
+                    # LangGraph streaming may emit tuples: (field_name, field_value)
+                    # e.g. ('content', <str>), ('tool_calls', [ToolCall,...]), ('additional_kwargs', {...}), etc.
+                    # We accumulate only supported fields into `parts` and skip unsupported metadata.
+                    # More info at: https://langchain-ai.github.io/langgraph/cloud/how-tos/stream_messages/
+                    processed_messages = []
+                    current_message: dict[str, Any] = {}
+                    for message in new_messages:
+                        if isinstance(message, tuple):
+                            key, value = message
+                            # Store parts in temporary dict
+                            current_message[key] = value
+                        else:
+                            # Add complete message if we have one in progress
+                            if current_message:
+                                processed_messages.append(_create_ai_message(current_message))
+                                current_message = {}
+                            processed_messages.append(message)
+
+                    # Add any remaining message parts
                     if current_message:
                         processed_messages.append(_create_ai_message(current_message))
-                        current_message = {}
-                    processed_messages.append(message)
-
-            # Add any remaining message parts
-            if current_message:
-                processed_messages.append(_create_ai_message(current_message))
-
-            for message in processed_messages:
-                try:
-                    chat_message = langchain_to_chat_message(message)
-                    chat_message.run_id = str(run_id)
-                except Exception as e:
-                    logger.error(f"Error parsing message: {e}")
-                    yield f"data: {json.dumps({'type': 'error', 'content': 'Unexpected error'})}\n\n"
-                    continue
-                # LangGraph re-sends the input message, which feels weird, so drop it
-                if chat_message.type == "human" and chat_message.content == user_input.message:
-                    continue
-                yield f"data: {json.dumps({'type': 'message', 'content': chat_message.model_dump()})}\n\n"
 
-            if stream_mode == "messages":
-                if not user_input.stream_tokens:
-                    continue
-                msg, metadata = event
-                if "skip_stream" in metadata.get("tags", []):
-                    continue
-                # For some reason, astream("messages") causes non-LLM nodes to send extra messages.
-                # Drop them.
-                if not isinstance(msg, AIMessageChunk):
-                    continue
-                content = remove_tool_calls(msg.content)
-                if content:
-                    # Empty content in the context of OpenAI usually means
-                    # that the model is asking for a tool to be invoked.
-                    # So we only print non-empty content.
-                    yield f"data: {json.dumps({'type': 'token', 'content': convert_message_content_to_string(content)})}\n\n"
+                    for message in processed_messages:
+                        try:
+                            chat_message = langchain_to_chat_message(message)
+                            chat_message.run_id = str(run_id)
+                            if any(message is final for final in final_messages):
+                                await _attach_accounting(chat_message, accounting)
+                        except Exception as e:
+                            logger.error(f"Error parsing message: {e}")
+                            yield f"data: {json.dumps({'type': 'error', 'content': 'Unexpected error'})}\n\n"
+                            continue
+                        # LangGraph re-sends the input message, which feels weird, so drop it
+                        if chat_message.type == "human" and chat_message.content == user_input.message:
+                            continue
+                        yield f"data: {json.dumps({'type': 'message', 'content': chat_message.model_dump()})}\n\n"
+
+                    if stream_mode == "messages":
+                        if not user_input.stream_tokens:
+                            continue
+                        msg, metadata = event
+                        if "skip_stream" in metadata.get("tags", []):
+                            continue
+                        # For some reason, astream("messages") causes non-LLM nodes to send extra messages.
+                        # Drop them.
+                        if not isinstance(msg, AIMessageChunk):
+                            continue
+                        content = remove_tool_calls(msg.content)
+                        if content:
+                            # Empty content in the context of OpenAI usually means
+                            # that the model is asking for a tool to be invoked.
+                            # So we only print non-empty content.
+                            yield SSEToken(convert_message_content_to_string(content))
+                await update_interrupt_flag(
+                    agent, kwargs["config"], interrupted=interrupted, resumed=isinstance(kwargs["input"], Command)
+                )
     except Exception as e:
         logger.error(f"Error in message generator: {e}")
+        if tracer is not None:
+            tracer.finish(error=e)
         yield f"data: {json.dumps({'type': 'error', 'content': 'Internal server error'})}\n\n"
     finally:
+        ACTIVE_STREAMS.dec()
+        if tracer is not None:
+            tracer.finish()
+        if accounting is not None:
+            # Aggregated even when the run failed or the client went away before the answer
+            await finish_accounting(accounting)
         yield "data: [DONE]\n\n"
 
 
@@ -355,7 +544,12 @@ def _sse_response_example() -> dict[int | str, Any]:
     responses=_sse_response_example(),
 )
 @router.post("/stream", response_class=StreamingResponse, responses=_sse_response_example())
-async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> StreamingResponse:
+async def stream(
+    user_input: StreamInput,
+    agent_id: str = DEFAULT_AGENT,
+    x_profile: Annotated[str | None, Header()] = None,
+    x_priority: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
     """
     Stream an agent's response to a user input, including intermediate messages and tokens.
 
@@ -365,13 +559,120 @@ async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> Stre
     Use user_id to persist and continue a conversation across multiple threads.
 
     Set `stream_tokens=false` to return intermediate messages but not token-by-token.
+    Send `X-Profile: cpu,memory` (or agent_config `{"profile": true}`) to profile the run
+    (with PROFILING_ENABLED and AUTH_SECRET set); the profile is then available from
+    /profiles/{run_id}.
+    Send `X-Priority: batch` for bulk work; see /invoke for admission control.
     """
+    profile_modes = requested_profile_modes(x_profile, user_input.agent_config)
+    # Admitted before the response starts, so a rejection is a plain 429 rather than an
+    # error inside the event stream. The slot is held until the stream ends; the background
+    # task releases it if the client disconnects before the stream was started.
+    slot = await admit(user_input.user_id, request_priority(x_priority, user_input.agent_config))
     return StreamingResponse(
-        message_generator(user_input, agent_id),
+        release_when_done(sse_frames(message_generator(user_input, agent_id, profile_modes)), slot),
         media_type="text/event-stream",
+        background=BackgroundTask(release, slot),
     )
 
 
+async def _execute_job(job: Job, report: ReportProgress) -> ChatMessage:
+    """Run a background job's agent run, reporting every graph node that finishes as progress."""
+    agent: Pregel = await get_agent(job.agent_id)
+    kwargs, run_id, accounting, tracer = await _handle_input(UserInput.model_validate(job.input), agent)
+    if job.attempts > 1 and not isinstance(kwargs["input"], Command):
+        # An earlier attempt stopped part-way: continue from the thread's last checkpoint.
+        # If it stopped before the first checkpoint (or after the last), ask again.
+        state = await agent.aget_state(kwargs["config"])
+        if state.next:
+            kwargs["input"] = None
+    interrupts: list[Interrupt] = []
+    values: dict[str, Any] = {}
+    try:
+        with accounting_scope(accounting), tracing_scope(tracer):
+            async for namespace, mode, event in agent.astream(
+                **kwargs, stream_mode=["updates", "values"], subgraphs=True
+            ):
+                if mode == "values":
+                    if not namespace:
+                        values = event
+                    continue
+                for node, update in event.items():
+                    if node == "__interrupt__":
+                        interrupts.extend(update)
+                        continue
+                    await report(_node_task(namespace, node, update))
+
+        await update_interrupt_flag(
+            agent, kwargs["config"], interrupted=bool(interrupts), resumed=isinstance(kwargs["input"], Command)
+        )
+        if interrupts:
+            output = langchain_to_chat_message(AIMessage(content=interrupts[0].value))
+        else:
+            output = langchain_to_chat_message(values["messages"][-1])
+        output.run_id = str(run_id)
+        await _attach_accounting(output, accounting)
+        if tracer is not None:
+            tracer.finish()
+        return output
+    except Exception as e:
+        if tracer is not None:
+            tracer.finish(error=e)
+        raise
+
+
+def _node_task(namespace: tuple[str, ...], node: str, update: Any) -> TaskData:
+    # Nested graphs (the swarm and its agents) are named by the last namespace entry, "<name>:<task id>"
+    graph = namespace[-1].split(":")[0] if namespace else None
+    messages = update.get("messages") if isinstance(update, dict) else None
+    tools = [m.name for m in messages if isinstance(m, ToolMessage)] if isinstance(messages, list) else []
+    data: dict[str, Any] = {"node": node}
+    if graph:
+        data["graph"] = graph
+    if tools:
+        data["tools"] = tools
+    return TaskData(
+        name=f"{graph}/{node}" if graph else node, run_id=str(uuid4()), state="complete", result="success", data=data
+    )
+
+
+@router.post("/{agent_id}/jobs", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> JobStatus:
+    """
+    Run an agent in the background, for questions that take minutes (season- or league-wide
+    analyses). Returns at once with the job_id; poll /jobs/{job_id} or follow
+    /jobs/{job_id}/stream for progress and the result. The job runs in its own thread
+    (`thread_id`, or a new one), so its messages are also in /history afterwards.
+    """
+    job = await job_pool.submit(agent_id, user_input)
+    return job.status_model()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, since: int = 0) -> JobStatus:
+    """
+    State of a background job, its progress events (from index `since`, to poll incrementally
+    with the previous `events_total`) and, once complete, its result.
+    """
+    job = await job_pool.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.status_model(since)
+
+
+@router.get("/jobs/{job_id}/stream", response_class=StreamingResponse, responses=_sse_response_example())
+async def stream_job(job_id: str, since: int = 0) -> StreamingResponse:
+    """
+    Follow a background job as server-sent events in the /stream format: progress events as
+    custom messages with TaskData, then the result message. Closing the stream does not stop
+    the job; reconnect with `since` to continue where it left off.
+    """
+    if await job_pool.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(job_pool.frames(job_id, since), media_type="text/event-stream")
+
+
 @router.post("/feedback")
 async def feedback(feedback: Feedback) -> FeedbackResponse:
     """
@@ -396,25 +697,109 @@ async def feedback(feedback: Feedback) -> FeedbackResponse:
 async def history(input: ChatHistoryInput) -> ChatHistory:
     """
     Get chat history.
+
+    Without cursors the whole history is returned (or its newest `limit` messages). `before`
+    pages back through older messages, `since` returns only the messages after a known one.
+    Message IDs come from the `id` of earlier ChatMessages.
     """
     # TODO: Hard-coding DEFAULT_AGENT here is wonky
     agent: Pregel = await get_agent(DEFAULT_AGENT)
     try:
-        state_snapshot = agent.get_state(
+        state_snapshot = await agent.aget_state(
             config=RunnableConfig(configurable={"thread_id": input.thread_id})
         )
-        messages: list[AnyMessage] = state_snapshot.values["messages"]
-        chat_messages: list[ChatMessage] = [langchain_to_chat_message(m) for m in messages]
-        return ChatHistory(messages=chat_messages)
+        messages: list[AnyMessage] = state_snapshot.values.get("messages", [])
     except Exception as e:
         logger.error(f"An exception occurred: {e}")
         raise HTTPException(status_code=500, detail="Unexpected error")
+    # System prompts kept in the state (e.g. by the wyscout agent) are not part of the conversation
+    messages = [m for m in messages if not isinstance(m, SystemMessage)]
+
+    cursor = input.since or input.before
+    index = len(messages)
+    if cursor is not None:
+        index = next((i for i, m in enumerate(messages) if m.id == cursor), -1)
+        if index < 0:
+            raise HTTPException(status_code=404, detail=f"Message {cursor} not in thread history")
+
+    if input.since is not None:
+        start = index + 1
+        end = len(messages) if input.limit is None else min(len(messages), start + input.limit)
+        while end < len(messages) and isinstance(messages[end], ToolMessage):
+            end += 1
+        has_more = end < len(messages)
+    else:
+        end = index
+        start = 0 if input.limit is None else max(0, end - input.limit)
+        # Never split a tool call from its results: start the page at the AI message making it.
+        # (With `since`, the page is extended forward to the results instead.)
+        while start > 0 and isinstance(messages[start], ToolMessage):
+            start -= 1
+        has_more = start > 0
+
+    try:
+        chat_messages: list[ChatMessage] = [cached_chat_message(m) for m in messages[start:end]]
+    except Exception as e:
+        logger.error(f"An exception occurred: {e}")
+        raise HTTPException(status_code=500, detail="Unexpected error")
+    return ChatHistory(messages=chat_messages, has_more=has_more)
+
+
+@router.get("/accounting/threads/{thread_id}")
+async def thread_accounting(thread_id: str) -> dict[str, Any]:
+    """Work and cost totals over the runs of a thread (on this host with a shared cache backend)."""
+    totals = await get_thread_accounting(thread_id)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="No runs accounted for this thread")
+    return totals
+
+
+@router.get("/accounting/users/{user_id}")
+async def user_accounting(user_id: str) -> dict[str, Any]:
+    """Work and cost totals over the runs of a user (on this host with a shared cache backend)."""
+    totals = await get_user_accounting(user_id)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="No runs accounted for this user")
+    return totals
+
+
+@router.get("/workers")
+async def workers() -> dict[str, Any]:
+    """
+    State of the worker serving this request, and the latest reports of the other workers on
+    the host (only with SHARED_CACHE_BACKEND=sqlite).
+    """
+    return {"worker": await worker_state(), "workers": await list_workers()}
+
+
+@router.get("/profiles/{run_id}")
+async def get_profile(run_id: UUID, format: str = "json") -> Any:
+    """
+    Profile recorded for a run started with X-Profile. `format=collapsed` returns the CPU
+    samples as folded stacks for flamegraph tools.
+    """
+    profile = load_profile(str(run_id))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this run")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(profile))
+    return profile
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Prometheus metrics of this worker process."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "ok"}
+async def health_check(response: Response):
+    """Readiness check: 503 until startup warmup has finished (and again while shutting down)."""
+    if not warmup_status.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return warmup_status.report()
 
 
 app.include_router(router)
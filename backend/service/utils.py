@@ -1,3 +1,5 @@
+import hashlib
+
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
@@ -8,8 +10,15 @@ from langchain_core.messages import (
     ChatMessage as LangchainChatMessage,
 )
 
+from backend.core.cache import TTLCache, create_cache
 from backend.schema.schema import ChatMessage
 
+# Converted history messages by message id and content hash; see cached_chat_message. Kept per
+# worker: converting again is cheaper than a shared-cache round trip.
+_chat_message_cache: TTLCache[str, ChatMessage] = create_cache(
+    "chat_messages", maxsize=50_000, ttl=3600, shared=False
+)
+
 
 def convert_message_content_to_string(content: str | list[str | dict]) -> str:
     if isinstance(content, str):
@@ -31,12 +40,14 @@ def langchain_to_chat_message(message: BaseMessage) -> ChatMessage:
             human_message = ChatMessage(
                 type="human",
                 content=convert_message_content_to_string(message.content),
+                id=message.id,
             )
             return human_message
         case AIMessage():
             ai_message = ChatMessage(
                 type="ai",
                 content=convert_message_content_to_string(message.content),
+                id=message.id,
             )
             if message.tool_calls:
                 ai_message.tool_calls = message.tool_calls
@@ -48,6 +59,7 @@ def langchain_to_chat_message(message: BaseMessage) -> ChatMessage:
                 type="tool",
                 content=convert_message_content_to_string(message.content),
                 tool_call_id=message.tool_call_id,
+                id=message.id,
             )
             return tool_message
         case LangchainChatMessage():
@@ -56,6 +68,7 @@ def langchain_to_chat_message(message: BaseMessage) -> ChatMessage:
                     type="custom",
                     content="",
                     custom_data=message.content[0],
+                    id=message.id,
                 )
                 return custom_message
             else:
@@ -64,6 +77,23 @@ def langchain_to_chat_message(message: BaseMessage) -> ChatMessage:
             raise ValueError(f"Unsupported message type: {message.__class__.__name__}")
 
 
+def cached_chat_message(message: BaseMessage) -> ChatMessage:
+    """
+    langchain_to_chat_message for history messages, cached by message id. Checkpointed messages
+    keep their id, so each one is converted once however often its thread is read; the key
+    also holds a hash of the content, so a message replaced under the same id is converted again.
+    """
+    if not message.id:
+        return langchain_to_chat_message(message)
+    content_hash = hashlib.blake2b(repr(message.content).encode(), digest_size=16).hexdigest()
+    key = f"{message.id}:{content_hash}"
+    chat_message = _chat_message_cache.get(key)
+    if chat_message is None:
+        chat_message = langchain_to_chat_message(message)
+        _chat_message_cache.set(key, chat_message)
+    return chat_message
+
+
 def remove_tool_calls(content: str | list[str | dict]) -> str | list[str | dict]:
     """Remove tool calls from content."""
     if isinstance(content, str):
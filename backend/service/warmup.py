@@ -0,0 +1,64 @@
+"""Startup warmup and readiness reporting for the service."""
+
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupStatus:
+    ready: bool = False
+    started_at: float | None = None
+    duration_seconds: float | None = None
+    steps: dict[str, float] = field(default_factory=dict)  # step name -> seconds taken
+    errors: dict[str, str] = field(default_factory=dict)  # step name -> error message
+
+    def report(self) -> dict:
+        return {
+            "status": ("ok" if not self.errors else "degraded") if self.ready else "warming",
+            "warmup_seconds": self.duration_seconds,
+            "warmup_steps": self.steps,
+            "warmup_errors": self.errors,
+        }
+
+
+warmup_status = WarmupStatus()
+
+
+async def run_warmup_step(name: str, step: Callable[[], Awaitable[None]], required: bool = True) -> None:
+    """
+    Run one warmup step and record its duration. Failures of required steps propagate and abort
+    startup; failures of optional steps are logged and reported by /health.
+    """
+    start = time.perf_counter()
+    try:
+        await step()
+    except Exception as e:
+        warmup_status.errors[name] = str(e)
+        if required:
+            raise
+        logger.warning(f"Warmup step '{name}' failed: {e}")
+    finally:
+        warmup_status.steps[name] = round(time.perf_counter() - start, 3)
+        logger.info(f"Warmup step '{name}' finished in {warmup_status.steps[name]:.2f}s")
+
+
+def mark_warmup_started() -> None:
+    warmup_status.ready = False
+    warmup_status.started_at = time.perf_counter()
+    warmup_status.steps.clear()
+    warmup_status.errors.clear()
+
+
+def mark_ready() -> None:
+    if warmup_status.started_at is not None:
+        warmup_status.duration_seconds = round(time.perf_counter() - warmup_status.started_at, 3)
+    warmup_status.ready = True
+    logger.info(f"Service warm and ready after {warmup_status.duration_seconds}s")
+
+
+def mark_not_ready() -> None:
+    warmup_status.ready = False
@@ -0,0 +1,75 @@
+"""State reports of the service's worker processes.
+
+With several workers per host (see docker/gunicorn.conf.py) each request reaches one of them,
+so every worker describes itself in `worker_state` and publishes that report every
+WORKER_HEARTBEAT_SECONDS to the "service_workers" cache. With SHARED_CACHE_BACKEND=sqlite
+that cache is shared, and /workers lists every live worker on the host; reports of workers
+that stopped publishing expire after three heartbeats.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Any
+
+from backend.core.cache import SHARED_CACHE_BACKEND, cache_sizes, create_cache
+from backend.core.metrics import ACTIVE_STREAMS
+from backend.service.admission import admission_controller
+from backend.service.warmup import warmup_status
+
+logger = logging.getLogger(__name__)
+
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "15"))
+
+_worker_reports = create_cache("service_workers", maxsize=1024, ttl=3 * WORKER_HEARTBEAT_SECONDS)
+_started_at: dict[int, float] = {}
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def mark_worker_started() -> None:
+    # Keyed by pid: a preloaded app is imported once in the parent, before the fork
+    _started_at[os.getpid()] = time.time()
+
+
+async def worker_state() -> dict[str, Any]:
+    """What this worker is doing: readiness, load and the size of its caches."""
+    started_at = _started_at.get(os.getpid())
+    # Counting the entries of a shared cache queries its database
+    cache_entries = await asyncio.to_thread(cache_sizes)
+    return {
+        "worker_id": worker_id(),
+        "pid": os.getpid(),
+        "started_at": started_at,
+        "uptime_seconds": round(time.time() - started_at, 1) if started_at else None,
+        "reported_at": time.time(),
+        "health": warmup_status.report(),
+        "active_streams": ACTIVE_STREAMS.values().get((), 0),
+        "admission": admission_controller.snapshot(),
+        "cache_backend": SHARED_CACHE_BACKEND,
+        "cache_entries": cache_entries,
+    }
+
+
+async def list_workers() -> list[dict[str, Any]]:
+    """The latest report of every worker publishing to the shared cache, this one included."""
+    reports = dict(await _worker_reports.aitems())
+    reports[worker_id()] = await worker_state()
+    return sorted(reports.values(), key=lambda report: report["worker_id"])
+
+
+async def publish_worker_state() -> None:
+    """Publish this worker's report until cancelled, then withdraw it."""
+    try:
+        while True:
+            try:
+                await _worker_reports.aset(worker_id(), await worker_state())
+            except Exception as e:
+                logger.warning(f"Could not publish the state of worker {worker_id()}: {e}")
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+    finally:
+        await _worker_reports.apop(worker_id())
@@ -26,6 +26,8 @@ from backend.schema.task_data import TaskData, TaskDataStatus
 APP_TITLE = "Agent Service Toolkit"
 APP_ICON = "🧰"
 USER_ID_COOKIE = "user_id"
+# Messages loaded per history page when reopening a thread
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))
 
 
 def get_or_create_user_id() -> str:
@@ -97,16 +99,20 @@ async def main() -> None:
 
     if "thread_id" not in st.session_state:
         thread_id = st.query_params.get("thread_id")
+        history_has_more = False
         if not thread_id:
             thread_id = str(uuid.uuid4())
             messages = []
         else:
             try:
-                messages: ChatHistory = agent_client.get_history(thread_id=thread_id).messages
+                history: ChatHistory = agent_client.get_history(thread_id=thread_id, limit=HISTORY_PAGE_SIZE)
+                messages = history.messages
+                history_has_more = history.has_more
             except AgentClientError:
                 st.error("No message history found for this Thread ID.")
                 messages = []
         st.session_state.messages = messages
+        st.session_state.history_has_more = history_has_more
         st.session_state.thread_id = thread_id
 
     # Config options
@@ -119,6 +125,7 @@ async def main() -> None:
 
         if st.button(":material/chat: New Chat", use_container_width=True):
             st.session_state.messages = []
+            st.session_state.history_has_more = False
             st.session_state.thread_id = str(uuid.uuid4())
             st.rerun()
 
@@ -182,6 +189,18 @@ async def main() -> None:
     # Draw existing messages
     messages: list[ChatMessage] = st.session_state.messages
 
+    if st.session_state.get("history_has_more") and messages and messages[0].id:
+        if st.button("Load earlier messages"):
+            try:
+                earlier = agent_client.get_history(
+                    thread_id=st.session_state.thread_id, before=messages[0].id, limit=HISTORY_PAGE_SIZE
+                )
+                st.session_state.messages = earlier.messages + messages
+                st.session_state.history_has_more = earlier.has_more
+            except AgentClientError as e:
+                st.error(f"Error loading earlier messages: {e}")
+            st.rerun()
+
     if len(messages) == 0:
         match agent_client.agent:
             case "chatbot":
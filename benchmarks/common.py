@@ -0,0 +1,30 @@
+"""Helpers shared by the benchmark scripts."""
+
+import json
+import statistics
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentiles(values: Iterable[float]) -> dict[str, float | None]:
+    """p50/p95/p99 and mean of `values` (nearest-rank), rounded to milliseconds."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99), "mean": round(statistics.fmean(ordered), 3)}
+
+
+def write_results(name: str, report: dict[str, Any]) -> Path:
+    """Write `report` to benchmarks/results/<name>-<timestamp>.json and return the path."""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output_path = RESULTS_DIR / f"{name}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.write_text(json.dumps(report, indent=2, default=str))
+    return output_path
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end latency benchmark
+
+Runs the refined workflow, the /invoke endpoint and the /stream endpoint against scripted fake
+LLMs (benchmarks.fake_llm) and a local mock Wyscout server (benchmarks.mock_wyscout), so no
+Azure, Wyscout or Postgres access is needed. For each mode and each number of concurrent users
+it reports:
+
+- request latency p50/p95/p99 and throughput (requests/second)
+- per-node timing (workflow mode) or time to first token, streamed characters and token frames
+  (stream mode)
+- error counts and the LLM gateway's limiter and per-node statistics
+
+Every simulated user has its own thread and sends its requests one after another, so later
+requests also exercise history management. Answer and tool-result caching are off unless
+--with-caches is given, so repeated questions measure the full path.
+
+Usage:
+    python -m benchmarks.e2e [--mode all] [--users 1 4 16] [--requests 5] [--llm-latency 0.3]
+                             [--baseline benchmarks/results/e2e-<timestamp>.json]
+
+With --baseline the script exits with status 1 when any p95 latency is more than
+--max-regression (default 20%) above the baseline's.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.common import percentiles, write_results
+from benchmarks.mock_wyscout import MockWyscoutConfig, start_mock_wyscout
+
+QUESTIONS = [
+    "What are the current standings and top scorers in the Premier League this season?",
+    "Give me advanced stats for Mohamed Salah in the Premier League.",
+    "Which countries and regions does Wyscout cover?",
+    "Compare Arsenal's attacking output with last season.",
+    "Who has the most assists in the league right now?",
+]
+
+MODES = ("workflow", "invoke", "stream")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args: argparse.Namespace, wyscout_port: int) -> None:
+    """
+    Point the backend at the local fakes. Must run before anything from `backend` is imported,
+    because the tools and agent read their configuration at import time.
+    """
+    os.environ["WYSCOUT_API_BASE_URL"] = f"http://127.0.0.1:{wyscout_port}/v2"
+    os.environ["DEFAULT_AUTH_TOKEN"] = "Basic benchmark"
+    os.environ["AGENT_CHECKPOINTER"] = "memory"
+    os.environ["USE_FAKE_MODEL"] = "true"
+    os.environ["DATABASE_TYPE"] = "sqlite"
+    os.environ["SQLITE_DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="wyscout-bench-")) / "checkpoints.db")
+    os.environ["WARMUP_LLM_PING"] = "false"
+    os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+    caches = "true" if args.with_caches else "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = caches
+    os.environ["TOOL_RESULT_STORE_ENABLED"] = caches
+
+
+def install_fake_llms(args: argparse.Namespace) -> None:
+    """Replace both Telogical LLMs with scripted fakes (the secondary one is twice as fast)."""
+    from backend.core.llm import override_telogical_llms
+    from benchmarks.fake_llm import ScriptedChatModel
+
+    override_telogical_llms(
+        ScriptedChatModel(model_name="scripted-primary", first_token_latency=args.llm_latency, tokens_per_second=args.tps),
+        ScriptedChatModel(model_name="scripted-secondary", first_token_latency=args.llm_latency / 2, tokens_per_second=args.tps * 2),
+    )
+
+
+def mock_wyscout_config(args: argparse.Namespace) -> MockWyscoutConfig:
+    return MockWyscoutConfig(latency=args.wyscout_latency, error_rate_5xx=args.wyscout_error_rate, seed=0)
+
+
+def add_fake_arguments(parser: argparse.ArgumentParser) -> None:
+    """CLI options for the fake LLMs, the mock Wyscout server and caching, shared by the benchmarks."""
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake primary LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=150.0, help="Fake primary LLM output tokens per second")
+    parser.add_argument("--wyscout-latency", type=float, default=0.15, help="Mock Wyscout response latency (s)")
+    parser.add_argument("--wyscout-error-rate", type=float, default=0.0, help="Share of mock Wyscout calls answered with a 5xx")
+    parser.add_argument("--with-caches", action="store_true", help="Keep answer and tool-result caching on")
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects wall time per LangGraph node (including the swarm's subgraph nodes)."""
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, metadata: dict[str, Any] | None = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            self.timings[node].append(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def report(self) -> dict[str, Any]:
+        return {node: {"calls": len(values), **percentiles(values)} for node, values in sorted(self.timings.items())}
+
+
+async def _run_users(
+    users: int, requests_per_user: int, send: Callable[[str, str, int], Awaitable[dict[str, Any]]]
+) -> dict[str, Any]:
+    """Run `users` concurrent users, each sending `requests_per_user` requests on its own thread."""
+    samples: list[dict[str, Any]] = []
+
+    async def user(index: int) -> None:
+        thread_id = str(uuid4())
+        for turn in range(requests_per_user):
+            question = QUESTIONS[(index + turn) % len(QUESTIONS)]
+            start = time.perf_counter()
+            try:
+                sample = await send(question, thread_id, turn)
+            except Exception as e:
+                sample = {"error": f"{type(e).__name__}: {e}"}
+            sample["latency"] = time.perf_counter() - start
+            samples.append(sample)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    wall = time.perf_counter() - wall_start
+
+    ok = [s for s in samples if not s.get("error")]
+    result: dict[str, Any] = {
+        "users": users,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else None,
+        "latency_seconds": percentiles(s["latency"] for s in ok),
+    }
+    if any("ttft" in s for s in ok):
+        result["ttft_seconds"] = percentiles(s["ttft"] for s in ok if s.get("ttft") is not None)
+        result["chars_per_request"] = percentiles(s.get("chars", 0) for s in ok)
+        result["frames_per_request"] = percentiles(s.get("frames", 0) for s in ok)
+    errors = sorted({s["error"] for s in samples if s.get("error")})
+    if errors:
+        result["error_samples"] = errors[:5]
+    return result
+
+
+async def _benchmark_workflow(users: int, requests_per_user: int) -> dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    from backend.agents.wyscout.agent import dynamic_swarm_refined
+
+    graph = await dynamic_swarm_refined()
+    timer = NodeTimer()
+
+    async def send(question: str, thread_id: str, turn: int) -> dict[str, Any]:
+        config = {
+            "configurable": {"thread_id": thread_id, "user_id": thread_id, "stream_refined_output": False},
+            "callbacks": [timer],
+        }
+        result = await graph.ainvoke({"messages": [HumanMessage(content=question)]}, config=config)
+        last = result["messages"][-1]
+        content = str(last.content)
+        return {"error": content[:200]} if content.startswith("Error:") else {}
+
+    result = await _run_users(users, requests_per_user, send)
+    result["nodes"] = timer.report()
+    return result
+
+
+async def _benchmark_endpoint(
+    mode: str, base_url: str, headers: dict[str, str], users: int, requests_per_user: int
+) -> dict[str, Any]:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=300) as client:
+
+        async def invoke(question: str, thread_id: str, turn: int) -> dict[str, Any]:
+            response = await client.post("/invoke", json={"message": question, "thread_id": thread_id})
+            if response.status_code != 200:
+                return {"error": f"HTTP {response.status_code}"}
+            return {}
+
+        async def stream(question: str, thread_id: str, turn: int) -> dict[str, Any]:
+            start = time.perf_counter()
+            sample: dict[str, Any] = {"ttft": None, "chars": 0, "frames": 0}
+            body = {"message": question, "thread_id": thread_id, "stream_tokens": True}
+            async with client.stream("POST", "/stream", json=body) as response:
+                if response.status_code != 200:
+                    return {"error": f"HTTP {response.status_code}"}
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event["type"] == "error":
+                        sample["error"] = event["content"]
+                    elif event["type"] == "token":
+                        if sample["ttft"] is None:
+                            sample["ttft"] = time.perf_counter() - start
+                        # With SSE_COALESCE_MS a frame holds several tokens; count the text
+                        sample["chars"] += len(event["content"])
+                        sample["frames"] += 1
+            return sample
+
+        return await _run_users(users, requests_per_user, invoke if mode == "invoke" else stream)
+
+
+async def serve(port: int, startup_timeout: float) -> tuple[Any, asyncio.Task]:
+    import uvicorn
+
+    from backend.service import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="on", log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    deadline = time.monotonic() + startup_timeout
+    while not server.started:
+        if task.done():
+            # uvicorn returns instead of raising when the lifespan startup or the bind fails
+            task.result()
+            raise RuntimeError(f"Service exited before it started on port {port}")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise RuntimeError(f"Service did not start on port {port} within {startup_timeout:g}s")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def benchmark(args: argparse.Namespace, wyscout_port: int) -> dict[str, Any]:
+    from backend.core import settings
+    from backend.core.llm_gateway import get_llm_gateway_stats
+
+    install_fake_llms(args)
+    mock_wyscout = await start_mock_wyscout(port=wyscout_port, config=mock_wyscout_config(args))
+
+    modes = MODES if args.mode == "all" else (args.mode,)
+    report: dict[str, Any] = {
+        "created_at": datetime.now().isoformat(),
+        "settings": {
+            key: getattr(args, key)
+            for key in ("users", "requests", "llm_latency", "tps", "wyscout_latency", "wyscout_error_rate", "with_caches")
+        },
+        "modes": {},
+    }
+    server = task = None
+    base_url = ""
+    try:
+        if any(mode != "workflow" for mode in modes):
+            port = free_port()
+            server, task = await serve(port, args.startup_timeout)
+            base_url = f"http://127.0.0.1:{port}"
+        headers = {}
+        if settings.AUTH_SECRET:
+            headers["Authorization"] = f"Bearer {settings.AUTH_SECRET.get_secret_value()}"
+
+        for mode in modes:
+            report["modes"][mode] = {}
+            for users in args.users:
+                if mode == "workflow":
+                    result = await _benchmark_workflow(users, args.requests)
+                else:
+                    result = await _benchmark_endpoint(mode, base_url, headers, users, args.requests)
+                report["modes"][mode][str(users)] = result
+                latency = result["latency_seconds"]
+                print(
+                    f"{mode:<9} users={users:<4} rps={result['throughput_rps']!s:<8} "
+                    f"p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s errors={result['errors']}"
+                )
+        report["llm_gateway"] = get_llm_gateway_stats()
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await task
+        await mock_wyscout.cleanup()
+    return report
+
+
+def compare_with_baseline(report: dict[str, Any], baseline: dict[str, Any], max_regression: float) -> list[str]:
+    """p95 latencies that regressed by more than `max_regression` (a fraction) against `baseline`."""
+    regressions = []
+    for mode, by_users in report["modes"].items():
+        for users, result in by_users.items():
+            before = baseline.get("modes", {}).get(mode, {}).get(users, {}).get("latency_seconds", {}).get("p95")
+            after = result["latency_seconds"]["p95"]
+            if before and after and after > before * (1 + max_regression):
+                regressions.append(f"{mode} users={users}: p95 {before}s -> {after}s (+{(after / before - 1):.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the refined workflow and API")
+    parser.add_argument("--mode", choices=[*MODES, "all"], default="all")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16], help="Concurrent user counts to run")
+    parser.add_argument("--requests", type=int, default=5, help="Sequential requests per user")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Seconds the service may take to start listening")
+    add_fake_arguments(parser)
+    parser.add_argument("--baseline", type=Path, help="Earlier e2e results file to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 increase over the baseline")
+    args = parser.parse_args()
+
+    wyscout_port = free_port()
+    configure_environment(args, wyscout_port)
+    report = asyncio.run(benchmark(args, wyscout_port))
+    print(f"\nResults written to {write_results('e2e', report)}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(report, json.loads(args.baseline.read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Scripted chat model standing in for the Telogical LLMs in offline benchmarks.
+
+The model answers the way the refined workflow expects without any network access:
+
+- structured-output calls (QueryContextAnalysis, RefinedOutput) get a tool call with valid args,
+- an agent with Wyscout tools bound first calls one of them, then answers once it sees the
+  tool result,
+- everything else gets a plain text answer.
+
+Latency is simulated as a time to first token plus a fixed generation rate, and usage metadata
+is reported so token accounting can be exercised too. Like a provider client, the model rejects
+call kwargs that would not be accepted by a chat completions request.
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+from uuid import uuid4
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+DEFAULT_ANSWER = (
+    "Based on the Wyscout data, here is the summary you asked for. The team has won 18 of its "
+    "30 league matches this season, scoring 61 goals and conceding 27. The leading scorer has 19 "
+    "goals and 6 assists, and the side averages 58% possession with 14.2 shots per match."
+)
+
+STRUCTURED_RESPONSES: dict[str, dict[str, Any]] = {
+    "QueryContextAnalysis": {
+        "contextual_insights": "* The user asks for current season statistics.\n* Wyscout data is required.",
+        "requires_database_access": True,
+    },
+    "RefinedOutput": {"refined_text": DEFAULT_ANSWER},
+}
+
+# Tool to call (with its arguments) when an agent has Wyscout tools bound, in order of preference
+DEFAULT_TOOL_SCRIPT: list[tuple[str, dict[str, Any]]] = [
+    ("wyscout_season_info", {"wyId": 188989, "get_standings": True, "get_scorers": True}),
+    ("wyscout_advanced_stats", {"player_context": {"player_id": 3322, "competition_id": 364}}),
+    ("wyscout_area_list", {}),
+]
+
+
+# Call kwargs a chat completions request accepts from `bind_tools`
+REQUEST_KWARGS = {"tools", "tool_choice", "parallel_tool_calls", "strict"}
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic, offline chat model with simulated latency (see module docstring)."""
+
+    model_name: str = "scripted-fake"
+    first_token_latency: float = 0.3
+    tokens_per_second: float = 150.0
+    answer: str = DEFAULT_ANSWER
+    tool_script: list[tuple[str, dict[str, Any]]] = DEFAULT_TOOL_SCRIPT
+    bound_tools: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:  # type: ignore[override]
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        names = [tool["function"]["name"] for tool in formatted]
+        return self.model_copy(update={"bound_tools": names}).bind(tools=formatted, **kwargs)
+
+    def _reply(self, messages: list[BaseMessage], kwargs: dict[str, Any]) -> AIMessage:
+        unexpected = sorted(set(kwargs) - REQUEST_KWARGS)
+        if unexpected:
+            raise TypeError(f"Chat completions request got unexpected keyword arguments: {unexpected}")
+        input_tokens = sum(_approx_tokens(str(message.content)) for message in messages)
+        structured = [name for name in self.bound_tools if name in STRUCTURED_RESPONSES]
+        if structured:
+            name = structured[0]
+            return self._tool_call_message(name, STRUCTURED_RESPONSES[name], input_tokens)
+
+        if self.bound_tools and not isinstance(messages[-1], ToolMessage):
+            for name, args in self.tool_script:
+                if name in self.bound_tools:
+                    return self._tool_call_message(name, args, input_tokens)
+
+        return AIMessage(
+            content=self.answer,
+            id=f"run-{uuid4()}",
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": _approx_tokens(self.answer),
+                "total_tokens": input_tokens + _approx_tokens(self.answer),
+            },
+        )
+
+    def _tool_call_message(self, name: str, args: dict[str, Any], input_tokens: int) -> AIMessage:
+        output_tokens = _approx_tokens(json.dumps(args))
+        return AIMessage(
+            content="",
+            id=f"run-{uuid4()}",
+            tool_calls=[{"name": name, "args": args, "id": f"call_{uuid4().hex[:24]}", "type": "tool_call"}],
+            response_metadata={"model_name": self.model_name, "finish_reason": "tool_calls"},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _generation_seconds(self, message: AIMessage) -> float:
+        output_tokens = (message.usage_metadata or {}).get("output_tokens", 0)
+        return self.first_token_latency + output_tokens / self.tokens_per_second
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._reply(messages, kwargs)
+        time.sleep(self._generation_seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._reply(messages, kwargs)
+        await asyncio.sleep(self._generation_seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            yield AIMessageChunk(
+                content="",
+                id=message.id,
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+                ],
+                response_metadata=message.response_metadata,
+                usage_metadata=message.usage_metadata,
+            )
+            return
+        words = str(message.content).split(" ")
+        for index, word in enumerate(words):
+            last = index == len(words) - 1
+            yield AIMessageChunk(
+                content=word if index == 0 else f" {word}",
+                id=message.id,
+                response_metadata=message.response_metadata if last else {},
+                usage_metadata=message.usage_metadata if last else None,
+            )
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._reply(messages, kwargs)
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(message):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(generation.text, chunk=generation)
+            yield generation
+            await asyncio.sleep(_approx_tokens(str(chunk.content)) / self.tokens_per_second)
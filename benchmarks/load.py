@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Load test for the FastAPI service under concurrent SSE streams
+
+Replays multi-turn conversations against /stream and /invoke of one in-process service worker,
+with the scripted fake LLMs and the mock Wyscout server (see benchmarks.e2e), through a ramp of
+concurrency stages. Per stage it reports:
+
+- requests, error rate and errors by kind (HTTP status, SSE error frame, exception, timeout)
+- request latency, time to first token, streamed characters/sec and token frames per stream
+  (p50/p95/p99); characters rather than frames, so runs with and without SSE_COALESCE_MS compare
+- event-loop lag of the service's loop (p50/p99/max), sampled every --lag-interval seconds
+- resident memory at the start and end of the stage, and its growth
+
+The service runs on the main thread's event loop, exactly as under uvicorn; the load
+generator and the mock Wyscout server run on a second thread with their own loop, so the lag
+measured is the service's own (plus some GIL contention from the generator).
+
+Usage:
+    python -m benchmarks.load [--stages 1:20 8:30 32:60 64:60] [--stream-ratio 0.8]
+                              [--think-time 1.0] [--llm-latency 0.3] [--tps 150]
+
+A stage "32:60" runs 32 concurrent users for 60 seconds. Each user plays conversations from
+CONVERSATIONS turn by turn on a fresh thread, pausing --think-time seconds (exponentially
+distributed) between turns.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import threading
+import time
+from datetime import datetime
+from typing import Any
+from uuid import uuid4
+
+from benchmarks.common import percentiles, write_results
+from benchmarks.e2e import (
+    add_fake_arguments,
+    configure_environment,
+    free_port,
+    install_fake_llms,
+    mock_wyscout_config,
+    serve,
+)
+from benchmarks.mock_wyscout import start_mock_wyscout
+
+CONVERSATIONS: list[list[str]] = [
+    [
+        "Who leads the Premier League this season?",
+        "And who are the top scorers?",
+        "How does that compare with last season?",
+    ],
+    [
+        "Give me advanced stats for Mohamed Salah in the Premier League.",
+        "What about his last five matches?",
+    ],
+    ["Which countries and regions does Wyscout cover?"],
+    [
+        "Show me the current La Liga standings.",
+        "Which team has the best defence?",
+        "List their next fixtures.",
+        "Who is their most used player?",
+    ],
+]
+
+
+def _rss_mib() -> float:
+    """Current resident set size (Linux), falling back to the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoopMonitor:
+    """Samples the lag of the event loop it runs on, and the process RSS, at a fixed interval."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: list[tuple[float, float, float]] = []  # (monotonic time, lag seconds, rss MiB)
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.samples.append((time.monotonic(), lag, _rss_mib()))
+
+    def window(self, start: float, end: float) -> dict[str, Any]:
+        samples = [s for s in self.samples if start <= s[0] <= end]
+        if not samples:
+            return {}
+        lags = [s[1] for s in samples]
+        lag = percentiles(lags)
+        return {
+            "loop_lag_seconds": {"p50": lag["p50"], "p99": lag["p99"], "max": round(max(lags), 3)},
+            "rss_mib": {
+                "start": round(samples[0][2], 1),
+                "end": round(samples[-1][2], 1),
+                "growth": round(samples[-1][2] - samples[0][2], 1),
+            },
+        }
+
+
+async def _stream(client: Any, body: dict[str, Any], sample: dict[str, Any]) -> None:
+    start = time.perf_counter()
+    first = last = None
+    frames = chars = first_chars = 0
+    async with client.stream("POST", "/stream", json={**body, "stream_tokens": True}) as response:
+        if response.status_code != 200:
+            sample["error"] = f"http_{response.status_code}"
+            return
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            if event["type"] == "error":
+                sample["error"] = "sse_error"
+            elif event["type"] == "token":
+                last = time.perf_counter()
+                if first is None:
+                    first = last
+                    first_chars = len(event["content"])
+                frames += 1
+                chars += len(event["content"])
+    sample["frames"] = frames
+    sample["chars"] = chars
+    if first is not None:
+        sample["ttft"] = first - start
+        if last is not None and last > first:
+            sample["chars_per_second"] = (chars - first_chars) / (last - first)
+
+
+async def _invoke(client: Any, body: dict[str, Any], sample: dict[str, Any]) -> None:
+    response = await client.post("/invoke", json=body)
+    if response.status_code != 200:
+        sample["error"] = f"http_{response.status_code}"
+
+
+async def _user(
+    index: int, client: Any, args: argparse.Namespace, deadline: float, samples: list[dict[str, Any]]
+) -> None:
+    rng = random.Random(index)
+    conversation_index = index
+    while time.monotonic() < deadline:
+        conversation = CONVERSATIONS[conversation_index % len(CONVERSATIONS)]
+        conversation_index += 1
+        thread_id = str(uuid4())
+        for question in conversation:
+            if time.monotonic() >= deadline:
+                return
+            mode = "stream" if rng.random() < args.stream_ratio else "invoke"
+            sample: dict[str, Any] = {"mode": mode}
+            body = {"message": question, "thread_id": thread_id, "user_id": f"load-user-{index}"}
+            start = time.perf_counter()
+            try:
+                if mode == "stream":
+                    await _stream(client, body, sample)
+                else:
+                    await _invoke(client, body, sample)
+            except Exception as e:
+                sample["error"] = "timeout" if "Timeout" in type(e).__name__ else f"exception_{type(e).__name__}"
+            sample["latency"] = time.perf_counter() - start
+            samples.append(sample)
+            if args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+def _summarize(users: int, seconds: float, samples: list[dict[str, Any]]) -> dict[str, Any]:
+    ok = [s for s in samples if not s.get("error")]
+    errors: dict[str, int] = {}
+    for s in samples:
+        if s.get("error"):
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    streams = [s for s in ok if s["mode"] == "stream"]
+    return {
+        "users": users,
+        "seconds": round(seconds, 1),
+        "requests": len(samples),
+        "throughput_rps": round(len(ok) / seconds, 3) if seconds else None,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else None,
+        "errors": errors,
+        "latency_seconds": {
+            "stream": percentiles(s["latency"] for s in streams),
+            "invoke": percentiles(s["latency"] for s in ok if s["mode"] == "invoke"),
+        },
+        "ttft_seconds": percentiles(s["ttft"] for s in streams if "ttft" in s),
+        "chars_per_second_per_stream": percentiles(s["chars_per_second"] for s in streams if "chars_per_second" in s),
+        "frames_per_stream": percentiles(s["frames"] for s in streams if "frames" in s),
+    }
+
+
+async def _generate_load(
+    args: argparse.Namespace, base_url: str, headers: dict[str, str], wyscout_port: int, monitor: LoopMonitor
+) -> list[dict[str, Any]]:
+    import httpx
+
+    mock_wyscout = await start_mock_wyscout(port=wyscout_port, config=mock_wyscout_config(args))
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    stages: list[dict[str, Any]] = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=args.timeout, limits=limits) as client:
+            for stage in args.stages:
+                users, seconds = (int(part) for part in stage.split(":"))
+                samples: list[dict[str, Any]] = []
+                start = time.monotonic()
+                await asyncio.gather(*(_user(i, client, args, start + seconds, samples) for i in range(users)))
+                end = time.monotonic()
+                result = _summarize(users, end - start, samples)
+                result.update(monitor.window(start, end))
+                stages.append(result)
+                lag = result.get("loop_lag_seconds", {})
+                print(
+                    f"users={users:<4} rps={result['throughput_rps']!s:<8} errors={result['error_rate']!s:<7} "
+                    f"ttft_p95={result['ttft_seconds']['p95']}s loop_lag_p99={lag.get('p99')}s "
+                    f"rss_growth={result.get('rss_mib', {}).get('growth')}MiB"
+                )
+    finally:
+        await mock_wyscout.cleanup()
+    return stages
+
+
+async def load_test(args: argparse.Namespace, wyscout_port: int) -> dict[str, Any]:
+    from backend.core import settings
+    from backend.core.llm_gateway import get_llm_gateway_stats
+
+    install_fake_llms(args)
+    port = free_port()
+    server, server_task = await serve(port)
+    monitor = LoopMonitor(args.lag_interval)
+    monitor_task = asyncio.create_task(monitor.run())
+
+    headers = {}
+    if settings.AUTH_SECRET:
+        headers["Authorization"] = f"Bearer {settings.AUTH_SECRET.get_secret_value()}"
+
+    result: dict[str, Any] = {}
+
+    def run_generator() -> None:
+        result["stages"] = asyncio.run(_generate_load(args, f"http://127.0.0.1:{port}", headers, wyscout_port, monitor))
+
+    try:
+        generator = threading.Thread(target=run_generator, name="load-generator")
+        generator.start()
+        while generator.is_alive():
+            await asyncio.sleep(0.2)
+        generator.join()
+    finally:
+        monitor_task.cancel()
+        server.should_exit = True
+        await server_task
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "settings": {
+            key: getattr(args, key)
+            for key in ("stages", "stream_ratio", "think_time", "llm_latency", "tps", "wyscout_latency", "wyscout_error_rate", "with_caches")
+        },
+        "stages": result.get("stages", []),
+        "llm_gateway": get_llm_gateway_stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent SSE load test of the service with fake LLM and mock Wyscout")
+    parser.add_argument("--stages", nargs="+", default=["1:20", "8:30", "32:60", "64:60"], help="users:seconds per stage")
+    parser.add_argument("--stream-ratio", type=float, default=0.8, help="Share of turns sent to /stream (the rest to /invoke)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between turns of a user (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (s)")
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="Event-loop lag sampling interval (s)")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    wyscout_port = free_port()
+    configure_environment(args, wyscout_port)
+    report = asyncio.run(load_test(args, wyscout_port))
+    print(f"\nResults written to {write_results('load', report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Per-tool micro-benchmarks
+
+Times the CPU-bound parts of the Wyscout tools and the service on synthetic payloads of
+production size, with no network access:
+
+- events_filter_*: WyscoutMatchEventsTool._filter_events on 3k and 5k event matches
+- search_parse_*: WyscoutIdSearch._parse_*_results on 500 search results per entity type
+- season_assembly: WyscoutSeasonTool._get_season_info_async with every get_* flag set, the
+  HTTP layer answered from memory (benchmarks.mock_wyscout payloads)
+- season_response_json: json.dumps of that assembled response, which is what ends up in the
+  ToolMessage content
+- chat_message_*: langchain_to_chat_message and ChatMessage.model_dump over a 200-message
+  history with tool calls and large tool outputs
+
+For each case it reports ops/sec, the median and best time per op, and the peak and retained
+memory allocated by one op (tracemalloc).
+
+Baselines are stored as JSON in benchmarks/baselines/micro.json (--save-baseline). When a
+baseline exists, every run is compared against it and the script exits with status 1 if a
+case lost more than --max-regression (default 20%) of its ops/sec.
+
+Usage:
+    python -m benchmarks.micro [--filter events] [--save-baseline] [--max-regression 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from benchmarks.common import write_results
+from benchmarks.mock_wyscout import (
+    ROUTES,
+    synthetic_competition,
+    synthetic_match_events,
+    synthetic_person,
+    synthetic_player,
+    synthetic_team,
+)
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+SEARCH_RESULTS = 500
+HISTORY_TURNS = 50  # 4 messages per turn
+
+
+def measure(op: Callable[[], Any], repeats: int = 5, min_batch_seconds: float = 0.1) -> dict[str, float]:
+    """Time `op` in batches of at least `min_batch_seconds`, then measure one op's allocations."""
+    op()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        if time.perf_counter() - start >= min_batch_seconds:
+            break
+        number *= 2
+
+    per_op: list[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        per_op.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = op()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(per_op)
+    return {
+        "ops_per_sec": round(1 / median, 2),
+        "median_us": round(median * 1e6, 1),
+        "best_us": round(min(per_op) * 1e6, 1),
+        "peak_alloc_kib": round((peak - before) / 1024, 1),
+        "retained_kib": round((current - before) / 1024, 1),
+    }
+
+
+def _event_cases() -> dict[str, Callable[[], Any]]:
+    from backend.agents.wyscout.tools.events import MatchEventsInput, WyscoutMatchEventsTool
+
+    tool = WyscoutMatchEventsTool()
+    cases: dict[str, Callable[[], Any]] = {}
+    for count in (3000, 5000):
+        events = synthetic_match_events(5_000_000 + count, count)
+        team_id = events[0]["team"]["id"]
+        player_id = events[0]["player"]["id"]
+        all_filters = MatchEventsInput(
+            match_id=1,
+            filter_by_period=["2H"],
+            filter_by_team_id=team_id,
+            filter_by_player_id=player_id,
+            filter_by_primary_types=["pass", "shot"],
+        )
+        types_only = MatchEventsInput(match_id=1, filter_by_primary_types=["shot", "duel", "interception"])
+        cases[f"events_filter_all_{count}"] = lambda e=events, i=all_filters: tool._filter_events(e, i)
+        cases[f"events_filter_types_{count}"] = lambda e=events, i=types_only: tool._filter_events(e, i)
+    return cases
+
+
+def _search_cases() -> dict[str, Callable[[], Any]]:
+    from backend.agents.wyscout.tools.search import WyscoutIdSearch
+
+    tool = WyscoutIdSearch()
+    results = {
+        "player": [synthetic_player(100000 + i) for i in range(SEARCH_RESULTS)],
+        "team": [synthetic_team(1000 + i) for i in range(SEARCH_RESULTS)],
+        "competition": [synthetic_competition(300 + i) for i in range(SEARCH_RESULTS)],
+        "referee": [synthetic_person("referee", 300000 + i) for i in range(SEARCH_RESULTS)],
+    }
+    parsers = {
+        "player": tool._parse_player_results,
+        "team": tool._parse_team_results,
+        "competition": tool._parse_competition_results,
+        "referee": tool._parse_referee_results,
+    }
+    return {f"search_parse_{kind}": (lambda p=parsers[kind], r=results[kind]: p(r)) for kind in parsers}
+
+
+def _season_cases() -> dict[str, Callable[[], Any]]:
+    from backend.agents.wyscout.tools.seasons import WyscoutSeasonTool
+
+    season_id = 188989
+    payloads = {
+        route.replace("{wyId}", str(season_id)): builder({"wyId": str(season_id)}, {})
+        for route, builder in ROUTES.items()
+        if route.startswith("/seasons/{wyId}")
+    }
+
+    tool = WyscoutSeasonTool()
+
+    async def from_memory(session: Any, endpoint: str, params: dict[str, Any] | None = None) -> Any:
+        return payloads[endpoint]
+
+    # Serve the HTTP layer from memory so only request fan-out and response assembly are timed
+    tool._make_request = from_memory  # type: ignore[method-assign]
+    flags = {
+        name: True
+        for name in (
+            "get_details", "get_assistmen", "get_career_stats", "get_fixtures", "get_matches",
+            "get_players", "get_scorers", "get_standings", "get_teams", "get_transfers",
+        )
+    }
+    loop = asyncio.new_event_loop()
+    assembled = loop.run_until_complete(tool._get_season_info_async(wyId=season_id, **flags))
+    return {
+        "season_assembly": lambda: loop.run_until_complete(tool._get_season_info_async(wyId=season_id, **flags)),
+        "season_response_json": lambda: json.dumps(assembled),
+    }
+
+
+def _history() -> list[Any]:
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    standings = json.dumps(ROUTES["/seasons/{wyId}/standings"]({"wyId": "188989"}, {}))
+    scorers = json.dumps(ROUTES["/seasons/{wyId}/scorers"]({"wyId": "188989"}, {}))
+    answer = "Here is the summary of the season so far. " * 40
+    history: list[Any] = []
+    for turn in range(HISTORY_TURNS):
+        call_id = f"call_{turn:04d}"
+        history.extend([
+            HumanMessage(content=f"Question {turn}: how are the top teams doing this season?"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "wyscout_season_info", "args": {"wyId": 188989, "get_standings": True, "get_scorers": True}, "id": call_id}],
+                response_metadata={"model_name": "gpt-4o", "finish_reason": "tool_calls", "token_usage": {"prompt_tokens": 5400, "completion_tokens": 40}},
+            ),
+            ToolMessage(content=f'{{"standings": {standings}, "scorers": {scorers}}}', tool_call_id=call_id, name="wyscout_season_info"),
+            AIMessage(content=answer, response_metadata={"model_name": "gpt-4o", "finish_reason": "stop"}),
+        ])
+    return history
+
+
+def _chat_message_cases() -> dict[str, Callable[[], Any]]:
+    from backend.service.utils import langchain_to_chat_message
+
+    history = _history()
+    converted = [langchain_to_chat_message(message) for message in history]
+    return {
+        "chat_message_convert_history": lambda: [langchain_to_chat_message(message) for message in history],
+        "chat_message_model_dump_history": lambda: [message.model_dump() for message in converted],
+        "chat_message_convert_and_dump_history": lambda: [langchain_to_chat_message(message).model_dump() for message in history],
+    }
+
+
+CASE_GROUPS: list[Callable[[], dict[str, Callable[[], Any]]]] = [
+    _event_cases,
+    _search_cases,
+    _season_cases,
+    _chat_message_cases,
+]
+
+
+def compare_with_baseline(results: dict[str, dict[str, float]], baseline: dict[str, Any], max_regression: float) -> list[str]:
+    """Cases whose ops/sec dropped by more than `max_regression` (a fraction) against `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("cases", {}).get(name, {}).get("ops_per_sec")
+        if not before:
+            continue
+        change = result["ops_per_sec"] / before - 1
+        print(f"  {name:<40} {before:>12.1f} -> {result['ops_per_sec']:>12.1f} ops/s ({change:+.0%})")
+        if change < -max_regression:
+            regressions.append(f"{name}: {before} -> {result['ops_per_sec']} ops/s ({change:+.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the Wyscout tools' CPU paths")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed batches per case")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results as {BASELINE_PATH}")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed ops/sec drop against the baseline")
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, float]] = {}
+    for group in CASE_GROUPS:
+        for name, op in group().items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(op, repeats=args.repeats)
+            r = results[name]
+            print(
+                f"{name:<40} {r['ops_per_sec']:>12.1f} ops/s  median {r['median_us']:>10.1f}us  "
+                f"peak {r['peak_alloc_kib']:>9.1f}KiB  retained {r['retained_kib']:>9.1f}KiB"
+            )
+
+    report = {"created_at": datetime.now().isoformat(), "python": sys.version.split()[0], "cases": results}
+    print(f"\nResults written to {write_results('micro', report)}")
+
+    regressions: list[str] = []
+    if BASELINE_PATH.exists() and not args.save_baseline:
+        print(f"\nCompared with {BASELINE_PATH}:")
+        regressions = compare_with_baseline(results, json.loads(BASELINE_PATH.read_text()), args.max_regression)
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {"cases": {}}
+        baseline.update({k: v for k, v in report.items() if k != "cases"})
+        baseline["cases"].update(results)
+        BASELINE_PATH.parent.mkdir(exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
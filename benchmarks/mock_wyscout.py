@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Wyscout v2 REST API
+
+Serves every endpoint the Wyscout tools call (backend/agents/wyscout/tools) so the tools, the
+workflow and the service can run offline without spending API quota. Point the tools at it with
+WYSCOUT_API_BASE_URL=http://127.0.0.1:<port>/v2.
+
+Responses come from recorded fixtures when available, otherwise from deterministic synthetic
+payloads sized like real ones (3-4k events per match, full season player pages, ~100 metrics
+per advanced-stats block, base64 player images). A fixture for GET /v2/matches/123/events is
+read from <fixtures-dir>/matches/123/events.json.
+
+Fault injection for cache, retry and rate-limiter tests:
+
+- latency: a mean per-request delay with gaussian jitter, plus a per-megabyte transfer cost
+- 429: at a fixed probability, and/or whenever a requests-per-second quota is exceeded
+  (with a Retry-After header, like the real API)
+- 5xx: 500/502/503/504 at a fixed probability
+
+The behaviour can be changed while the server runs with POST /_mock/config (JSON body with any
+MockWyscoutConfig field); GET /_mock/stats returns request and injected-fault counts per route.
+
+Usage:
+    python -m benchmarks.mock_wyscout [--port 8765] [--latency 0.15] [--jitter 0.3]
+        [--error-rate-429 0.0] [--error-rate-5xx 0.0] [--rate-limit-rps 12] [--fixtures DIR]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import zlib
+from collections import Counter, deque
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, fields
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from aiohttp import web
+
+API_PREFIX = "/v2"
+
+EVENT_TYPES = [
+    "pass", "received_pass", "duel", "touch", "interception", "clearance", "shot", "infraction",
+    "free_kick", "throw_in", "corner", "goal_kick", "pressing_attempt", "acceleration",
+    "game_interruption", "offside", "shot_against", "goalkeeper_exit",
+]
+# Rough share of each primary type in a real event stream (passes dominate)
+EVENT_TYPE_WEIGHTS = [40, 20, 12, 6, 4, 3, 1.5, 1.5, 1.2, 2, 0.6, 0.5, 3, 1.5, 1.2, 0.2, 0.5, 0.3]
+MATCH_PERIODS = ["1H", "2H"]
+ROLES = [("Goalkeeper", "GK", "GKP"), ("Defender", "DF", "DEF"), ("Midfielder", "MD", "MID"), ("Forward", "FW", "FWD")]
+
+# Player and coach objects carry an inline image; real ones are a few KB of base64
+_IMAGE_DATA_URL = "data:image/png;base64," + base64.b64encode(bytes(range(256)) * 12).decode()
+
+
+@dataclass
+class MockWyscoutConfig:
+    latency: float = 0.15  # mean seconds per response
+    jitter: float = 0.3  # standard deviation as a fraction of `latency`
+    latency_per_mb: float = 0.05  # extra seconds per MB of response body
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    rate_limit_rps: float = 0.0  # 0 disables the quota
+    retry_after: int = 1
+    require_auth: bool = True
+    fixtures_dir: str | None = None
+    seed: int | None = None
+
+
+# ───────────────────────────── Synthetic payloads ─────────────────────────────
+def _rng(*parts: Any) -> random.Random:
+    return random.Random(zlib.crc32("/".join(str(p) for p in parts).encode()))
+
+
+def _area(rng: random.Random) -> dict[str, Any]:
+    area_id = rng.randint(1, 250)
+    return {"id": area_id, "name": f"Country {area_id}", "alpha2code": f"C{area_id % 10}", "alpha3code": f"CO{area_id % 10}"}
+
+
+def synthetic_player(player_id: int, team_id: int | None = None) -> dict[str, Any]:
+    rng = _rng("player", player_id)
+    role_name, code2, code3 = rng.choice(ROLES)
+    team_id = team_id or rng.randint(1000, 1999)
+    return {
+        "wyId": player_id,
+        "shortName": f"P. Player{player_id}",
+        "firstName": f"First{player_id}",
+        "middleName": "",
+        "lastName": f"Player{player_id}",
+        "height": rng.randint(165, 198),
+        "weight": rng.randint(60, 95),
+        "birthDate": f"{rng.randint(1988, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "birthArea": _area(rng),
+        "passportArea": _area(rng),
+        "role": {"name": role_name, "code2": code2, "code3": code3},
+        "foot": rng.choice(["right", "left", "both"]),
+        "currentTeamId": team_id,
+        "currentNationalTeamId": rng.randint(2000, 2200),
+        "currentTeam": {"wyId": team_id, "name": f"Team {team_id}", "officialName": f"Team {team_id} FC"},
+        "gender": "male",
+        "status": "active",
+        "imageDataURL": _IMAGE_DATA_URL,
+    }
+
+
+def synthetic_team(team_id: int) -> dict[str, Any]:
+    rng = _rng("team", team_id)
+    return {
+        "wyId": team_id,
+        "name": f"Team {team_id}",
+        "officialName": f"Team {team_id} FC",
+        "city": f"City {team_id % 97}",
+        "area": _area(rng),
+        "type": "club",
+        "category": "default",
+        "gender": "male",
+        "gsmId": team_id * 7,
+        "imageDataURL": _IMAGE_DATA_URL,
+    }
+
+
+def synthetic_person(kind: str, wy_id: int) -> dict[str, Any]:
+    rng = _rng(kind, wy_id)
+    return {
+        "wyId": wy_id,
+        "shortName": f"{kind.title()} {wy_id}",
+        "firstName": f"First{wy_id}",
+        "lastName": f"{kind.title()}{wy_id}",
+        "birthDate": f"{rng.randint(1955, 1990)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "birthArea": _area(rng),
+        "passportArea": _area(rng),
+        "gender": "male",
+        "status": "active",
+        "imageDataURL": _IMAGE_DATA_URL if kind == "coach" else None,
+    }
+
+
+def synthetic_competition(competition_id: int) -> dict[str, Any]:
+    rng = _rng("competition", competition_id)
+    return {
+        "wyId": competition_id,
+        "name": f"League {competition_id}",
+        "area": _area(rng),
+        "format": "Domestic league",
+        "type": "club",
+        "category": "default",
+        "gender": "male",
+        "divisionLevel": rng.randint(1, 3),
+    }
+
+
+def _season(season_id: int) -> dict[str, Any]:
+    year = 2000 + season_id % 25
+    return {
+        "wyId": season_id,
+        "name": f"{year}/{year + 1}",
+        "startDate": f"{year}-08-10",
+        "endDate": f"{year + 1}-05-25",
+        "active": True,
+        "competitionId": 300 + season_id % 200,
+    }
+
+
+def _team_ids(seed: int, count: int = 20) -> list[int]:
+    rng = _rng("teams", seed)
+    return rng.sample(range(1000, 2000), count)
+
+
+def _match(match_id: int, with_teams_data: bool = False) -> dict[str, Any]:
+    rng = _rng("match", match_id)
+    home, away = rng.sample(range(1000, 2000), 2)
+    home_score, away_score = rng.randint(0, 4), rng.randint(0, 3)
+    match: dict[str, Any] = {
+        "wyId": match_id,
+        "matchId": match_id,
+        "label": f"Team {home} - Team {away}, {home_score}-{away_score}",
+        "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 20:00:00",
+        "dateutc": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 19:00:00",
+        "status": "Played",
+        "duration": "Regular",
+        "winner": home if home_score > away_score else away if away_score > home_score else 0,
+        "competitionId": 364,
+        "seasonId": 188989,
+        "roundId": 4400000 + match_id % 38,
+        "gameweek": match_id % 38 + 1,
+        "venue": f"Stadium {home}",
+        "goals": f"{home_score}-{away_score}",
+    }
+    if with_teams_data:
+        match["teamsData"] = {
+            str(team): {
+                "teamId": team,
+                "side": side,
+                "score": score,
+                "scoreHT": min(score, rng.randint(0, 2)),
+                "coachId": rng.randint(100000, 200000),
+                "hasFormation": 1,
+                "formation": {
+                    "lineup": [{"playerId": rng.randint(10000, 900000), "shirtNumber": n, "goals": "null"} for n in range(1, 12)],
+                    "bench": [{"playerId": rng.randint(10000, 900000), "shirtNumber": n} for n in range(12, 24)],
+                    "substitutions": [
+                        {"playerIn": rng.randint(10000, 900000), "playerOut": rng.randint(10000, 900000), "minute": rng.randint(46, 90)}
+                        for _ in range(5)
+                    ],
+                },
+            }
+            for team, side, score in ((home, "home", home_score), (away, "away", away_score))
+        }
+        match["referees"] = [{"refereeId": rng.randint(300000, 400000), "role": role} for role in ("referee", "firstAssistant", "secondAssistant", "fourthOfficial")]
+    return match
+
+
+def synthetic_match_events(match_id: int, count: int | None = None) -> list[dict[str, Any]]:
+    """A deterministic v3-style event stream of 3-4k events (or `count`) for `match_id`."""
+    rng = _rng("events", match_id)
+    count = count or rng.randint(3000, 4000)
+    home, away = rng.sample(range(1000, 2000), 2)
+    squads = {team: [team * 1000 + n for n in range(1, 17)] for team in (home, away)}
+    events = []
+    for index in range(count):
+        team = home if rng.random() < 0.52 else away
+        player = rng.choice(squads[team])
+        primary = rng.choices(EVENT_TYPES, EVENT_TYPE_WEIGHTS)[0]
+        second = index * 5400 / count
+        event: dict[str, Any] = {
+            "id": match_id * 10000 + index,
+            "matchId": match_id,
+            "matchPeriod": MATCH_PERIODS[0] if second < 2700 else MATCH_PERIODS[1],
+            "minute": int(second // 60),
+            "second": int(second % 60),
+            "matchTimestamp": f"{int(second // 3600):02d}:{int(second % 3600 // 60):02d}:{second % 60:06.3f}",
+            "videoTimestamp": f"{second + 5:.3f}",
+            "relatedEventId": match_id * 10000 + index + 1 if primary == "pass" else None,
+            "type": {"primary": primary, "secondary": rng.sample(["forward_pass", "short_or_medium_pass", "progressive_pass", "loss", "recovery", "head_pass"], 2)},
+            "location": {"x": rng.randint(0, 100), "y": rng.randint(0, 100)},
+            "team": {"id": team, "name": f"Team {team}", "formation": "4-3-3"},
+            "opponentTeam": {"id": away if team == home else home, "name": f"Team {away if team == home else home}", "formation": "4-4-2"},
+            "player": {"id": player, "name": f"P. Player{player}", "position": rng.choice(["CF", "LW", "RW", "CMF", "DMF", "LCB", "RCB", "GK"])},
+            "possession": {"id": match_id * 1000 + index // 8, "duration": f"{rng.uniform(1, 40):.3f}", "types": ["attack"], "eventIndex": index % 8},
+        }
+        if primary == "pass":
+            event["pass"] = {
+                "accurate": rng.random() < 0.84,
+                "angle": rng.randint(-180, 180),
+                "height": rng.choice([None, "high"]),
+                "length": round(rng.uniform(3, 60), 1),
+                "recipient": {"id": rng.choice(squads[team]), "name": "", "position": "CMF"},
+                "endLocation": {"x": rng.randint(0, 100), "y": rng.randint(0, 100)},
+            }
+        elif primary == "shot":
+            event["shot"] = {
+                "bodyPart": rng.choice(["right_foot", "left_foot", "head_or_other"]),
+                "isGoal": rng.random() < 0.11,
+                "onTarget": rng.random() < 0.35,
+                "goalZone": rng.choice(["gc", "gt", "gb", "olt", "obr"]),
+                "xg": round(rng.uniform(0.01, 0.7), 3),
+                "postShotXg": round(rng.uniform(0, 0.9), 3),
+            }
+        events.append(event)
+    return events
+
+
+def _stat_block(rng: random.Random, scale: float = 1.0) -> dict[str, float]:
+    names = [
+        "matches", "matchesInStart", "minutesOnField", "goals", "assists", "shots", "headShots", "yellowCards",
+        "redCards", "passes", "forwardPasses", "backPasses", "lateralPasses", "longPasses", "successfulPasses",
+        "progressivePasses", "passesToFinalThird", "smartPasses", "keyPasses", "crosses", "dribbles",
+        "successfulDribbles", "duels", "duelsWon", "defensiveDuels", "offensiveDuels", "aerialDuels",
+        "interceptions", "recoveries", "losses", "touchInBox", "xgShot", "xgAssist", "xgSave", "fouls",
+        "foulsSuffered", "progressiveRun", "accelerations", "shotAssists", "secondAssists", "thirdAssists",
+    ]
+    block: dict[str, float] = {}
+    for name in names:
+        block[name] = round(rng.uniform(0, 120) * scale, 2)
+        block[f"{name}Successful"] = round(block[name] * rng.uniform(0.3, 0.9), 2)
+    return block
+
+
+def _advanced_stats(entity: str, wy_id: int, competition_id: str | None = None) -> dict[str, Any]:
+    rng = _rng("advancedstats", entity, wy_id, competition_id)
+    return {
+        f"{entity}Id": wy_id,
+        "competitionId": int(competition_id) if competition_id and competition_id.isdigit() else 364,
+        "seasonId": 188989,
+        "positions": [{"position": {"name": "Centre Forward", "code": "cf"}, "percent": 78}, {"position": {"name": "Left Winger", "code": "lw"}, "percent": 22}],
+        "total": _stat_block(rng, 10),
+        "average": _stat_block(rng, 0.2),
+        "percent": _stat_block(rng, 0.8),
+    }
+
+
+def _players_page(seed: Any, limit: int, page: int, total: int = 560) -> dict[str, Any]:
+    rng = _rng("squad", seed)
+    teams = _team_ids(rng.randint(0, 10_000))
+    start = (page - 1) * limit
+    ids = range(start, min(total, start + limit))
+    return {
+        "meta": {"appliedLimit": limit, "appliedPage": page, "total_items": total, "page_count": -(-total // limit)},
+        "players": [synthetic_player(100000 + int(zlib.crc32(f"{seed}/{i}".encode())) % 900000, teams[i % len(teams)]) for i in ids],
+    }
+
+
+def _standings(season_id: int) -> dict[str, Any]:
+    rng = _rng("standings", season_id)
+    rows = []
+    for rank, team in enumerate(_team_ids(season_id), start=1):
+        wins, draws = rng.randint(5, 25), rng.randint(2, 12)
+        rows.append({
+            "teamId": team,
+            "groupName": "Regular Season",
+            "groupId": 0,
+            "totalPlayed": 38,
+            "totalWins": wins,
+            "totalDraws": draws,
+            "totalLosses": 38 - wins - draws,
+            "totalGoalsFor": rng.randint(25, 95),
+            "totalGoalsAgainst": rng.randint(20, 80),
+            "totalPoints": wins * 3 + draws,
+            "rank": rank,
+        })
+    rows.sort(key=lambda row: -row["totalPoints"])
+    return {"teams": rows}
+
+
+def _leaders(season_id: int, stat: str) -> dict[str, Any]:
+    rng = _rng("leaders", season_id, stat)
+    players = [{"playerId": rng.randint(10000, 900000), "teamId": rng.choice(_team_ids(season_id)), stat: 30 - rank, "appearances": rng.randint(20, 38)} for rank in range(30)]
+    return {"players": players}
+
+
+def _transfers(seed: Any, count: int = 40) -> dict[str, Any]:
+    rng = _rng("transfers", seed)
+    return {
+        "transfer": [
+            {
+                "transferId": rng.randint(1, 10**7),
+                "playerId": rng.randint(10000, 900000),
+                "fromTeamId": rng.randint(1000, 1999),
+                "toTeamId": rng.randint(1000, 1999),
+                "startDate": f"20{rng.randint(15, 24)}-07-01",
+                "endDate": f"20{rng.randint(25, 29)}-06-30",
+                "type": rng.choice(["Transfer", "Loan", "Free Transfer", "Back from Loan"]),
+                "value": rng.randint(0, 80) * 1_000_000,
+                "currency": "EUR",
+                "announceDate": f"20{rng.randint(15, 24)}-06-15",
+                "active": True,
+            }
+            for _ in range(count)
+        ]
+    }
+
+
+def _career(seed: Any, entity: str, count: int = 12) -> dict[str, Any]:
+    rng = _rng("career", seed)
+    return {
+        "career": [
+            {
+                f"{entity}Id": seed,
+                "teamId": rng.randint(1000, 1999),
+                "competitionId": rng.randint(300, 800),
+                "seasonId": 180000 + n,
+                "appearances": rng.randint(0, 40),
+                "goal": rng.randint(0, 25),
+                "minutesPlayed": rng.randint(0, 3420),
+                "penalties": rng.randint(0, 5),
+                "redCards": rng.randint(0, 2),
+                "yellowCard": rng.randint(0, 10),
+                "substituteIn": rng.randint(0, 10),
+                "substituteOnBench": rng.randint(0, 15),
+                "substituteOut": rng.randint(0, 15),
+                "shirtNumber": rng.randint(1, 40),
+            }
+            for n in range(count)
+        ]
+    }
+
+
+def _matches_list(seed: Any, count: int) -> dict[str, Any]:
+    rng = _rng("matches", seed)
+    return {"matches": [_match(rng.randint(5_000_000, 6_000_000)) for _ in range(count)]}
+
+
+Handler = Callable[[dict[str, str], dict[str, str]], Any]
+
+# Route pattern (aiohttp syntax, under API_PREFIX) -> payload builder(path params, query params)
+ROUTES: dict[str, Handler] = {
+    "/areas": lambda p, q: {"areas": [{"id": i, "name": f"Country {i}", "alpha2code": f"C{i % 10}", "alpha3code": f"CO{i % 10}"} for i in range(1, 251)]},
+    "/search": lambda p, q: [synthetic_person(q.get("objType", "referee"), 300000 + i) for i in range(int(q.get("limit", 10)))],
+    "/players": lambda p, q: {"players": [synthetic_player(100000 + i) for i in range(10)]},
+    "/teams": lambda p, q: {"teams": [synthetic_team(1000 + i) for i in range(10)]},
+    "/competitions": lambda p, q: {"competitions": [synthetic_competition(300 + i) for i in range(int(q.get("limit", 10)) if "search" in q else 25)]},
+    "/competitions/{wyId}": lambda p, q: synthetic_competition(int(p["wyId"])),
+    "/competitions/{wyId}/matches": lambda p, q: _matches_list(("competition", p["wyId"]), 380),
+    "/competitions/{wyId}/seasons": lambda p, q: {"competition": synthetic_competition(int(p["wyId"])), "seasons": [{"seasonId": 180000 + n, "season": _season(180000 + n)} for n in range(20)]},
+    "/competitions/{wyId}/teams": lambda p, q: {"teams": [synthetic_team(t) for t in _team_ids(int(p["wyId"]))]},
+    "/competitions/{wyId}/players": lambda p, q: _players_page(("competition", p["wyId"]), int(q.get("limit", 100)), int(q.get("page", 1))),
+    "/seasons/{wyId}": lambda p, q: _season(int(p["wyId"])),
+    "/seasons/{wyId}/assistmen": lambda p, q: _leaders(int(p["wyId"]), "assists"),
+    "/seasons/{wyId}/scorers": lambda p, q: _leaders(int(p["wyId"]), "goals"),
+    "/seasons/{wyId}/career": lambda p, q: _career(int(p["wyId"]), "season", 20),
+    "/seasons/{wyId}/fixtures": lambda p, q: _matches_list(("season-fixtures", p["wyId"]), 60),
+    "/seasons/{wyId}/matches": lambda p, q: _matches_list(("season", p["wyId"]), 380),
+    "/seasons/{wyId}/players": lambda p, q: _players_page(("season", p["wyId"]), int(q.get("limit", 100)), int(q.get("page", 1))),
+    "/seasons/{wyId}/standings": lambda p, q: _standings(int(p["wyId"])),
+    "/seasons/{wyId}/teams": lambda p, q: {"teams": [synthetic_team(t) for t in _team_ids(int(p["wyId"]))]},
+    "/seasons/{wyId}/transfers": lambda p, q: _transfers(("season", p["wyId"]), 150),
+    "/teams/{wyId}": lambda p, q: synthetic_team(int(p["wyId"])),
+    "/teams/{wyId}/career": lambda p, q: _career(int(p["wyId"]), "team"),
+    "/teams/{wyId}/fixtures": lambda p, q: _matches_list(("team-fixtures", p["wyId"]), 10),
+    "/teams/{wyId}/matches": lambda p, q: _matches_list(("team", p["wyId"]), 50),
+    "/teams/{wyId}/squad": lambda p, q: {"squad": [synthetic_player(int(p["wyId"]) * 1000 + n, int(p["wyId"])) for n in range(1, 31)]},
+    "/teams/{wyId}/transfers": lambda p, q: _transfers(("team", p["wyId"])),
+    "/teams/{wyId}/advancedstats": lambda p, q: _advanced_stats("team", int(p["wyId"]), q.get("compId")),
+    "/teams/{wyId}/matches/{matchId}/advancedstats": lambda p, q: _advanced_stats("team", int(p["wyId"]), p["matchId"]),
+    "/players/{wyId}": lambda p, q: synthetic_player(int(p["wyId"])),
+    "/players/{wyId}/career": lambda p, q: _career(int(p["wyId"]), "player"),
+    "/players/{wyId}/contractinfo": lambda p, q: {"playerId": int(p["wyId"]), "contractExpiration": "2027-06-30", "agencies": ["Agency A"]},
+    "/players/{wyId}/fixtures": lambda p, q: _matches_list(("player-fixtures", p["wyId"]), 10),
+    "/players/{wyId}/matches": lambda p, q: _matches_list(("player", p["wyId"]), 45),
+    "/players/{wyId}/transfers": lambda p, q: _transfers(("player", p["wyId"]), 6),
+    "/players/{wyId}/advancedstats": lambda p, q: _advanced_stats("player", int(p["wyId"]), q.get("compId")),
+    "/players/{wyId}/matches/{matchId}/advancedstats": lambda p, q: _advanced_stats("player", int(p["wyId"]), p["matchId"]),
+    "/matches/{wyId}": lambda p, q: _match(int(p["wyId"]), with_teams_data=True),
+    "/matches/{wyId}/formations": lambda p, q: {str(t): {"1H": {"1": {"4-3-3": {"scheme": "4-3-3", "startSec": 0, "endSec": 2700}}}} for t in _team_ids(int(p["wyId"]), 2)},
+    # The events tool filters the response as a list of events
+    "/matches/{wyId}/events": lambda p, q: synthetic_match_events(int(p["wyId"])),
+    "/matches/{wyId}/advancedstats": lambda p, q: {t: _stat_block(_rng("match-stats", p["wyId"], t)) for t in ("general", "possession", "openPlay", "attacks", "transitions", "passes", "defence", "duels", "flanks")},
+    "/matches/{wyId}/advancedstats/players": lambda p, q: {"players": [_advanced_stats("player", int(p["wyId"]) * 100 + n) for n in range(28)]},
+    "/videos/{wyId}": lambda p, q: {"videos": {quality: {"url": f"https://video.mock/{p['wyId']}/{quality}.mp4", "start": q.get("start"), "end": q.get("end")} for quality in ("lq", "sd", "hd")}},
+    "/videos/{wyId}/qualities": lambda p, q: {"qualities": ["lq", "sd", "hd", "fullhd"]},
+    "/videos/{wyId}/offsets": lambda p, q: {"offsets": {"1H": {"start": 12, "end": 2812}, "2H": {"start": 3800, "end": 6650}}},
+    "/coaches/{wyId}": lambda p, q: synthetic_person("coach", int(p["wyId"])),
+    "/referees/{wyId}": lambda p, q: synthetic_person("referee", int(p["wyId"])),
+    "/rounds/{wyId}": lambda p, q: {"wyId": int(p["wyId"]), "name": f"Gameweek {int(p['wyId']) % 38 + 1}", "type": "season", "startDate": "2024-09-14", "endDate": "2024-09-16", "competitionId": 364, "seasonId": 188989},
+}
+
+
+@lru_cache(maxsize=256)
+def _encoded_payload(route: str, path_params: str, query: str) -> bytes:
+    """Serialized payloads are cached so large responses cost the same as cached ones in production."""
+    payload = ROUTES[route](json.loads(path_params), json.loads(query))
+    return json.dumps(payload).encode()
+
+
+# ───────────────────────────── Server ─────────────────────────────
+class MockWyscout:
+    def __init__(self, config: MockWyscoutConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.requests: Counter[str] = Counter()
+        self.faults: Counter[str] = Counter()
+        self._recent: deque[float] = deque()
+
+    def _over_quota(self) -> bool:
+        if self.config.rate_limit_rps <= 0:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.config.rate_limit_rps:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _fixture(self, request: web.Request) -> bytes | None:
+        if not self.config.fixtures_dir:
+            return None
+        relative = request.path[len(API_PREFIX):].strip("/")
+        path = Path(self.config.fixtures_dir) / f"{relative}.json"
+        return path.read_bytes() if path.is_file() else None
+
+    async def _delay(self, body_size: int) -> None:
+        config = self.config
+        delay = self.random.gauss(config.latency, config.latency * config.jitter) if config.jitter else config.latency
+        delay = max(0.0, delay) + body_size / 1_000_000 * config.latency_per_mb
+        if delay:
+            await asyncio.sleep(delay)
+
+    def handler(self, route: str) -> Callable[[web.Request], Any]:
+        async def handle(request: web.Request) -> web.Response:
+            self.requests[route] += 1
+            if self.config.require_auth and not request.headers.get("Authorization"):
+                return web.json_response({"error": {"code": 401, "message": "Unauthorized"}}, status=401)
+
+            if self._over_quota() or self.random.random() < self.config.error_rate_429:
+                self.faults["429"] += 1
+                await self._delay(0)
+                return web.json_response(
+                    {"error": {"code": 429, "message": "Too Many Requests"}},
+                    status=429,
+                    headers={"Retry-After": str(self.config.retry_after)},
+                )
+            if self.random.random() < self.config.error_rate_5xx:
+                status = self.random.choice([500, 502, 503, 504])
+                self.faults[str(status)] += 1
+                await self._delay(0)
+                return web.json_response({"error": {"code": status, "message": "Server error"}}, status=status)
+
+            body = self._fixture(request)
+            if body is None:
+                body = _encoded_payload(
+                    route,
+                    json.dumps(dict(request.match_info), sort_keys=True),
+                    json.dumps(dict(request.query), sort_keys=True),
+                )
+            await self._delay(len(body))
+            return web.Response(body=body, content_type="application/json")
+
+        return handle
+
+    async def update_config(self, request: web.Request) -> web.Response:
+        updates = await request.json()
+        known = {f.name for f in fields(MockWyscoutConfig)}
+        unknown = set(updates) - known
+        if unknown:
+            return web.json_response({"error": f"Unknown config fields: {sorted(unknown)}"}, status=400)
+        for key, value in updates.items():
+            setattr(self.config, key, value)
+        return web.json_response(asdict(self.config))
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": dict(self.requests), "faults": dict(self.faults), "config": asdict(self.config)})
+
+
+def create_app(config: MockWyscoutConfig | None = None) -> web.Application:
+    mock = MockWyscout(config or MockWyscoutConfig())
+    app = web.Application()
+    app["mock_wyscout"] = mock
+    for route in ROUTES:
+        app.router.add_get(f"{API_PREFIX}{route}", mock.handler(route))
+    app.router.add_post("/_mock/config", mock.update_config)
+    app.router.add_get("/_mock/stats", mock.stats)
+    return app
+
+
+async def start_mock_wyscout(
+    host: str = "127.0.0.1", port: int = 8765, config: MockWyscoutConfig | None = None
+) -> web.AppRunner:
+    """Start the mock server in the running event loop. Call `runner.cleanup()` to stop it."""
+    runner = web.AppRunner(create_app(config))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Wyscout API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.15, help="Mean seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Latency standard deviation as a fraction of --latency")
+    parser.add_argument("--error-rate-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0, help="Probability of a 5xx response")
+    parser.add_argument("--rate-limit-rps", type=float, default=0.0, help="Answer 429 above this many requests/second")
+    parser.add_argument("--fixtures", help="Directory of recorded JSON responses to serve instead of synthetic ones")
+    parser.add_argument("--seed", type=int, help="Seed for latency and fault injection")
+    args = parser.parse_args()
+
+    config = MockWyscoutConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx,
+        rate_limit_rps=args.rate_limit_rps,
+        fixtures_dir=args.fixtures,
+        seed=args.seed,
+    )
+    print(f"Mock Wyscout API on http://{args.host}:{args.port}{API_PREFIX} (set WYSCOUT_API_BASE_URL to this)")
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Per-node model benchmark
+
+Runs the refined workflow's auxiliary nodes (contextualize_query, refine_output) on a fixed set
+of scouting cases with the default model and with each candidate model passed through
+`configurable["node_models"]`. For every model it reports latency percentiles and how closely
+the output agrees with the default model's output:
+
+- contextualize_query: share of cases with the same `requires_schema_flag`, and text similarity
+  of the contextual insights
+- refine_output: text similarity of the refined answer
+
+Calls the configured model providers, so API keys must be set as for the service.
+
+Usage:
+    python -m benchmarks.node_models --models gpt-4o-mini claude-3.5-haiku [--repeats 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend.agents.wyscout.agent import contextualize_query_node, refine_output_refined
+from benchmarks.common import percentiles, write_results
+
+CASES: list[dict[str, Any]] = [
+    {
+        "history": [],
+        "question": "Who are the top scorers in La Liga this season?",
+        "app_output": "Top scorers (La Liga 2024/25): Lewandowski 25, Mbappe 24, Budimir 18, Raphinha 17, Sorloth 16.",
+    },
+    {
+        "history": [
+            ("human", "Show me Bukayo Saka's career stats."),
+            ("ai", "Bukayo Saka (Arsenal): 250 appearances, 64 goals, 58 assists across all competitions."),
+        ],
+        "question": "How does that compare with his numbers last season?",
+        "app_output": "2023/24: 47 appearances, 20 goals, 14 assists. 2024/25 so far: 30 appearances, 9 goals, 13 assists.",
+    },
+    {
+        "history": [],
+        "question": "What is a progressive pass?",
+        "app_output": "A progressive pass moves the ball significantly closer to the opponent's goal, typically at least 30% closer.",
+    },
+    {
+        "history": [("human", "Current Premier League standings please")],
+        "question": "And which of the top four has the best defence?",
+        "app_output": "Of the top four, Arsenal have conceded the fewest goals (24 in 30 matches).",
+    },
+    {
+        "history": [],
+        "question": "List the matches Real Madrid play in the next two weeks with kickoff times.",
+        "app_output": "Real Madrid fixtures: 12 Apr vs Alaves 21:00 CET, 16 Apr vs Arsenal 21:00 CET, 20 Apr vs Athletic 21:30 CET.",
+    },
+]
+
+
+def _messages(case: dict[str, Any]) -> list[Any]:
+    history = [HumanMessage(content=text) if role == "human" else AIMessage(content=text) for role, text in case["history"]]
+    return [*history, HumanMessage(content=case["question"])]
+
+
+def _similarity(a: str | None, b: str | None) -> float:
+    return SequenceMatcher(None, a or "", b or "").ratio()
+
+
+async def _run_node(node: str, case: dict[str, Any], model: str | None) -> tuple[float, dict[str, Any]]:
+    configurable: dict[str, Any] = {"thread_id": "benchmark-node-models", "stream_refined_output": False}
+    if model:
+        configurable["node_models"] = {node: model}
+    config = {"configurable": configurable}
+    state: dict[str, Any] = {"messages": _messages(case)}
+
+    start = time.perf_counter()
+    if node == "contextualize_query":
+        result = await contextualize_query_node(state, config)
+        output = {
+            "requires_schema_flag": result.get("requires_schema_flag"),
+            "text": result.get("internal_context_insights"),
+        }
+    else:
+        state.update({"app_output": case["app_output"], "agent_tool_outputs": []})
+        result = await refine_output_refined(state, config)
+        output = {"text": str(result["messages"][-1].content)}
+    return time.perf_counter() - start, output
+
+
+async def benchmark(models: list[str], repeats: int) -> dict[str, Any]:
+    report: dict[str, Any] = {"created_at": datetime.now().isoformat(), "repeats": repeats, "nodes": {}}
+    for node in ("contextualize_query", "refine_output"):
+        baseline_outputs: list[dict[str, Any]] = []
+        node_report: dict[str, Any] = {}
+        for model in [None, *models]:
+            latencies: list[float] = []
+            similarities: list[float] = []
+            flag_matches: list[bool] = []
+            for case_index, case in enumerate(CASES):
+                for repeat in range(repeats):
+                    latency, output = await _run_node(node, case, model)
+                    latencies.append(latency)
+                    if model is None:
+                        if repeat == 0:
+                            baseline_outputs.append(output)
+                        continue
+                    baseline = baseline_outputs[case_index]
+                    similarities.append(_similarity(baseline["text"], output["text"]))
+                    if node == "contextualize_query":
+                        flag_matches.append(baseline["requires_schema_flag"] == output["requires_schema_flag"])
+            entry: dict[str, Any] = {"latency_seconds": percentiles(latencies)}
+            if model is not None:
+                entry["text_similarity"] = round(statistics.fmean(similarities), 3)
+                if flag_matches:
+                    entry["flag_agreement"] = round(sum(flag_matches) / len(flag_matches), 3)
+            node_report[model or "default"] = entry
+            print(f"{node:<22} {model or 'default':<28} {json.dumps(entry)}")
+        report["nodes"][node] = node_report
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-node model choices for the refined workflow")
+    parser.add_argument("--models", nargs="+", required=True, help="Candidate model names from backend/schema/models.py")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per case and model")
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args.models, args.repeats))
+    print(f"\nResults written to {write_results('node_models', report)}")
+
+
+if __name__ == "__main__":
+    main()
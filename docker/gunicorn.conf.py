@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for running the service with several worker processes per host:
+
+    gunicorn -c docker/gunicorn.conf.py backend.service.service:app
+
+The app is imported once and the graphs compiled in the master process (see
+`backend.service.service.prefork`); the workers are forked from it and share that memory.
+Each worker then opens its own database pools in the app lifespan. Set
+SHARED_CACHE_BACKEND=sqlite so answer, schema and accounting caches are shared by the
+workers instead of duplicated per process.
+"""
+
+import asyncio
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("SERVICE_WORKERS", "2"))
+# Loaded before the app is imported: tell it how many workers share the host
+os.environ["SERVICE_WORKERS"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Seconds a worker may stop checking in before it is restarted. Async workers check in during
+# long runs, so this only fires when a worker's event loop is blocked
+timeout = int(os.getenv("SERVICE_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after the app was imported and before any worker is forked
+    from backend.service.service import prefork
+
+    asyncio.run(prefork())
+    server.log.info(f"Pre-fork warmup finished, starting {workers} workers")
@@ -27,11 +27,16 @@ def run_service():
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     
+    # Several workers need the shared cache backend to share caches, and gunicorn
+    # (docker/gunicorn.conf.py) to also share the compiled graphs
+    workers = 1 if settings.is_dev() else int(os.getenv("SERVICE_WORKERS", "1"))
+    os.environ["SERVICE_WORKERS"] = str(workers)
     uvicorn.run(
         "backend.service.service:app", 
         host=settings.HOST, 
         port=settings.PORT, 
-        reload=settings.is_dev()
+        reload=settings.is_dev(),
+        workers=workers,
     )
 
 if __name__ == "__main__":
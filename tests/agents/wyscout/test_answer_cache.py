@@ -0,0 +1,12 @@
+from backend.agents.wyscout.answer_cache import answer_cache_key
+
+
+def test_first_question_is_keyed() -> None:
+    key = answer_cache_key("How many goals did Inter score in the 2023 season?", has_prior_turns=False)
+    assert key is not None and key.endswith(":how many goals did inter score in 2023 season")
+
+
+def test_follow_ups_are_never_keyed() -> None:
+    assert answer_cache_key("How many goals in the 2023 season?", has_prior_turns=True) is None
+    assert answer_cache_key("What about this club in the 2023 season?", has_prior_turns=True) is None
+    assert answer_cache_key("How many goals did he score?", has_prior_turns=True) is None
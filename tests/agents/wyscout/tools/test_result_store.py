@@ -0,0 +1,64 @@
+import time
+
+import pytest
+from langchain_core.tools import StructuredTool
+from langgraph.store.memory import InMemoryStore
+
+from backend.agents.wyscout.tools import result_store
+from backend.agents.wyscout.tools.result_store import (
+    TOOL_RESULT_NAMESPACE,
+    _has_error,
+    _store_or_call,
+    canonical_tool_args,
+    tool_result_key,
+)
+
+
+def test_has_error_finds_nested_errors() -> None:
+    assert _has_error({"error": "API Error: 500"})
+    assert _has_error({"live_api_areas": {"error": "timeout"}})
+    assert _has_error({"live_api_areas": [{"error": "API Error: 500", "message": "boom"}]})
+    assert _has_error([{"matches": [{"error": "timeout"}]}])
+    assert not _has_error({"areas": [{"id": 1, "name": "Italy"}], "count": 1})
+    assert not _has_error("error")
+
+
+def lookup_tool(calls: list[str]) -> StructuredTool:
+    def lookup(name: str) -> dict:
+        calls.append(name)
+        return {"name": name}
+
+    return StructuredTool.from_function(lookup, name="lookup", description="Look a name up.")
+
+
+@pytest.mark.asyncio
+async def test_expired_result_is_deleted_and_fetched_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    store = InMemoryStore()
+    monkeypatch.setattr(result_store, "_current_store", lambda: store)
+    calls: list[str] = []
+    tool = lookup_tool(calls)
+    namespace = (*TOOL_RESULT_NAMESPACE, tool.name)
+    key = tool_result_key(canonical_tool_args(tool, {"name": "x"}))
+    await store.aput(namespace, key, {"result": {"name": "stale"}, "fetched_at": 0, "expires_at": time.time() - 1})
+
+    outcome, result = await _store_or_call(tool, {"name": "x"})
+
+    assert (outcome, result, calls) == ("miss", {"name": "x"}, ["x"])
+    item = await store.aget(namespace, key)
+    assert item is not None and item.value["result"] == {"name": "x"}
+    assert await _store_or_call(tool, {"name": "x"}) == ("hit", {"name": "x"})
+
+
+@pytest.mark.asyncio
+async def test_error_results_are_not_stored(monkeypatch: pytest.MonkeyPatch) -> None:
+    store = InMemoryStore()
+    monkeypatch.setattr(result_store, "_current_store", lambda: store)
+
+    def areas() -> dict:
+        return {"live_api_areas": [{"error": "API Error: 503"}]}
+
+    tool = StructuredTool.from_function(areas, name="areas", description="List areas.")
+
+    await _store_or_call(tool, {})
+
+    assert await store.asearch((*TOOL_RESULT_NAMESPACE, tool.name)) == []
@@ -0,0 +1,57 @@
+import os
+import stat
+
+import pytest
+
+from backend.core.accounting import AccountingAggregate
+from backend.core.cache import SQLiteTTLCache, prepare_cache_file
+
+
+@pytest.fixture
+def cache_path(tmp_path) -> str:
+    path = str(tmp_path / "cache" / "shared.sqlite3")
+    prepare_cache_file(path)
+    return path
+
+
+def test_cache_file_is_private(cache_path: str) -> None:
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(cache_path)).st_mode) == 0o700
+
+
+def test_values_are_stored_as_json(cache_path: str) -> None:
+    cache = SQLiteTTLCache(
+        "accounting", maxsize=10, path=cache_path, encode=vars, decode=lambda data: AccountingAggregate(**data)
+    )
+
+    def add(aggregate: AccountingAggregate | None) -> AccountingAggregate:
+        aggregate = aggregate or AccountingAggregate()
+        aggregate.tool_calls.update({"search": 1})
+        return aggregate
+
+    cache.update("thread", add)
+    cache.update("thread", add)
+
+    assert cache.get("thread").tool_calls == {"search": 2}
+    raw = cache._connection().execute("SELECT value FROM cache_entries").fetchone()[0]
+    assert isinstance(raw, str) and '"search": 2' in raw
+
+
+def test_unreadable_value_is_a_miss(cache_path: str) -> None:
+    cache = SQLiteTTLCache("answers", maxsize=10, path=cache_path)
+    cache.set("key", {"content": "ok"})
+    cache._connection().execute("UPDATE cache_entries SET value = ?", (b"\x80\x04not json",))
+
+    assert cache.get("key", "missing") == "missing"
+
+
+@pytest.mark.asyncio
+async def test_async_methods(cache_path: str) -> None:
+    cache = SQLiteTTLCache("workers", maxsize=10, ttl=60, path=cache_path)
+
+    await cache.aset("a", {"pid": 1})
+    assert await cache.aget("a") == {"pid": 1}
+    assert await cache.aupdate("a", lambda report: {**(report or {}), "pid": 2}) == {"pid": 2}
+    assert await cache.aitems() == [("a", {"pid": 2})]
+    assert await cache.apop("a") == {"pid": 2}
+    assert await cache.aget("a") is None
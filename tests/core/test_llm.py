@@ -0,0 +1,18 @@
+import pytest
+
+from backend.core import llm
+from backend.core.llm import get_model, get_telogical_primary_client, get_telogical_secondary_client
+from backend.schema.models import OpenAIModelName
+
+
+def test_streamed_calls_report_usage(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm, "_telogical_primary_llm", None)
+    monkeypatch.setattr(llm, "_telogical_secondary_llm", None)
+    monkeypatch.setenv("TELOGICAL_MODEL_ENDPOINT_GPT", "https://telogical.openai.azure.com")
+    monkeypatch.setenv("TELOGICAL_API_KEY_GPT", "azure-key")
+    monkeypatch.setenv("TELOGICAL_MODEL_DEPLOYMENT_GPT", "gpt-4o")
+    monkeypatch.setenv("TELOGICAL_MODEL_API_VERSION_GPT", "2024-10-21")
+
+    assert get_telogical_primary_client().stream_usage
+    assert get_telogical_secondary_client().stream_usage
+    assert get_model(OpenAIModelName.GPT_4O_MINI).stream_usage
@@ -0,0 +1,140 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.graph import START, MessagesState, StateGraph
+from pydantic import BaseModel
+
+from backend.core.accounting import AccountingCallbackHandler, WorkAccounting
+from backend.core.llm_gateway import GatewayChatModel, get_llm_gateway_stats
+
+USAGE = {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+
+
+class UsageChatModel(BaseChatModel):
+    """Answers "ok" and reports 10 input and 2 output tokens per call."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "usage-fake"
+
+    def _generate(
+        self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        message = AIMessage(content="ok", usage_metadata=USAGE, response_metadata={"model_name": "fake"})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        yield ChatGenerationChunk(message=AIMessageChunk(content="o"))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="k", usage_metadata=USAGE, response_metadata={"model_name": "fake"})
+        )
+
+
+class Verdict(BaseModel):
+    """Whether the question needs Wyscout data."""
+
+    requires_database_access: bool
+
+
+class StrictToolModel(BaseChatModel):
+    """Calls the first bound tool and, like a provider client, rejects unknown call kwargs."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "strict-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Runnable:  # type: ignore[override]
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(
+        self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        unexpected = set(kwargs) - {"tools", "tool_choice"}
+        if unexpected:
+            raise TypeError(f"create() got unexpected keyword arguments: {sorted(unexpected)}")
+        name = kwargs["tools"][0]["function"]["name"]
+        message = AIMessage(
+            content="", tool_calls=[{"name": name, "args": {"requires_database_access": True}, "id": "call_1"}]
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def gateway() -> GatewayChatModel:
+    return GatewayChatModel(primary=UsageChatModel(), primary_name="test-primary")
+
+
+@pytest.mark.asyncio
+async def test_invoke_usage_counted_once() -> None:
+    accounting = WorkAccounting(run_id="run", thread_id="thread", user_id="user")
+    with get_usage_metadata_callback() as usage:
+        message = await gateway().ainvoke("hi", config={"callbacks": [AccountingCallbackHandler(accounting)]})
+
+    assert message.content == "ok"
+    assert usage.usage_metadata["fake"]["input_tokens"] == 10
+    assert usage.usage_metadata["fake"]["output_tokens"] == 2
+    assert (accounting.llm_calls, accounting.prompt_tokens, accounting.completion_tokens) == (1, 10, 2)
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_counted_once() -> None:
+    accounting = WorkAccounting(run_id="run", thread_id="thread", user_id="user")
+    with get_usage_metadata_callback() as usage:
+        chunks = [
+            chunk
+            async for chunk in gateway().astream("hi", config={"callbacks": [AccountingCallbackHandler(accounting)]})
+        ]
+
+    assert "".join(chunk.content for chunk in chunks) == "ok"
+    assert usage.usage_metadata["fake"]["input_tokens"] == 10
+    assert usage.usage_metadata["fake"]["output_tokens"] == 2
+    assert (accounting.llm_calls, accounting.prompt_tokens, accounting.completion_tokens) == (1, 10, 2)
+
+
+def test_sync_invoke_usage_counted_once() -> None:
+    with get_usage_metadata_callback() as usage:
+        gateway().invoke("hi")
+
+    assert usage.usage_metadata["fake"]["input_tokens"] == 10
+    assert usage.usage_metadata["fake"]["output_tokens"] == 2
+
+
+@pytest.mark.asyncio
+async def test_structured_output_through_gateway() -> None:
+    structured = GatewayChatModel(primary=StrictToolModel(), primary_name="test-strict").with_structured_output(
+        Verdict
+    )
+
+    assert await structured.ainvoke("Who won Serie A?") == Verdict(requires_database_access=True)
+    assert [chunk async for chunk in structured.astream("Who won Serie A?")] == [
+        Verdict(requires_database_access=True)
+    ]
+    assert structured.invoke("Who won Serie A?") == Verdict(requires_database_access=True)
+
+
+@pytest.mark.asyncio
+async def test_streamed_call_is_labelled_with_graph_node() -> None:
+    llm = gateway()
+
+    async def summarize(state: MessagesState) -> dict:
+        chunks = [chunk async for chunk in llm.astream(state["messages"])]
+        return {"messages": [AIMessage(content="".join(chunk.content for chunk in chunks))]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("summarize", summarize)
+    builder.add_edge(START, "summarize")
+    graph = builder.compile()
+    calls_before = get_llm_gateway_stats()["nodes"].get("summarize", {}).get("calls", 0)
+
+    async for _ in graph.astream({"messages": [HumanMessage(content="hi")]}, stream_mode="messages"):
+        pass
+
+    assert get_llm_gateway_stats()["nodes"]["summarize"]["calls"] == calls_before + 1
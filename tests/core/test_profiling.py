@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from pydantic import SecretStr
+
+from backend.core import profiling
+from backend.core.profiling import load_profile, profile_run, requested_profile_modes
+from backend.core.settings import settings
+
+
+@pytest.fixture
+def enabled(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(settings, "AUTH_SECRET", SecretStr("secret"))
+
+
+def test_profiles_require_auth_secret(enabled: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert requested_profile_modes("cpu,memory", {}) == {"cpu", "memory"}
+    monkeypatch.setattr(settings, "AUTH_SECRET", None)
+    assert requested_profile_modes("cpu,memory", {}) == frozenset()
+
+
+def test_profiles_ignored_when_disabled(enabled: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    config = {"profile": True}
+    assert requested_profile_modes("cpu", config) == frozenset()
+    assert config == {}
+
+
+@pytest.mark.asyncio
+async def test_one_profiled_run_at_a_time(enabled: None) -> None:
+    first_started = asyncio.Event()
+    second_done = asyncio.Event()
+
+    async def first() -> None:
+        async with profile_run("first", frozenset({"memory"})):
+            first_started.set()
+            await second_done.wait()
+
+    async def second() -> None:
+        await first_started.wait()
+        async with profile_run("second", frozenset({"memory"})):
+            pass
+        second_done.set()
+
+    await asyncio.gather(first(), second())
+
+    assert load_profile("first")["memory"]["traced_peak_bytes"] >= 0
+    assert load_profile("second") is None
@@ -0,0 +1,17 @@
+import pytest
+
+from backend.core.settings import Settings
+from backend.schema.models import OpenAIModelName
+
+
+@pytest.mark.parametrize("value", ["not json", '["gpt-4o-mini"]', '"gpt-4o-mini"'])
+def test_malformed_node_models_are_ignored(monkeypatch: pytest.MonkeyPatch, value: str) -> None:
+    monkeypatch.setenv("NODE_MODELS", value)
+
+    assert Settings().NODE_MODELS == {}
+
+
+def test_unknown_node_models_are_dropped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("NODE_MODELS", '{"contextualize_query": "gpt-4o-mini", "refine_output": "gpt-99"}')
+
+    assert Settings().NODE_MODELS == {"contextualize_query": OpenAIModelName.GPT_4O_MINI}
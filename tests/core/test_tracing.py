@@ -0,0 +1,36 @@
+import json
+import threading
+from uuid import uuid4
+
+import pytest
+
+from backend.core import tracing
+from backend.core.tracing import Tracer, flush_traces
+
+
+def test_finished_trace_is_written_by_the_exporter_thread(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACING_EXPORTER", "file")
+    monkeypatch.setattr(tracing, "TRACING_FILE", path)
+    writers: list[str] = []
+    export_spans = tracing.export_spans
+
+    def record_writer(spans: list) -> None:
+        writers.append(threading.current_thread().name)
+        export_spans(spans)
+
+    monkeypatch.setattr(tracing, "export_spans", record_writer)
+    run_id = uuid4()
+    tracer = Tracer(run_id, "request")
+    with tracer.span("graph"):
+        pass
+
+    tracer.finish()
+    tracer.finish()
+    flush_traces()
+
+    assert writers == ["trace-exporter"]
+    (line,) = path.read_text().splitlines()
+    spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {span["name"] for span in spans} == {"request", "graph"}
+    assert {span["traceId"] for span in spans} == {run_id.hex}
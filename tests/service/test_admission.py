@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.service.admission import AdmissionController
+
+
+@pytest.mark.asyncio
+async def test_queued_request_is_admitted_when_a_slot_frees() -> None:
+    controller = AdmissionController(max_in_flight=1, queue_timeout=5)
+    held = await controller.acquire("a")
+
+    waiting = asyncio.create_task(controller.acquire("b"))
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+    held.release()
+
+    slot = await waiting
+    assert (controller.in_flight, controller.queued, slot.user_id) == (1, 0, "b")
+
+
+@pytest.mark.asyncio
+async def test_slot_granted_as_the_wait_times_out_is_released(monkeypatch: pytest.MonkeyPatch) -> None:
+    controller = AdmissionController(max_in_flight=1, queue_timeout=5)
+    held = await controller.acquire("a")
+
+    async def wait_for(awaitable: asyncio.Future, timeout: float) -> None:
+        # The held slot is freed and handed to the waiter in the same step the timeout fires
+        held.release()
+        awaitable.cancel()
+        raise TimeoutError
+
+    monkeypatch.setattr(asyncio, "wait_for", wait_for)
+
+    with pytest.raises(HTTPException) as rejected:
+        await controller.acquire("b")
+
+    assert rejected.value.status_code == 429
+    assert (controller.in_flight, controller.queued) == (0, 0)
+    assert not controller.user_in_flight and not controller.user_queued
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.core import settings
+from backend.service import app, service
+from backend.service.utils import cached_chat_message
+
+
+class StateAgent:
+    def __init__(self, messages: list) -> None:
+        self.messages = messages
+
+    async def aget_state(self, config: dict) -> SimpleNamespace:
+        return SimpleNamespace(values={"messages": self.messages})
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    monkeypatch.setattr(settings, "AUTH_SECRET", None)
+    return TestClient(app)
+
+
+def use_agent(monkeypatch: pytest.MonkeyPatch, messages: list) -> None:
+    async def get_agent(agent_id: str) -> StateAgent:
+        return StateAgent(messages)
+
+    monkeypatch.setattr(service, "get_agent", get_agent)
+
+
+def test_history_skips_system_messages(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    use_agent(
+        monkeypatch,
+        [
+            SystemMessage(content="You are a football analyst.", id="system"),
+            HumanMessage(content="Who won?", id="h1"),
+            AIMessage(content="Inter.", id="a1"),
+        ],
+    )
+
+    response = client.post("/history", json={"thread_id": "thread"})
+
+    assert response.status_code == 200
+    messages = response.json()["messages"]
+    assert [(m["type"], m["id"]) for m in messages] == [("human", "h1"), ("ai", "a1")]
+
+
+def test_history_paginates_without_system_messages(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    use_agent(
+        monkeypatch,
+        [
+            SystemMessage(content="You are a football analyst.", id="system"),
+            HumanMessage(content="Who won?", id="h1"),
+            AIMessage(content="Inter.", id="a1"),
+        ],
+    )
+
+    response = client.post("/history", json={"thread_id": "thread", "limit": 2})
+
+    assert [m["id"] for m in response.json()["messages"]] == ["h1", "a1"]
+    assert response.json()["has_more"] is False
+
+
+def test_cached_chat_message_follows_content_changes() -> None:
+    assert cached_chat_message(AIMessage(content="first answer", id="replaced")).content == "first answer"
+    # Same id and same length, different content
+    assert cached_chat_message(AIMessage(content="other answer", id="replaced")).content == "other answer"
+
+
+def test_history_rejects_before_and_since(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    use_agent(monkeypatch, [HumanMessage(content="Who won?", id="h1"), AIMessage(content="Inter.", id="a1")])
+
+    response = client.post("/history", json={"thread_id": "thread", "before": "a1", "since": "h1"})
+
+    assert response.status_code == 422
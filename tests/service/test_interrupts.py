@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+from backend.service.interrupts import (
+    INTERRUPT_NAMESPACE,
+    is_thread_interrupted,
+    update_interrupt_flag,
+)
+
+
+class SharedStore:
+    """Stands in for a store shared by all workers, such as AsyncPostgresStore."""
+
+    def __init__(self) -> None:
+        self._store = InMemoryStore()
+
+    async def aget(self, namespace: tuple[str, ...], key: str) -> Any:
+        return await self._store.aget(namespace, key)
+
+    async def aput(self, namespace: tuple[str, ...], key: str, value: dict, index: Any = None) -> None:
+        await self._store.aput(namespace, key, value, index=index)
+
+
+class FakeAgent:
+    def __init__(self, interrupted: bool) -> None:
+        self.store: Any = SharedStore()
+        self.interrupted = interrupted
+        self.state_reads = 0
+
+    async def aget_state(self, config: dict) -> SimpleNamespace:
+        self.state_reads += 1
+        tasks = [SimpleNamespace(interrupts=["Which season?"])] if self.interrupted else []
+        return SimpleNamespace(tasks=tasks)
+
+
+def config(thread_id: str = "thread") -> dict:
+    return {"configurable": {"thread_id": thread_id}, "run_id": "run"}
+
+
+@pytest.mark.asyncio
+async def test_thread_interrupted_before_flags_is_found_in_checkpoint() -> None:
+    agent = FakeAgent(interrupted=True)
+
+    assert await is_thread_interrupted(agent, config())
+    assert await is_thread_interrupted(agent, config())
+    # The checkpoint is read once, then the stored flag answers
+    assert agent.state_reads == 1
+
+
+@pytest.mark.asyncio
+async def test_flags_follow_interrupt_and_resume() -> None:
+    agent = FakeAgent(interrupted=False)
+
+    assert not await is_thread_interrupted(agent, config())
+    await update_interrupt_flag(agent, config(), interrupted=True, resumed=False)
+    assert await is_thread_interrupted(agent, config())
+    await update_interrupt_flag(agent, config(), interrupted=False, resumed=True)
+    assert not await is_thread_interrupted(agent, config())
+    assert agent.state_reads == 1
+
+
+@pytest.mark.asyncio
+async def test_flag_without_value_means_interrupted() -> None:
+    agent = FakeAgent(interrupted=False)
+    await agent.store.aput(INTERRUPT_NAMESPACE, "thread", {"run_id": "old"})
+
+    assert await is_thread_interrupted(agent, config())
+    assert agent.state_reads == 0
+
+
+@pytest.mark.asyncio
+async def test_per_process_store_always_reads_the_checkpoint() -> None:
+    agent = FakeAgent(interrupted=True)
+    agent.store = InMemoryStore()
+
+    assert await is_thread_interrupted(agent, config())
+    await update_interrupt_flag(agent, config(), interrupted=False, resumed=True)
+    assert await is_thread_interrupted(agent, config())
+    assert agent.state_reads == 2
+    assert await agent.store.aget(INTERRUPT_NAMESPACE, "thread") is None
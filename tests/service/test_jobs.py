@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+from langgraph.store.memory import InMemoryStore
+
+from backend.schema.schema import ChatMessage, UserInput
+from backend.service import jobs
+from backend.service.jobs import Job, JobPool, ReportProgress
+
+
+async def execute(job: Job, report: ReportProgress) -> ChatMessage:
+    return ChatMessage(type="ai", content="done")
+
+
+@pytest.mark.asyncio
+async def test_per_process_store_with_several_workers_offers_no_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jobs, "SERVICE_WORKERS", 2)
+    pool = JobPool()
+    pool.start(InMemoryStore(), execute)
+
+    with pytest.raises(HTTPException) as error:
+        await pool.submit("wyscout", UserInput(message="Summarize the season"))
+    assert error.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_per_process_store_with_one_worker_runs_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jobs, "SERVICE_WORKERS", 1)
+    pool = JobPool()
+    pool.start(InMemoryStore(), execute)
+    try:
+        job = await pool.submit("wyscout", UserInput(message="Summarize the season"))
+        assert (await pool.get(job.job_id)) is not None
+    finally:
+        await pool.stop()